@@ -0,0 +1,98 @@
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+import numpy as np
+import core.results as rs
+from typing import Dict, Any, Optional, Tuple
+
+
+CHECKPOINT_PATH = 'data/checkpoints.db'
+
+
+def create_job_id(*args: Any) -> str:
+    return hashlib.sha1(json.dumps(args, sort_keys=True, default=str).encode()).hexdigest()[:12]
+
+# Finished (symbol, strategy) results of a batch run are written as they arrive, so a crashed or
+# interrupted job can be started again with the same id and only runs what is left. Every row keeps
+# the hash of the bars it was computed on, rows of symbols whose bars changed since are run again.
+class Checkpoint:
+    def __init__(self, job_id: str, resume: bool = False, path: str = CHECKPOINT_PATH) -> None:
+        self.job_id = job_id
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, created REAL, description TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (job_id TEXT, symbol TEXT, strategy TEXT, payload BLOB, bars_hash TEXT, PRIMARY KEY (job_id, symbol, strategy))')
+
+        # Checkpointed results only carry the id of their calendar, its dates are stored once in the database
+        self.connection.execute('CREATE TABLE IF NOT EXISTS calendars (calendar TEXT PRIMARY KEY, dates BLOB)')
+
+        # Rows of checkpoints created before the bars were hashed have none and are never resumed
+        if 'bars_hash' not in [column[1] for column in self.connection.execute('PRAGMA table_info(results)')]:
+            self.connection.execute('ALTER TABLE results ADD COLUMN bars_hash TEXT')
+
+        if not resume:
+            self.clear()
+
+        self.connection.execute('INSERT OR IGNORE INTO jobs VALUES (?, ?, ?)', (job_id, time.time(), None))
+        self.connection.commit()
+
+    def describe(self, description: Dict[str, Any]) -> None:
+        self.connection.execute('UPDATE jobs SET description = ? WHERE job_id = ?', (json.dumps(description, default=str), self.job_id))
+        self.connection.commit()
+
+    def clear(self) -> None:
+        self.connection.execute('DELETE FROM results WHERE job_id = ?', (self.job_id,))
+        self.connection.execute('DELETE FROM jobs WHERE job_id = ?', (self.job_id,))
+        self.connection.commit()
+
+    def load(self, bars_hashes: Dict[str, str]) -> Dict[Tuple[str, str], Optional[Dict[str, Any]]]:
+        rows = self.connection.execute('SELECT symbol, strategy, payload, bars_hash FROM results WHERE job_id = ?', (self.job_id,))
+        completed = {}
+        outdated = 0
+
+        for symbol, strategy, payload, bars_hash in rows:
+            if bars_hash is None or bars_hash != bars_hashes.get(symbol):
+                outdated += 1
+                continue
+
+            try:
+                completed[(symbol, strategy)] = result = pickle.loads(payload)
+
+                if isinstance(result, rs.CompactResult):
+                    self.load_calendar(result.calendar)
+
+            except Exception as e:
+                print(f"Error loading checkpoint of {symbol} with strategy -{strategy}-: {e}")
+
+        if outdated > 0:
+            print(f"Discarded {outdated} checkpointed backtests whose bars changed.")
+
+        return completed
+
+    def load_calendar(self, calendar: str) -> None:
+        if calendar in rs.calendars:
+            return
+
+        row = self.connection.execute('SELECT dates FROM calendars WHERE calendar = ?', (calendar,)).fetchone()
+
+        if row is not None:
+            rs.calendars[calendar] = np.frombuffer(row[0], dtype=np.int64).view('datetime64[ns]')
+
+    def save(self, symbol: str, strategy: str, result: Optional[Dict[str, Any]], bars_hash: str) -> None:
+        if isinstance(result, rs.CompactResult):
+            self.connection.execute('INSERT OR IGNORE INTO calendars VALUES (?, ?)', (result.calendar, rs.calendars[result.calendar].view(np.int64).tobytes()))
+
+        self.connection.execute('INSERT OR REPLACE INTO results (job_id, symbol, strategy, payload, bars_hash) VALUES (?, ?, ?, ?, ?)', (self.job_id, symbol, strategy, pickle.dumps(result), bars_hash))
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'Checkpoint':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -1,14 +1,19 @@
 import yfinance as yf
+import numpy as np
 import pandas as pd
 import pandas_ta as ta
 import re
+import functools
 import json
-import pickle
-import os
+import core.price_store as pstore
+import core.universe as universe
+from core.panel import PricePanel
+from core.results import CompactResult
+from core.indicators import indicator, data_version, flush_stats as flush_indicator_stats
 from multiprocessing import Pool
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Callable, Any
-from strategies.strategy_tester import load_strategies_from_json
+import strategies.registry as registry
 
 
 def fetch_data(symbol: str, startDate: Optional[str] = None, endDate: Optional[str] = None) -> Optional[pd.DataFrame]:
@@ -27,6 +32,24 @@ def fetch_data(symbol: str, startDate: Optional[str] = None, endDate: Optional[s
         print(f"Error fetching data for symbol {symbol}: {e}")
         return None
 
+class LocalProvider:
+    def __init__(self, stock_data: Dict[str, pd.DataFrame]) -> None:
+        self.stock_data = stock_data
+
+    def __call__(self, symbol: str, startDate: Optional[str] = None, endDate: Optional[str] = None) -> Optional[pd.DataFrame]:
+        df = self.stock_data.get(symbol)
+
+        if df is None:
+            return None
+
+        if startDate is not None:
+            df = df.loc[df['Date'] >= pd.Timestamp(startDate)]
+
+        if endDate is not None:
+            df = df.loc[df['Date'] < pd.Timestamp(endDate)]
+
+        return df.reset_index(drop=True) if not df.empty else None
+
 def fetch_data_multiple(symbols: List[str], startDate: Optional[str] = None, endDate: Optional[str] = None) -> Optional[pd.DataFrame]:
     try:
         dfs = yf.download(symbols, start=startDate, end=endDate, period='5y', interval='1d', progress=False, multi_level_index=False, auto_adjust=True)
@@ -42,131 +65,157 @@ def fetch_data_multiple(symbols: List[str], startDate: Optional[str] = None, end
         print(f"Error fetching data for symbols: {e}")
         return None
     
-def fetch_data_or_load_cached(symbols: List[str]) -> Dict[str, pd.DataFrame]:
+def fetch_data_or_load_cached(symbols: List[str], provider: Callable[..., Optional[pd.DataFrame]] = fetch_data, full_refresh: bool = False, path: str = pstore.STORE_PATH) -> Dict[str, pd.DataFrame]:
+    return fetch_panel_or_load_cached(symbols, provider, full_refresh, path).to_frames()
+
+def fetch_panel_or_load_cached(symbols: List[str], provider: Callable[..., Optional[pd.DataFrame]] = fetch_data, full_refresh: bool = False, path: str = pstore.STORE_PATH) -> PricePanel:
+    refresh_if_needed(symbols, provider, full_refresh, path)
+    panel = clean_panel(PricePanel.from_store(symbols, path), symbols)
+    print(f"Loaded a panel of {len(panel.symbols)} symbols over {len(panel.dates)} trading days.")
+
+    return panel
+
+def refresh_if_needed(symbols: List[str], provider: Callable[..., Optional[pd.DataFrame]] = fetch_data, full_refresh: bool = False, path: str = pstore.STORE_PATH) -> None:
     with open('data/index_info.json', 'r') as file:
         stock_data_info = json.load(file)
 
-    def should_download(category: str) -> bool:
+    def should_refresh(category: str) -> bool:
         last_download = stock_data_info[category]['last_download_date']
 
-        if last_download is None:
+        if last_download is None or full_refresh:
             return True
         
         last_download_date = datetime.strptime(last_download, '%Y-%m-%d')
         print(f"Last download date for requested stock data: {last_download_date}")
+        stored_symbols = pstore.load_manifest(path)['symbols']
 
-        return datetime.now() - last_download_date >= timedelta(days=7) or not os.path.exists(f'data/{category.lower()}.pkl')
+        return datetime.now().date() > last_download_date.date() or not any(symbol in stored_symbols for symbol in symbols)
 
-    def save_data(category: str, stock_data: Dict[str, pd.DataFrame]) -> None:
+    def save_data(category: str) -> None:
         stock_data_info[category]['last_download_date'] = datetime.now().strftime('%Y-%m-%d')
         
         with open('data/index_info.json', 'w') as file:
             json.dump(stock_data_info, file, indent=4)
 
-        with open(f'data/{category}.pkl', 'wb') as file:
-            pickle.dump(stock_data, file)
+    category = get_category(symbols)
 
-    def load_data(category: str):
-        with open(f'data/{category}.pkl', 'rb') as file:
-            return pickle.load(file)
+    if category is None:
+        # Symbols outside of an index are refreshed once a day each
+        manifest = pstore.load_manifest(path)
+        today = datetime.now().strftime('%Y-%m-%d')
+        stale_symbols = [symbol for symbol in symbols if full_refresh or manifest['symbols'].get(symbol, {}).get('refreshed') != today]
+
+        if stale_symbols:
+            print(f"No category found for requested symbols. Refreshing stock data of {len(stale_symbols)} symbols.")
+            refresh_stock_data(stale_symbols, provider, full_refresh, path=path)
+        else:
+            print("Loading cached stock data.")
+    elif should_refresh(category):
+        print("Refreshing stock data.")
+        refresh_stock_data(symbols, provider, full_refresh, path=path)
+        save_data(category)
+    else:
+        print("Loading cached stock data.")
+
+def refresh_stock_data(symbols: List[str], provider: Callable[..., Optional[pd.DataFrame]] = fetch_data, full_refresh: bool = False, overlap_days: int = 7, path: str = pstore.STORE_PATH) -> Dict[str, str]:
+    manifest = pstore.load_manifest(path)
+    start_dates = {}
 
-    category = None
+    for symbol in symbols:
+        info = manifest['symbols'].get(symbol)
+
+        if full_refresh or info is None or info['end'] is None:
+            start_dates[symbol] = None
+        else:
+            start_dates[symbol] = (datetime.strptime(info['end'], '%Y-%m-%d') - timedelta(days=overlap_days)).strftime('%Y-%m-%d')
 
-    if symbols == load_symbols('SP'):
-        category = 'sp'
-    elif symbols == load_symbols('NQ'):
-        category = 'nq'
-    elif symbols == load_symbols('R2000'):
-        category = 'r2000'
+    with Pool() as pool:
+        tails = pool.starmap(provider, [(symbol, start_dates[symbol]) for symbol in symbols])
 
-    if category:
-        if should_download(category):
-            print("Downloading new stock data.")
-            
-            with Pool() as pool:
-                stock_data = dict(zip(symbols, pool.map(fetch_data, symbols)))
+    statuses = {}
+    reload_symbols = []
 
-            stock_data = clean_stock_data(stock_data, symbols)
-            save_data(category, stock_data)
+    for symbol, tail in zip(symbols, tails):
+        if tail is None:
+            statuses[symbol] = 'failed'
+        elif start_dates[symbol] is None:
+            pstore.write_symbol(symbol, tail, manifest, path)
+            statuses[symbol] = 'new'
         else:
-            print("Loading cached stock data.")
-            stock_data = load_data(category)
-    else:
-        print("No category found for requested symbols. Downloading new stock data.")
+            keep_rows = check_overlap(pstore.read_columns(symbol, manifest, path=path), tail)
+
+            if keep_rows is None:
+                reload_symbols.append(symbol)
+                continue
+
+            statuses[symbol] = 'appended' if keep_rows + len(tail) > manifest['symbols'][symbol]['rows'] else 'current'
+            pstore.append_symbol(symbol, tail, manifest, keep_rows, path)
+
+    if reload_symbols:
+        print(f"Price adjustments detected for {len(reload_symbols)} symbols. Downloading their full history.")
 
         with Pool() as pool:
-            stock_data = dict(zip(symbols, pool.map(fetch_data, symbols)))
+            histories = pool.map(provider, reload_symbols)
 
-        stock_data = clean_stock_data(stock_data, symbols)
+        for symbol, df in zip(reload_symbols, histories):
+            if df is None:
+                statuses[symbol] = 'failed'
+            else:
+                pstore.write_symbol(symbol, df, manifest, path)
+                statuses[symbol] = 'reloaded'
 
-    return stock_data
+    today = datetime.now().strftime('%Y-%m-%d')
 
-def load_cached_results(symbols: List[str], strategies: List[str]) -> Optional[List[Dict[str, Any]]]:
-    with open('data/index_info.json', 'r') as file:
-        stock_data_info = json.load(file)
-    
-    results = None
-    category = None
+    for symbol, status in statuses.items():
+        if status != 'failed':
+            manifest['symbols'][symbol]['refreshed'] = today
 
-    if symbols == load_symbols('SP'):
-        category = 'sp'
-    elif symbols == load_symbols('NQ'):
-        category = 'nq'
-    elif symbols == load_symbols('R2000'):
-        category = 'r2000'
+    pstore.save_manifest(manifest, path)
 
-    if category is None:
-        return None
-    
-    if stock_data_info[category]['strategies'] != strategies or datetime.now() - datetime.strptime(stock_data_info[category]['last_backtest_date'], '%Y-%m-%d') >= timedelta(days=7):
-        return None
+    counts = {status: list(statuses.values()).count(status) for status in ['new', 'appended', 'current', 'reloaded', 'failed']}
+    print(f"Refreshed {len(symbols)} symbols: {counts}")
 
-    if os.path.exists(f'data/{category}_results.pkl'):
-        print("Cached results found. Loading cached results.")
-        with open(f'data/{category}_results.pkl', 'rb') as file:
-            results = pickle.load(file)
+    return statuses
 
-    return results
+def check_overlap(stored: Dict[str, Any], tail: pd.DataFrame, tolerance: float = 1e-6) -> Optional[int]:
+    stored_dates = np.asarray(stored['Date'])
+    tail_dates = tail['Date'].to_numpy(dtype='datetime64[ns]')
+    overlap_start = int(np.searchsorted(stored_dates, tail_dates[0]))
+    # The last stored bar may have been downloaded intraday, so it is replaced rather than compared
+    confirmed_dates = stored_dates[overlap_start:-1]
 
-def save_results(results: List[Dict[str, Any]], strategies: List[str], symbols: List[str]) -> None:
-    with open('data/index_info.json', 'r') as file:
-        stock_data_info = json.load(file)
+    if len(confirmed_dates) == 0:
+        return None
 
-    print("Saving results.")
+    positions = np.searchsorted(tail_dates, confirmed_dates)
 
-    category = None
+    if np.any(positions >= len(tail_dates)) or np.any(tail_dates[np.minimum(positions, len(tail_dates) - 1)] != confirmed_dates):
+        return None
 
-    if symbols == load_symbols('SP'):
-        category = 'sp'
-    elif symbols == load_symbols('NQ'):
-        category = 'nq'
-    elif symbols == load_symbols('R2000'):
-        category = 'r2000'
+    for column in ['Open', 'High', 'Low', 'Close']:
+        stored_values = np.asarray(stored[column][overlap_start:-1])
+        tail_values = tail[column].to_numpy(dtype=np.float64)[positions]
 
-    if category is None:
-        return
+        if not np.allclose(stored_values, tail_values, rtol=tolerance, atol=0):
+            return None
+
+    return overlap_start
 
-    stock_data_info[category]['last_backtest_date'] = datetime.now().strftime('%Y-%m-%d')
-    stock_data_info[category]['strategies'] = strategies
+def get_category(symbols: List[str]) -> Optional[str]:
+    name = universe.identify_universe(symbols)
 
-    with open('data/index_info.json', 'w') as file:
-        json.dump(stock_data_info, file, indent=4)
+    if name in ['SP', 'NQ', 'R2000']:
+        return name.lower()
 
-    with open(f'data/{category}_results.pkl', 'wb') as file:
-        pickle.dump(results, file)
+    return None
 
 def load_symbols(category: str) -> Optional[List[str]]:
-    if category == 'SP':
-        return pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]['Symbol'].tolist() + ['SPY']
-    elif category == 'NQ':
-        return pd.read_html('https://en.wikipedia.org/wiki/Nasdaq-100')[4]['Ticker'].tolist()
-    elif category == 'R2000':
-        return pd.read_csv('data/R2000.csv').iloc[:, 0].tolist()
-    elif category == 'futures':
-        return ['ES=F', 'YM=F', 'NQ=F', 'RTY=F', 'CL=F', 'GC=F', 'SI=F', 'HG=F', 'PL=F', 'PA=F', 'NG=F', 'ZB=F', 'ZT=F', 'ZN=F', 'ZS=F', 'ZW=F', 'ZC=F', 'ZL=F', 'ZM=F']
-    else:
+    symbols = universe.load_universe(category)
+
+    if symbols is None:
         print("Invalid index specified.")
-        return None
+
+    return symbols
 
 def camel_case_to_name(camel_case_str: str) -> str:
     return re.sub(r'([a-z])([A-Z])', r'\1 \2', camel_case_str).title()
@@ -174,29 +223,25 @@ def camel_case_to_name(camel_case_str: str) -> str:
 def snake_case_to_name(snake_case_str: str) -> str:
     return snake_case_str.replace('_', ' ')
 
-def clean_stock_data(stock_data: Dict[str, pd.DataFrame], symbols: List[str]) -> Dict[str, pd.DataFrame]:
-    symbols_to_remove = [symbol for symbol, data in stock_data.items() if data is None]
+# Symbols listed late or with gaps keep the bars they have, the panel pads the rest of the calendar with NaN
+def clean_panel(panel: PricePanel, symbols: List[str]) -> PricePanel:
+    symbols_with_data = [symbol for symbol in panel.symbols if panel.valid[panel.symbol_index[symbol]].any()]
+    missing_count = len(symbols) - len(symbols_with_data)
 
-    for symbol in symbols_to_remove:
-        stock_data.pop(symbol)
-        symbols.remove(symbol)
+    if missing_count:
+        print(f"Removing {missing_count} symbols without stored data.")
 
-    max_length = max(len(data) for data in stock_data.values())
+    panel = panel.select(symbols_with_data)
+    late_count = int(np.sum(~panel.valid[:, 0])) if len(panel.dates) else 0
 
-    if any(len(data) != max_length for data in stock_data.values()):
-        print(f"Data length mismatch. Removing all stocks that are not of length: {max_length}.")
+    if late_count:
+        print(f"{late_count} symbols start after the first trading day and are padded with NaN.")
     else:
-        print(f"All data lengths are equal length: {max_length}.")
-
-    symbols_to_remove = [symbol for symbol, data in stock_data.items() if len(data) != max_length]
-
-    for symbol in symbols_to_remove:
-        stock_data.pop(symbol)
-        symbols.remove(symbol)
+        print(f"All symbols span all {len(panel.dates)} trading days.")
 
-    print(f"Remaining symbol count after cleaning: {len(symbols)}")
+    print(f"Remaining symbol count after cleaning: {len(panel.symbols)}")
 
-    return stock_data
+    return panel
 
 def generate_simple_result(symbol: str, strategy: str, result: Dict[str, Any]) -> Dict[str, Any]:
     simplified_result = {
@@ -206,11 +251,10 @@ def generate_simple_result(symbol: str, strategy: str, result: Dict[str, Any]) -
         'sharpe': result['Sharpe Ratio'],
         '# trades': result['# Trades'],
         'avg_trade_duration': result['Avg. Trade Duration'],
-        'equity_curve': result['_equity_curve'],
         'strategy': strategy
     }
 
-    return simplified_result
+    return CompactResult.from_equity_curve(simplified_result, result['_equity_curve'])
 
 def calculate_n_day_returns(df: pd.DataFrame, n: int) -> float:
     df.loc[df['BUYSignal'] == 1, f'{n}_day_return'] = df['Close'].shift(-n-1).pct_change(fill_method=None) * 100
@@ -219,19 +263,21 @@ def calculate_n_day_returns(df: pd.DataFrame, n: int) -> float:
 
     return average_return
 
-def create_signals(df: pd.DataFrame, strategy: str) -> pd.DataFrame:
+def create_signals(df: pd.DataFrame, strategy: str, symbol: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
     df['BUYSignal'] = 0
+    df.attrs['symbol'] = symbol
+    df.attrs['data_version'] = data_version(df)
 
-    signal_functions = load_strategies_from_json('strategies\strategies.json')
-    signal_functions.update(load_strategies_from_json('strategies\community_strategies.json'))
+    spec = registry.get_registry().get(strategy)
+
+    try:
+        if spec is not None and spec.signal_function is not None:
+            spec.signal_function(df, **(params or {}))
 
-    for key in signal_functions:
-        strategy_name_words = key.split('_')
-        strategy_name = ''.join([word.lower() + "_" for word in strategy_name_words])
-        function_name = f"create_{strategy_name}signals"
-        signal_functions[key] = globals().get(function_name)
+    finally:
+        df.attrs.clear()
+        flush_indicator_stats()
 
-    signal_functions.get(strategy, lambda df: None)(df)
     df = df[int(-0.9 * len(df)):].copy()
 
     if 'Date' in df.columns:
@@ -245,6 +291,7 @@ def create_signals(df: pd.DataFrame, strategy: str) -> pd.DataFrame:
 
 def add_columns(columns: Dict[str, Callable[[pd.DataFrame], Any]]) -> Callable:
     def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
         def wrapper(df: pd.DataFrame, *args: Any, **kwargs: Any) -> Any:
             for col, calc in columns.items():
                 df[col] = calc(df)
@@ -255,54 +302,54 @@ def add_columns(columns: Dict[str, Callable[[pd.DataFrame], Any]]) -> Callable:
         return wrapper
     return decorator
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14)})
 def create_buy_and_hold_signals(df: pd.DataFrame) -> None:
     df['BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'current_percent': lambda df: 100 * (df['Close'] - df['Low']) / (df['High'] - df['Low'])})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'current_percent': lambda df: 100 * (df['Close'] - df['Low']) / (df['High'] - df['Low'])})
 def create_daily_range_signals(df: pd.DataFrame, low_percentage: int = 10) -> None:
     df.loc[df['current_percent'] <= low_percentage, 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'rsi': lambda df: ta.rsi(df['Close'], length=2)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'rsi': lambda df: indicator(df, 'rsi', length=2)})
 def create_solo_rsi_signals(df: pd.DataFrame, rsi_threshold: int = 10) -> None:
     df.loc[df['rsi'] < rsi_threshold, 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'roc': lambda df: ta.roc(df['Close'], length=60)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'roc': lambda df: indicator(df, 'roc', length=60)})
 def create_roc_trend_following_bull_signals(df: pd.DataFrame, rocThreshold: int = 30) -> None:
     df.loc[df['roc'] > rocThreshold, 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'roc': lambda df: ta.roc(df['Close'], length=60)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'roc': lambda df: indicator(df, 'roc', length=60)})
 def create_roc_trend_following_bear_signals(df: pd.DataFrame, rocThreshold: int = -30) -> None:
     df.loc[df['roc'] < rocThreshold, 'BUYSignal'] = 2
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'roc': lambda df: ta.roc(df['Close'], length=10), 'prev_roc': lambda df: ta.roc(df['Close'], length=14).shift(1)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'roc': lambda df: indicator(df, 'roc', length=10), 'prev_roc': lambda df: indicator(df, 'roc', length=14).shift(1)})
 def create_roc_mean_reversion_signals(df: pd.DataFrame, rocThreshold: int = -3) -> None:
     df.loc[(df['roc'] < rocThreshold) & (df['roc'] > df['prev_roc']), 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'ema': lambda df: ta.ema(df['Close'], length=1)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'ema': lambda df: indicator(df, 'ema', length=1)})
 def create_buy_and_holder_signals(df: pd.DataFrame) -> None:
     df.loc[df['ema'] > 0, 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'prev_close': lambda df: df['Close'].shift(1), 'prev_open': lambda df: df['Open'].shift(1)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'prev_close': lambda df: df['Close'].shift(1), 'prev_open': lambda df: df['Open'].shift(1)})
 def create_buy_after_red_day_signals(df: pd.DataFrame) -> None:
     df.loc[df['prev_close'] < df['prev_open'], 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'prev_close': lambda df: df['Close'].shift(1), 'prev_open': lambda df: df['Open'].shift(1)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'prev_close': lambda df: df['Close'].shift(1), 'prev_open': lambda df: df['Open'].shift(1)})
 def create_buy_after_green_day_signals(df: pd.DataFrame) -> None:
     df.loc[df['prev_close'] > df['prev_open'], 'BUYSignal'] = 1
 
-@add_columns({'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14), 'rsi': lambda df: ta.rsi(df['Close'], length=14)})
+@add_columns({'atr': lambda df: indicator(df, 'atr', length=14), 'rsi': lambda df: indicator(df, 'rsi', length=14)})
 def create_shorting_rsi_signals(df: pd.DataFrame) -> None:
     df.loc[df['rsi'] < 85, 'BUYSignal'] = 2
 
 @add_columns({
-    'atr': lambda df: ta.atr(df['High'], df['Low'], df['Close'], length=14),
-    'macd': lambda df: ta.macd(df['Close'], fast=12, slow=26, signal=9)['MACD_12_26_9'],
-    'macd_signal': lambda df: ta.macd(df['Close'], fast=12, slow=26, signal=9)['MACDs_12_26_9'],
-    'stoch_k': lambda df: ta.stoch(df['High'], df['Low'], df['Close'])['STOCHk_14_3_3'],
-    'stoch_d': lambda df: ta.stoch(df['High'], df['Low'], df['Close'])['STOCHd_14_3_3'],
-    'rsi': lambda df: ta.rsi(df['Close'], length=14),
-    'rsi_sma': lambda df: ta.rsi(df['Close'], length=14).rolling(window=14).mean()
+    'atr': lambda df: indicator(df, 'atr', length=14),
+    'macd': lambda df: indicator(df, 'macd', 'MACD_12_26_9', fast=12, slow=26, signal=9),
+    'macd_signal': lambda df: indicator(df, 'macd', 'MACDs_12_26_9', fast=12, slow=26, signal=9),
+    'stoch_k': lambda df: indicator(df, 'stoch', 'STOCHk_14_3_3'),
+    'stoch_d': lambda df: indicator(df, 'stoch', 'STOCHd_14_3_3'),
+    'rsi': lambda df: indicator(df, 'rsi', length=14),
+    'rsi_sma': lambda df: indicator(df, 'rsi', length=14).rolling(window=14).mean()
 })
 def create_macd_stoch_rsi_signals(df: pd.DataFrame) -> None:
     df['macd_crossover'] = (df['macd'] > df['macd_signal']) & (df['macd'].shift(1) <= df['macd_signal'].shift(1))
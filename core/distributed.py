@@ -0,0 +1,331 @@
+import argparse
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+import traceback
+import numpy as np
+import pandas as pd
+import core.result_cache as rc
+import core.results as rs
+from collections import deque
+from multiprocessing import Process
+from multiprocessing.connection import Listener, Client, Connection
+from typing import List, Dict, Optional, Any, Tuple, Callable, Iterable
+
+
+HOST = 'localhost'
+PORT = 6000
+BATCH_SIZE = 2
+CACHE_PATH = 'data/worker_cache'
+
+# Set in worker processes, market data is requested over the connection the worker pulls tasks from
+worker_connection: Optional[Connection] = None
+local_data: Dict[str, Any] = {}
+
+
+# Connections exchange pickles, so the key is a secret. Workers started on their own share the key set in
+# ALGOTRADING_AUTHKEY, without it a coordinator on localhost creates a key for the run that only the
+# local workers it launches are given.
+def get_authkey(host: str = HOST, create: bool = False) -> bytes:
+    authkey = os.environ.get('ALGOTRADING_AUTHKEY')
+
+    if authkey is not None:
+        return authkey.encode()
+
+    if create and host in ['localhost', '127.0.0.1']:
+        return os.urandom(32)
+
+    raise ValueError("Set ALGOTRADING_AUTHKEY on the coordinator and its workers to connect them")
+
+# Market data and calendars are cached by content hash, in memory and on disk, so a worker only
+# downloads a symbol the first time any job on that machine needs it.
+def load_data(key: str, path: str = CACHE_PATH) -> Any:
+    if key in local_data:
+        return local_data[key]
+
+    file_path = os.path.join(path, f'{key}.pkl')
+
+    if os.path.exists(file_path):
+        with open(file_path, 'rb') as file:
+            local_data[key] = pickle.load(file)
+    else:
+        worker_connection.send(('data', key))
+        local_data[key] = worker_connection.recv()
+        os.makedirs(path, exist_ok=True)
+        # Workers on one machine share the cache and may fetch the same key at once
+        temporary_path = f'{file_path}.{os.getpid()}.tmp'
+
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(local_data[key], file)
+
+        os.replace(temporary_path, file_path)
+
+    return local_data[key]
+
+# Stands in for the stock data mapping in tasks sent to workers. Pickling it only sends the
+# content hashes, the frames themselves are fetched once per machine and then read from cache.
+class RemoteStockData:
+    def __init__(self, stock_frames: Dict[str, Optional[pd.DataFrame]]) -> None:
+        self.hashes = {symbol: None if df is None else rc.data_hash(df) for symbol, df in stock_frames.items()}
+        self.data = {key: stock_frames[symbol] for symbol, key in self.hashes.items() if key is not None}
+        dates = rs.calendar_from_frames(stock_frames)
+        self.calendar = rs.register_calendar(dates)
+        self.data[self.calendar] = dates
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'hashes': self.hashes, 'calendar': self.calendar}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.data = {}
+
+    def __getitem__(self, symbol: str) -> Optional[pd.DataFrame]:
+        # Results built by a worker are located in the calendar of the coordinator
+        if worker_connection is not None and self.calendar not in rs.calendars:
+            rs.calendars[self.calendar] = np.asarray(load_data(self.calendar))
+
+        key = self.hashes[symbol]
+        return None if key is None else load_data(key)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.hashes
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def keys(self) -> List[str]:
+        return list(self.hashes.keys())
+
+    def __enter__(self) -> 'RemoteStockData':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+class Job:
+    def __init__(self, job_id: int, function: Callable[..., Any], args: Tuple[Any, ...], callback: Optional[Callable[[Any], None]], error_callback: Optional[Callable[[BaseException], None]]) -> None:
+        self.job_id = job_id
+        self.function = function
+        self.args = args
+        self.callback = callback
+        self.error_callback = error_callback
+
+# Hands out jobs to workers that connect over TCP. It has the apply_async and starmap methods of
+# a multiprocessing pool, so the task scheduler and the sweeps run on it unchanged.
+class Coordinator:
+    def __init__(self, data: Dict[str, Any], host: str = HOST, port: int = PORT, authkey: Optional[bytes] = None) -> None:
+        self.data = data
+        self.authkey = authkey or get_authkey(host, create=True)
+        self.listener = Listener((host, port), authkey=self.authkey)
+        self.jobs: deque = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.job_count = 0
+        self.workers = 0
+        self.accept_thread = threading.Thread(target=self.accept_workers, daemon=True)
+        self.accept_thread.start()
+
+    def accept_workers(self) -> None:
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+
+            except Exception:
+                continue
+
+            threading.Thread(target=self.serve_worker, args=(connection,), daemon=True).start()
+
+    def take_jobs(self, count: int) -> List[Job]:
+        with self.condition:
+            while not self.jobs and not self.closed:
+                self.condition.wait()
+
+            return [self.jobs.popleft() for _ in range(min(count, len(self.jobs)))]
+
+    def serve_worker(self, connection: Connection) -> None:
+        in_flight: Dict[int, Job] = {}
+
+        with self.condition:
+            self.workers += 1
+
+        print(f"Worker connected, {self.workers} workers are running.")
+
+        try:
+            while True:
+                message = connection.recv()
+
+                if message[0] == 'data':
+                    connection.send(self.data.get(message[1]))
+                    continue
+
+                _, count, results = message
+
+                for job_id, succeeded, value in results:
+                    job = in_flight.pop(job_id)
+                    callback = job.callback if succeeded else job.error_callback
+
+                    if callback is not None:
+                        callback(value)
+
+                jobs = self.take_jobs(count)
+
+                if not jobs:
+                    connection.send(('stop',))
+                    break
+
+                in_flight.update((job.job_id, job) for job in jobs)
+                connection.send(('jobs', [(job.job_id, job.function, job.args) for job in jobs]))
+
+        except (EOFError, OSError):
+            # Jobs of a lost worker go back to the front of the queue for the others
+            if in_flight:
+                print(f"Worker disconnected, requeueing {len(in_flight)} jobs.")
+
+            with self.condition:
+                self.jobs.extendleft(reversed(list(in_flight.values())))
+                self.condition.notify_all()
+
+        finally:
+            with self.condition:
+                self.workers -= 1
+
+            connection.close()
+
+    def apply_async(self, function: Callable[..., Any], args: Tuple[Any, ...] = (), callback: Optional[Callable[[Any], None]] = None, error_callback: Optional[Callable[[BaseException], None]] = None) -> None:
+        with self.condition:
+            self.jobs.append(Job(self.job_count, function, args, callback, error_callback))
+            self.job_count += 1
+            self.condition.notify()
+
+    def starmap(self, function: Callable[..., Any], iterable: Iterable[Tuple[Any, ...]]) -> List[Any]:
+        tasks = list(iterable)
+        results: List[Any] = [None] * len(tasks)
+        errors: List[BaseException] = []
+        remaining = threading.Semaphore(0)
+
+        def finish(i: int, result: Any) -> None:
+            results[i] = result
+            remaining.release()
+
+        def fail(error: BaseException) -> None:
+            errors.append(error)
+            remaining.release()
+
+        for i, args in enumerate(tasks):
+            self.apply_async(function, args, lambda result, i=i: finish(i, result), fail)
+
+        for _ in tasks:
+            remaining.acquire()
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+        # accept blocks until a connection comes in, so a plain connection wakes it up before the listener closes
+        try:
+            socket.create_connection(self.listener.address, timeout=1).close()
+
+        except OSError:
+            pass
+
+        self.accept_thread.join(timeout=5)
+        self.listener.close()
+
+    def __enter__(self) -> 'Coordinator':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+def run_job(function: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[bool, Any]:
+    try:
+        return True, function(*args)
+
+    except Exception:
+        return False, RuntimeError(traceback.format_exc())
+
+def run_worker(host: str = HOST, port: int = PORT, authkey: Optional[bytes] = None, batch: int = BATCH_SIZE, persistent: bool = False) -> None:
+    global worker_connection
+
+    while True:
+        try:
+            worker_connection = Client((host, port), authkey=authkey or get_authkey(host))
+
+        except ConnectionRefusedError:
+            if not persistent:
+                print(f"No coordinator is listening on {host}:{port}.")
+                return
+
+            time.sleep(5)
+            continue
+
+        results = []
+
+        try:
+            while True:
+                worker_connection.send(('pull', batch, results))
+                message = worker_connection.recv()
+
+                if message[0] == 'stop':
+                    break
+
+                results = [(job_id, *run_job(function, args)) for job_id, function, args in message[1]]
+
+        except (EOFError, OSError):
+            print("Lost the connection to the coordinator.")
+
+        finally:
+            worker_connection.close()
+            worker_connection = None
+
+        if not persistent:
+            return
+
+def start_coordinator(stock_data: RemoteStockData) -> Coordinator:
+    with open('data/config.json', 'r') as file:
+        config = json.load(file)
+
+    host = config.get('coordinator_host', HOST)
+    port = config.get('coordinator_port', PORT)
+    coordinator = Coordinator(stock_data.data, host, port)
+    local_workers = config.get('local_workers', 0)
+    print(f"Coordinator listening on {host}:{port}, starting {local_workers} local workers.")
+
+    launch_local_workers(local_workers, 'localhost' if host in ['0.0.0.0', ''] else host, port, coordinator.authkey)
+
+    return coordinator
+
+def launch_local_workers(count: int, host: str = HOST, port: int = PORT, authkey: Optional[bytes] = None, batch: int = BATCH_SIZE) -> List[Process]:
+    workers = [Process(target=run_worker, args=(host, port, authkey, batch), daemon=True) for _ in range(count)]
+
+    for worker in workers:
+        worker.start()
+
+    return workers
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a backtest worker that pulls jobs from a coordinator.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help="Number of jobs pulled at a time")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes on this machine")
+    parser.add_argument('--persistent', action='store_true', help="Keep waiting for new coordinators after a run ends")
+    args = parser.parse_args()
+
+    authkey = get_authkey(args.host)
+    processes = [Process(target=run_worker, args=(args.host, args.port, authkey, args.batch, args.persistent)) for _ in range(args.workers)]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
@@ -0,0 +1,462 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Any, Tuple, Iterator
+
+
+CASH = 100000
+COMMISSION = 0.00025
+EXIT_RULES = ['hold', 'green_day', 'red_day', 'tpsl', 'trailing']
+
+
+class BacktestPruned(Exception):
+    def __init__(self, reason: str, bar: int) -> None:
+        super().__init__(f"{reason} at bar {bar}")
+        self.reason = reason
+        self.bar = bar
+
+# Optional limits a backtest is stopped on as soon as it breaks them. The drawdown is checked on every
+# bar, the trade count and the Sharpe ratio once the run reaches the checkpoint share of its bars.
+class AbortCriteria:
+    def __init__(
+        self,
+        max_drawdown: Optional[float] = None,
+        min_trades: Optional[int] = None,
+        min_sharpe: Optional[float] = None,
+        checkpoint: float = 0.5
+    ) -> None:
+        self.max_drawdown = max_drawdown
+        self.min_trades = min_trades
+        self.min_sharpe = min_sharpe
+        self.checkpoint = checkpoint
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional['AbortCriteria']:
+        return None if not config else cls(**config)
+
+    def checkpoint_bar(self, length: int) -> int:
+        return max(1, int(self.checkpoint * (length - 1)))
+
+    def check_drawdown(self, drawdown: float, bar: int) -> None:
+        if self.max_drawdown is not None and drawdown * 100 >= self.max_drawdown:
+            raise BacktestPruned(f"Drawdown reached {self.max_drawdown}%", bar)
+
+    def check_progress(self, index: pd.DatetimeIndex, equity: np.ndarray, trades: int, bar: int) -> None:
+        if self.min_trades is not None and trades < self.min_trades:
+            raise BacktestPruned(f"Fewer than {self.min_trades} trades", bar)
+
+        if self.min_sharpe is not None and calculate_performance(index, equity)['Sharpe Ratio'] < self.min_sharpe:
+            raise BacktestPruned(f"Sharpe ratio below {self.min_sharpe:.2f}", bar)
+
+    def __repr__(self) -> str:
+        return f"AbortCriteria({self.max_drawdown}, {self.min_trades}, {self.min_sharpe}, {self.checkpoint})"
+
+# The exit rule a strategy class declares for itself. A rule only describes the class that declares it and
+# its subclasses up to the first one that overrides next, those run their own logic through backtesting.py.
+def declared_exit_rule(strategy_class: type) -> Optional[str]:
+    for cls in strategy_class.__mro__:
+        if 'exit_rule' in vars(cls):
+            return vars(cls)['exit_rule']
+
+        if 'next' in vars(cls):
+            return None
+
+    return None
+
+# Replays the order handling of backtesting.py for the one-position strategies in strats.py:
+# market orders placed on a bar fill at the next open with the commission added to the entry price,
+# tp/sl orders are checked from the entry bar on with the stop first, and positions still open at the
+# end are closed at the open of the last bar.
+class TrailingState:
+    def __init__(self) -> None:
+        self.stop_loss = -1.0
+        self.max_price = -1.0
+        self.min_price = float('inf')
+
+def calculate_trade_size(size: float, close: float, atr: float) -> float:
+    trade_size = size * (close / (atr ** 2))
+    return max(0.01, min(trade_size, 0.99))
+
+def first_true(values: np.ndarray) -> int:
+    if len(values) == 0:
+        return -1
+
+    index = int(np.argmax(values))
+
+    return index if values[index] else -1
+
+# First event at or after bar, events are the sorted bars a condition holds on
+def next_event(events: np.ndarray, bar: int) -> int:
+    i = int(events.searchsorted(bar))
+    return int(events[i]) if i < len(events) else -1
+
+# Windows from start to end that double in length, so a search that stops at its first hit only
+# looks at about twice the bars it passes instead of every bar left
+def gallop(start: int, end: int, length: int = 16) -> Iterator[Tuple[int, int]]:
+    while start < end:
+        yield start, min(start + length, end)
+        start, length = start + length, length * 2
+
+def find_close_exit(close_bars: np.ndarray, last: int, entry_bar: int, is_long: bool, exit_rule: str) -> Tuple[int, bool]:
+    if (exit_rule == 'green_day' and not is_long) or (exit_rule == 'red_day' and is_long) or exit_rule == 'hold':
+        return last, False
+
+    found = next_event(close_bars, entry_bar)
+
+    if found == -1 or found >= last:
+        return last, False
+
+    return found + 1, True
+
+def find_tpsl_exit(
+    open: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    entry_bar: int,
+    is_long: bool,
+    tp: float,
+    sl: float
+) -> Tuple[int, Optional[float]]:
+    for start, end in gallop(entry_bar, len(open)):
+        if is_long:
+            sl_hit = low[start:end] < sl
+            tp_hit = high[start:end] > tp
+        else:
+            sl_hit = high[start:end] > sl
+            tp_hit = low[start:end] < tp
+
+        found = first_true(sl_hit | tp_hit)
+
+        if found != -1:
+            break
+    else:
+        return -1, None
+
+    bar = start + found
+    price = open[bar]
+
+    if sl_hit[found]:
+        return bar, min(price, sl) if is_long else max(price, sl)
+
+    return bar, max(price, tp) if is_long else min(price, tp)
+
+def find_trailing_exit(close: np.ndarray, atr: np.ndarray, last: int, entry_bar: int, is_long: bool, atr_coef: float, state: TrailingState) -> Tuple[int, bool]:
+    extreme = state.max_price if is_long else state.min_price
+    stop_loss = state.stop_loss
+
+    # The extreme price and the stop are carried from one window to the next
+    for start, end in gallop(entry_bar, last + 1):
+        closes = close[start:end]
+
+        if is_long:
+            previous = np.maximum.accumulate(np.concatenate([[extreme], closes]))
+            new_extreme = closes > previous[:-1]
+        else:
+            previous = np.minimum.accumulate(np.concatenate([[extreme], closes]))
+            new_extreme = closes < previous[:-1]
+
+        latest = np.maximum.accumulate(np.where(new_extreme, np.arange(len(closes)), -1))
+        anchors = np.maximum(latest, 0)
+        offsets = atr[start:end][anchors] * atr_coef
+        stops = np.where(latest >= 0, closes[anchors] - offsets if is_long else closes[anchors] + offsets, stop_loss)
+        found = first_true(closes < stops if is_long else closes > stops)
+
+        if found != -1:
+            break
+
+        extreme, stop_loss = previous[-1], stops[-1]
+    else:
+        return last, False
+
+    # The stop and the extreme price carry over to the next trade like the strategy attributes do
+    state.stop_loss = float(stops[found])
+    state.max_price = float(max(previous[found], closes[found])) if is_long else state.max_price
+    state.min_price = float(min(previous[found], closes[found])) if not is_long else state.min_price
+
+    if start + found >= last:
+        return last, False
+
+    return start + found + 1, True
+
+def update_drawdown(close: np.ndarray, units: int, entry_bar: int, exit_bar: int, entry_price: float, balance: float, peak: float) -> Tuple[float, float]:
+    equity = balance + units * (close[entry_bar:exit_bar] - entry_price)
+
+    if len(equity) == 0:
+        return 0.0, peak
+
+    peaks = np.maximum.accumulate(np.maximum(equity, peak))
+
+    return float((1 - equity / peaks).max()), float(peaks[-1])
+
+def check_progress(
+    df: pd.DataFrame,
+    close: np.ndarray,
+    trades: List[Tuple[int, int, int, float, float]],
+    cash: float,
+    criteria: AbortCriteria,
+    checkpoint_bar: int
+) -> None:
+    equity = calculate_equity(close, trades, None, cash)[:checkpoint_bar + 1]
+    criteria.check_progress(df.index[:checkpoint_bar + 1], equity, sum(entry_bar <= checkpoint_bar for _, entry_bar, _, _, _ in trades), checkpoint_bar)
+
+def simulate_trades(
+    df: pd.DataFrame,
+    strategy_class: type,
+    size: float,
+    cash: float = CASH,
+    commission: float = COMMISSION,
+    params: Optional[Dict[str, Any]] = None,
+    criteria: Optional[AbortCriteria] = None
+) -> Tuple[List[Tuple[int, int, int, float, float]], Optional[Tuple[int, int, float]]]:
+    params = params or {}
+    exit_rule = params.get('exit_rule', declared_exit_rule(strategy_class))
+    always_enter = getattr(strategy_class, 'entry_rule', 'signal') == 'always'
+    tp_coef = params.get('tp_coef', getattr(strategy_class, 'tp_coef', 2))
+    sl_coef = params.get('sl_coef', getattr(strategy_class, 'sl_coef', 2))
+    atr_coef = params.get('atr_coef', getattr(strategy_class, 'atr_coef', 6))
+
+    open, high, low, close = (df[column].to_numpy(dtype=np.float64) for column in ['Open', 'High', 'Low', 'Close'])
+    signal = df['BUYSignal'].to_numpy()
+    atr = df['atr'].to_numpy(dtype=np.float64)
+    # Only the bars that enter or close a trade are visited, flat stretches between them are skipped
+    entry_bars = np.flatnonzero((signal == 1) | (signal == 2))
+    close_bars = np.flatnonzero(close > open if exit_rule == 'green_day' else close < open)
+    last = len(close) - 1
+    state = TrailingState()
+    balance = float(cash)
+    trades = []
+    open_trade = None
+    bar = 1
+    # Abort criteria see the same bars as the backtesting.py strategies, which stop before the close out on the last bar
+    checkpoint_bar = criteria.checkpoint_bar(len(close)) if criteria is not None and criteria.checkpoint_bar(len(close)) < last else None
+    peak = balance
+
+    while bar <= last:
+        if always_enter:
+            signal_bar = bar
+        else:
+            signal_bar = next_event(entry_bars, bar)
+
+            if signal_bar == -1:
+                break
+
+        if checkpoint_bar is not None and signal_bar >= checkpoint_bar:
+            check_progress(df, close, trades, cash, criteria, checkpoint_bar)
+            checkpoint_bar = None
+
+        is_long = always_enter or signal[signal_bar] == 1
+        trade_size = size if always_enter else calculate_trade_size(size, float(close[signal_bar]), float(atr[signal_bar]))
+        # Orders placed on the last bar are filled at its open when the backtest closes out
+        entry_bar = min(signal_bar + 1, last)
+        entry_price = float(open[entry_bar]) * (1 + commission if is_long else 1 - commission)
+        units = int((balance * trade_size) // entry_price)
+
+        if units == 0:
+            if signal_bar == last:
+                break
+
+            bar = entry_bar
+            continue
+
+        units = units if is_long else -units
+
+        if exit_rule == 'tpsl':
+            signal_close, signal_atr = float(close[signal_bar]), float(atr[signal_bar])
+
+            if is_long:
+                tp = signal_close + tp_coef * signal_atr
+                sl = max(0.01, signal_close - sl_coef * signal_atr)
+            else:
+                tp = signal_close - tp_coef * signal_atr
+                sl = max(0.01, signal_close + sl_coef * signal_atr)
+
+            exit_bar, exit_price = find_tpsl_exit(open, high, low, entry_bar, is_long, tp, sl)
+            exited = exit_bar != -1
+        elif signal_bar == last:
+            exited = False
+        elif exit_rule == 'trailing':
+            exit_bar, exited = find_trailing_exit(close, atr, last, entry_bar, is_long, atr_coef, state)
+            exit_price = float(open[exit_bar])
+        else:
+            exit_bar, exited = find_close_exit(close_bars, last, entry_bar, is_long, exit_rule)
+            exit_price = float(open[exit_bar])
+
+        if signal_bar == last and not exited:
+            open_trade = (units, entry_bar, entry_price)
+            break
+
+        if not exited:
+            exit_bar, exit_price = last, float(open[last])
+
+        # backtesting.py closes the position at the close of the first bar its equity is gone and ends the run
+        bankrupt_bar = first_true(balance + units * (close[entry_bar:exit_bar if exited else last + 1] - entry_price) <= 0)
+
+        if bankrupt_bar != -1:
+            exit_bar, exit_price, exited = entry_bar + bankrupt_bar, float(close[entry_bar + bankrupt_bar]), False
+
+        trades.append((units, entry_bar, exit_bar, entry_price, float(exit_price)))
+
+        if criteria is not None:
+            drawdown, peak = update_drawdown(close, units, entry_bar, min(exit_bar, last), entry_price, balance, peak)
+            criteria.check_drawdown(drawdown, min(exit_bar, last) - 1)
+
+        balance += units * (float(exit_price) - entry_price)
+
+        # The strategy is not called on the bar the account runs out of money or after it
+        if balance <= 0:
+            checkpoint_bar = checkpoint_bar if checkpoint_bar is not None and checkpoint_bar < exit_bar else None
+            break
+
+        if criteria is not None and exit_bar < last:
+            peak = max(peak, balance)
+            criteria.check_drawdown(1 - balance / peak, exit_bar)
+
+        if not exited or signal_bar == last:
+            break
+
+        bar = exit_bar
+
+    if checkpoint_bar is not None:
+        check_progress(df, close, trades, cash, criteria, checkpoint_bar)
+
+    return trades, open_trade
+
+def calculate_equity(
+    close: np.ndarray,
+    trades: List[Tuple[int, int, int, float, float]],
+    open_trade: Optional[Tuple[int, int, float]],
+    cash: float = CASH
+) -> np.ndarray:
+    realized = np.zeros(len(close))
+    unrealized = np.zeros(len(close))
+
+    for units, entry_bar, exit_bar, entry_price, exit_price in trades:
+        realized[exit_bar] += units * (exit_price - entry_price)
+        unrealized[entry_bar:exit_bar] = units * (close[entry_bar:exit_bar] - entry_price)
+
+    if open_trade is not None:
+        units, entry_bar, entry_price = open_trade
+        unrealized[entry_bar:] = units * (close[entry_bar:] - entry_price)
+
+    equity = cash + np.cumsum(realized) + unrealized
+    equity[0] = equity[1] if len(equity) > 1 else equity[0]
+    # Equity stays at zero once the account is out of money
+    equity[np.argmax(equity <= 0) if (equity <= 0).any() else len(equity):] = 0
+
+    return equity
+
+def calculate_drawdown_duration(drawdown: np.ndarray, index: pd.DatetimeIndex) -> np.ndarray:
+    peaks = np.unique(np.r_[np.flatnonzero(drawdown == 0), len(drawdown) - 1])
+    durations = np.full(len(drawdown), np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    ends = peaks[1:][peaks[1:] > peaks[:-1] + 1]
+    starts = peaks[:-1][peaks[1:] > peaks[:-1] + 1]
+    dates = index.to_numpy(dtype='datetime64[ns]')
+    durations[ends] = dates[ends] - dates[starts]
+
+    return durations
+
+def geometric_mean(returns: np.ndarray) -> float:
+    returns = np.nan_to_num(returns) + 1
+
+    if np.any(returns <= 0):
+        return 0
+
+    return np.exp(np.log(returns).sum() / (len(returns) or np.nan)) - 1
+
+def calculate_performance(index: pd.DatetimeIndex, equity: np.ndarray, drawdown: Optional[np.ndarray] = None) -> Dict[str, float]:
+    drawdown = 1 - equity / np.maximum.accumulate(equity) if drawdown is None else drawdown
+    days = index.to_numpy(dtype='datetime64[D]')
+    day_ends = np.r_[np.flatnonzero(days[1:] != days[:-1]), len(days) - 1]
+    day_equity = equity[day_ends]
+    day_returns = np.r_[np.nan, day_equity[1:] / day_equity[:-1] - 1]
+    annual_trading_days = 365 if index.dayofweek.to_series().between(5, 6).mean() > 2 / 7 * .6 else 252
+    gmean_day_return = geometric_mean(day_returns)
+    annualized_return = (1 + gmean_day_return) ** annual_trading_days - 1
+    volatility = np.sqrt((np.nanvar(day_returns, ddof=1) + (1 + gmean_day_return) ** 2) ** annual_trading_days - (1 + gmean_day_return) ** (2 * annual_trading_days))
+    downside = np.sqrt(np.nanmean(np.clip(day_returns, -np.inf, 0) ** 2)) * np.sqrt(annual_trading_days)
+    max_drawdown = -np.nan_to_num(drawdown.max())
+
+    return {
+        'Return [%]': (equity[-1] - equity[0]) / equity[0] * 100,
+        'Return (Ann.) [%]': annualized_return * 100,
+        'Volatility (Ann.) [%]': volatility * 100,
+        'Sharpe Ratio': np.clip(annualized_return * 100 / (volatility * 100 or np.nan), 0, np.inf),
+        'Sortino Ratio': np.clip(annualized_return / downside, 0, np.inf),
+        'Calmar Ratio': np.clip(annualized_return / (-max_drawdown or np.nan), 0, np.inf),
+        'Max. Drawdown [%]': max_drawdown * 100
+    }
+
+def calculate_stats(df: pd.DataFrame, trades: List[Tuple[int, int, int, float, float]], equity: np.ndarray) -> Dict[str, Any]:
+    index = df.index
+    close = df['Close'].to_numpy(dtype=np.float64)
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    durations = calculate_drawdown_duration(drawdown, index)
+    equity_curve = pd.DataFrame({'Equity': equity, 'DrawdownPct': drawdown, 'DrawdownDuration': durations}, index=index)
+
+    units, entry_bars, exit_bars, entry_prices, exit_prices = (np.array(column) for column in zip(*trades)) if trades else (np.array([], dtype=int),) * 3 + (np.array([]),) * 2
+    pnl = units * (exit_prices - entry_prices)
+    trades_df = pd.DataFrame({
+        'Size': units,
+        'EntryBar': entry_bars,
+        'ExitBar': exit_bars,
+        'EntryPrice': entry_prices,
+        'ExitPrice': exit_prices,
+        'PnL': pnl,
+        'ReturnPct': np.sign(units) * (exit_prices / entry_prices - 1),
+        'EntryTime': index[entry_bars],
+        'ExitTime': index[exit_bars]
+    })
+    trades_df['Duration'] = trades_df['ExitTime'] - trades_df['EntryTime']
+
+    exposure = np.zeros(len(equity), dtype=bool)
+
+    for entry_bar, exit_bar in zip(entry_bars, exit_bars):
+        exposure[entry_bar:exit_bar + 1] = True
+
+    performance = calculate_performance(index, equity, drawdown)
+
+    stats = {
+        'Start': index[0],
+        'End': index[-1],
+        'Duration': index[-1] - index[0],
+        'Exposure Time [%]': exposure.mean() * 100,
+        'Equity Final [$]': equity[-1],
+        'Equity Peak [$]': equity.max(),
+        'Return [%]': performance['Return [%]'],
+        'Buy & Hold Return [%]': (close[-1] - close[0]) / close[0] * 100,
+        'Return (Ann.) [%]': performance['Return (Ann.) [%]'],
+        'Volatility (Ann.) [%]': performance['Volatility (Ann.) [%]'],
+        'Sharpe Ratio': performance['Sharpe Ratio'],
+        'Sortino Ratio': performance['Sortino Ratio'],
+        'Calmar Ratio': performance['Calmar Ratio'],
+        'Max. Drawdown [%]': performance['Max. Drawdown [%]'],
+        '# Trades': len(trades),
+        'Win Rate [%]': (pnl > 0).mean() * 100 if len(trades) else np.nan,
+        'Avg. Trade Duration': trades_df['Duration'].mean(),
+        '_equity_curve': equity_curve,
+        '_trades': trades_df
+    }
+
+    if isinstance(stats['Avg. Trade Duration'], pd.Timedelta):
+        period = pd.Series(index[-100:]).diff().dropna().median()
+        stats['Avg. Trade Duration'] = stats['Avg. Trade Duration'].ceil(period.resolution_string)
+
+    return stats
+
+def run_vectorized_backtest(
+    df: pd.DataFrame,
+    strategy_class: type,
+    size: float,
+    cash: float = CASH,
+    commission: float = COMMISSION,
+    params: Optional[Dict[str, Any]] = None,
+    criteria: Optional[AbortCriteria] = None
+) -> Dict[str, Any]:
+    exit_rule = (params or {}).get('exit_rule', declared_exit_rule(strategy_class))
+
+    if exit_rule not in EXIT_RULES:
+        raise ValueError(f"Unsupported exit rule: {exit_rule}")
+
+    trades, open_trade = simulate_trades(df, strategy_class, size, cash, commission, params, criteria)
+    equity = calculate_equity(df['Close'].to_numpy(dtype=np.float64), trades, open_trade, cash)
+
+    return calculate_stats(df, trades, equity)
@@ -0,0 +1,70 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import core.engine as engine
+import core.indicators as indicators
+from core.indicators import IndicatorCache
+from typing import Optional, Any, Callable
+
+
+# Results of the last backtests of this process by fingerprint, its counters follow the indicator cache's
+backtest_cache = IndicatorCache(64, offset=3)
+
+
+# Backtests of classes that declare the entry and exit rules the vectorized engine implements only
+# depend on where the signal enters long or short, the exit rule with its coefficients and the bars.
+# Classes with their own next and no exit rule of their own are not fingerprinted.
+# NaNs in the signal and ATR are kept as backtesting.py starts calling next once its indicators have values.
+def fingerprint(
+    df: pd.DataFrame,
+    strategy_class: type,
+    size: float,
+    backtest_engine: str,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> Optional[str]:
+    entry_rule = getattr(strategy_class, 'entry_rule', 'signal')
+    exit_rule = engine.declared_exit_rule(strategy_class)
+
+    if exit_rule not in engine.EXIT_RULES:
+        return None
+
+    signal = df['BUYSignal'].to_numpy(dtype=np.float64)
+    digest = hashlib.sha1(indicators.data_version(df).encode())
+    digest.update(np.packbits(np.isnan(signal)).tobytes())
+    digest.update(np.ascontiguousarray(df['atr'].to_numpy(dtype=np.float64)).tobytes())
+
+    if entry_rule != 'always':
+        digest.update(np.where(np.isin(signal, [1, 2]), signal, 0).astype(np.int8).tobytes())
+
+    coefficients = {
+        'tpsl': (getattr(strategy_class, 'tp_coef', 2), getattr(strategy_class, 'sl_coef', 2)),
+        'trailing': (getattr(strategy_class, 'atr_coef', 6),)
+    }.get(exit_rule, ())
+    digest.update(repr((entry_rule, exit_rule, coefficients, size, backtest_engine, criteria)).encode())
+
+    return digest.hexdigest()
+
+# Runs the backtest unless one with the same fingerprint already ran in this process
+def run_once(
+    df: pd.DataFrame,
+    strategy_class: type,
+    size: float,
+    backtest_engine: str,
+    criteria: Optional[engine.AbortCriteria],
+    run: Callable[[], Any]
+) -> Any:
+    key = fingerprint(df, strategy_class, size, backtest_engine, criteria)
+    result = run() if key is None else backtest_cache.get((key,), run)
+
+    if indicators.shared_counters is not None:
+        backtest_cache.flush(indicators.shared_counters)
+
+    return result
+
+def print_stats(counters: Optional[Any] = None) -> None:
+    hits, misses = counters[3:5] if counters is not None else (backtest_cache.hits, backtest_cache.misses)
+
+    if hits + misses == 0:
+        return
+
+    print(f"Skipped {hits} duplicate backtests of {hits + misses} ({round(100 * hits / (hits + misses), 2)}%).")
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+from collections import OrderedDict
+from multiprocessing import Array
+from typing import Dict, Optional, Callable, Any, Tuple
+
+
+INDICATORS: Dict[str, Callable[..., Any]] = {
+    'atr': lambda df, length: ta.atr(df['High'], df['Low'], df['Close'], length=length),
+    'rsi': lambda df, length: ta.rsi(df['Close'], length=length),
+    'roc': lambda df, length: ta.roc(df['Close'], length=length),
+    'ema': lambda df, length: ta.ema(df['Close'], length=length),
+    'macd': lambda df, fast, slow, signal: ta.macd(df['Close'], fast=fast, slow=slow, signal=signal),
+    'stoch': lambda df: ta.stoch(df['High'], df['Low'], df['Close']),
+}
+
+
+# Counters of the indicator cache followed by those of the backtest fingerprint cache
+COUNTERS = 6
+
+
+class IndicatorCache:
+    # Offset of the cache's hits, misses and evictions in the shared counters
+    def __init__(self, max_entries: int = 512, offset: int = 0) -> None:
+        self.max_entries = max_entries
+        self.offset = offset
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushed = (0, 0, 0)
+
+    def get(self, key: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+            self.misses += 1
+
+        value = compute()
+        self.put(key, value)
+
+        return value
+
+    def put(self, key: Tuple[Any, ...], value: Any) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self.entries)}
+
+    # Adds what changed since the last flush to the shared counters
+    def flush(self, counters: Any) -> None:
+        with self.lock:
+            current = (self.hits, self.misses, self.evictions)
+            deltas = [now - before for now, before in zip(current, self.flushed)]
+            self.flushed = current
+
+        with counters.get_lock():
+            for i, delta in enumerate(deltas):
+                counters[self.offset + i] += delta
+
+indicator_cache = IndicatorCache()
+shared_counters = None
+
+
+def data_version(df: pd.DataFrame) -> str:
+    digest = hashlib.sha1(np.ascontiguousarray(df.index.to_numpy()).tobytes())
+    digest.update(np.ascontiguousarray(df[['Open', 'High', 'Low', 'Close']].to_numpy(dtype=np.float64)).tobytes())
+
+    return digest.hexdigest()
+
+def indicator_key(df: pd.DataFrame, symbol: Optional[str], name: str, params: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (symbol, df.attrs.get('data_version') or data_version(df), name, tuple(sorted(params.items())))
+
+def indicator(df: pd.DataFrame, name: str, column: Optional[str] = None, **params: Any) -> Any:
+    key = indicator_key(df, df.attrs.get('symbol'), name, params)
+    values = indicator_cache.get(key, lambda: INDICATORS[name](df, **params))
+
+    return values if column is None else values[column]
+
+# Stores values computed elsewhere, such as on the whole price panel, where indicator() looks them up
+def prime(df: pd.DataFrame, symbol: str, name: str, values: Any, **params: Any) -> None:
+    indicator_cache.put(indicator_key(df, symbol, name, params), values)
+
+def create_counters() -> Any:
+    return Array('q', COUNTERS)
+
+# Pool workers add their counters to arrays shared with the parent so a run can report totals
+def set_shared_counters(counters: Any) -> None:
+    global shared_counters
+    shared_counters = counters
+
+def flush_stats() -> None:
+    if shared_counters is not None:
+        indicator_cache.flush(shared_counters)
+
+def print_stats(counters: Optional[Any] = None) -> None:
+    hits, misses, evictions = counters[:3] if counters is not None else (indicator_cache.hits, indicator_cache.misses, indicator_cache.evictions)
+    lookups = hits + misses
+
+    if lookups == 0:
+        return
+
+    print(f"Indicator cache: {hits} hits, {misses} misses ({round(100 * hits / lookups, 2)}% hit rate), {evictions} evictions.")
@@ -1,18 +1,21 @@
 from core.plotter import plot, plot_divided
 from core.utils import calculate_sharpe_ratio, calculate_optimal_portfolio, calculate_adaptive_portfolio
+from core.metrics import calculate_metrics
+from core.results import ResultSet
+from core.portfolio import combine_equity
 from pprint import pprint
 import numpy as np
-import pandas as pd
 import json
 from typing import List, Dict, Any, Optional
 
 
-def log_all_results(results: List[Dict[str, Any]], strategies: Dict[str, int], find_best: bool, optimize_portfolio: bool, adaptive_portfolio: bool) -> None:
+def log_all_results(results: List[Dict[str, Any]], strategies: Dict[str, int], find_best: bool, optimize_portfolio: bool, adaptive_portfolio: bool, log_results: bool = True) -> None:
     with open('data/config.json', 'r') as file:
         config = json.load(file)
 
-    for result in results:
-        log_simple(result)
+    if log_results:
+        for result in results:
+            log_simple(result)
 
     if config['find_best'] or find_best:
         compare_results(strategies)
@@ -49,13 +52,13 @@ def log_aggregated_results(results: List[Dict[str, Any]]) -> None:
         print("No results to aggregate.")
         return
 
-    equity_curve = pd.DataFrame()
     starting_balance = 100000
     trade_count = sum(result['# trades'] for result in results)
     sharpe_sum = sum(result['sharpe'] for result in results)
 
-    equity_curve['DrawdownPct'] = sum(result['equity_curve']['DrawdownPct'] for result in results) / len(results)
-    equity_curve['Equity'] = sum(result['equity_curve']['Equity'] for result in results) / len(results)
+    # The capital is split equally between the results
+    dates, equity = ResultSet(results).layout(list(range(len(results))))
+    equity_curve = combine_equity(dates, equity, np.full(len(results), 1 / len(results)), cash=starting_balance)
 
     combined_sharpe = calculate_sharpe_ratio(equity_curve['Equity'])
     max_drawdown_index = equity_curve['DrawdownPct'].idxmax().strftime('%Y-%m-%d')
@@ -73,29 +76,52 @@ def log_aggregated_results(results: List[Dict[str, Any]]) -> None:
 def log_optimized_portfolio(results: List[Dict[str, Any]]) -> None:
     sharpe_threshold = 0.3
     starting_balance = 100000
-    optimal_portfolio, optimal_weights, optimized_sharpe = calculate_optimal_portfolio(results, 1, sharpe_threshold)
-    dfs = [result['equity_curve'] for result in results if result['sharpe'] >= sharpe_threshold]
-    n_assets = len(dfs)
-    equity_df_combined = sum(dfs[i]['Equity'] * optimal_weights[i] for i in range(n_assets)).dropna()
-    drawdown_df_combined = sum(dfs[i]['DrawdownPct'] * optimal_weights[i] for i in range(n_assets)).dropna()
+    results = [result.copy() for result in results if result['sharpe'] >= sharpe_threshold]
+    optimal_portfolio, optimized_sharpe = calculate_optimal_portfolio(results, len(results))
+    # Weights under 1% are left out of the portfolio and are not set on the results
+    optimal_weights = np.array([result.get('weight', 0) for result in results], dtype=float)
+    rows = list(np.flatnonzero(optimal_weights))
+    dates, equity = ResultSet(results).layout(rows)
+    equity_curve = combine_equity(dates, equity, optimal_weights[rows], cash=starting_balance)
+    equity_df_combined = equity_curve['Equity']
+    drawdown_df_combined = equity_curve['DrawdownPct']
     max_drawdown_index = drawdown_df_combined.idxmax().strftime('%Y-%m-%d')
 
     pprint(optimal_portfolio)
     print(f"Final aggregated equity: ${round(equity_df_combined.iloc[-1])}")
     print(f"Return: {round(100 * (equity_df_combined.iloc[-1] - starting_balance) / starting_balance, 2)}%")
     print(f"Maximum aggregated drawdown: {round(drawdown_df_combined.max() * 100, 2)}% at date: {max_drawdown_index}")
+    print(f"Longest drawdown: {equity_curve['DrawdownDuration'].max().days} days")
     print(f"Optimized Sharpe Ratio: {round(optimized_sharpe, 2)}")
     plot(equity_df_combined)
 
 def log_adaptive_portfolio(results: List[Dict[str, Any]], n_divisions: int = 4, strategy_limit: int = 25) -> None:
     starting_balance = 100000.0
     optimal_portfolios, sharpe_ratios = calculate_adaptive_portfolio(results, n_divisions, strategy_limit)
-    division_length = len(results[0]['equity_curve']['Equity']) // n_divisions
-    equity_index = results[0]['equity_curve']['Equity'].index[division_length:]
-    drawdown_index = results[0]['equity_curve']['DrawdownPct'].index[division_length:]
-    
-    equity_df_combined = pd.Series(starting_balance, index=equity_index, dtype=float)
-    drawdown_df_combined = pd.Series(0, index=drawdown_index, dtype=float)
+    result_set = ResultSet(results)
+    first_columns = result_set.columns(0)
+    division_length = len(first_columns) // n_divisions
+    portfolios = optimal_portfolios[:n_divisions - 1]
+
+    # The portfolio optimized on a division is held over the next one, on the dates of the first result
+    entries = [
+        [(result_set.index[(symbol, strategy['strategy'])], strategy) for symbol, data in portfolio.items() for strategy in data]
+        for portfolio in portfolios
+    ]
+    rows = sorted({row for division_entries in entries for row, _ in division_entries})
+    positions = {row: i for i, row in enumerate(rows)}
+    weights = np.zeros((len(portfolios), len(rows)))
+
+    for i, division_entries in enumerate(entries):
+        for row, strategy in division_entries:
+            weights[i, positions[row]] = strategy['weight']
+
+    held = np.zeros(len(result_set.dates), dtype=bool)
+    held[first_columns[division_length:n_divisions * division_length]] = True
+    dates, equity = result_set.layout(rows, present=held)
+    equity_curve = combine_equity(dates, equity, weights, [i * division_length for i in range(len(portfolios))], starting_balance)
+    equity_df_combined = equity_curve['Equity']
+    drawdown_df_combined = equity_curve['DrawdownPct']
 
     print(f"--------- Division 0/{n_divisions - 1} ---------")
     print("Used for optimizing.")
@@ -106,34 +132,12 @@ def log_adaptive_portfolio(results: List[Dict[str, Any]], n_divisions: int = 4,
         start_index_shifted = start_index - division_length
         end_index_shifted = end_index - division_length
 
-        previous_equity_end = equity_df_combined.iloc[start_index_shifted - 1] if start_index_shifted > 0 else starting_balance
-        portfolio = optimal_portfolios[i - 1]
+        if entries[i - 1]:
+            division_rows = [row for row, _ in entries[i - 1]]
+            division_dates, division_equity = result_set.layout(division_rows, start_index, end_index)
 
-        for symbol, data in portfolio.items():
-            current_results = [
-                result for result in results
-                if result['symbol'] == symbol and result['strategy'] in [df['strategy'] for df in data]
-            ]
-
-            for current_result in current_results:
-                equity_curve = current_result['equity_curve']['Equity']
-                drawdown_curve = current_result['equity_curve']['DrawdownPct']
-                
-                equity_curve_adjusted = equity_curve - equity_curve.iloc[start_index]
-                drawdown_curve_adjusted = drawdown_curve - drawdown_curve.iloc[start_index]
-
-                for strategy in data:
-                    if strategy['strategy'] == current_result['strategy']:
-                        equity = equity_curve_adjusted[start_index:end_index] * strategy['weight']
-                        drawdown = drawdown_curve_adjusted[start_index:end_index] * strategy['weight']
-                        strategy['sharpe'] = round(calculate_sharpe_ratio(equity_curve[start_index:end_index]), 4)
-
-                        equity_df_combined[start_index_shifted:end_index_shifted] += equity
-                        drawdown_df_combined[start_index_shifted:end_index_shifted] += drawdown
-                        break
-
-        transition_value = equity_df_combined.iloc[start_index_shifted] if start_index_shifted > 0 else starting_balance
-        equity_df_combined[start_index_shifted:end_index_shifted] += (previous_equity_end - transition_value)
+            for (_, strategy), sharpe_ratio in zip(entries[i - 1], calculate_metrics(division_dates, division_equity)['sharpe']):
+                strategy['sharpe'] = round(sharpe_ratio, 4)
 
         current_sharpe_ratio = round(calculate_sharpe_ratio(equity_df_combined[start_index_shifted:end_index_shifted]), 4)
         predicted_sharpe_ratio = round(sharpe_ratios[i - 1], 4)
@@ -147,7 +151,6 @@ def log_adaptive_portfolio(results: List[Dict[str, Any]], n_divisions: int = 4,
         print(f"Predicted Sharpe Ratio: {predicted_sharpe_ratio}")
         pprint(optimal_portfolios[i - 1])
 
-    equity_df_combined = equity_df_combined.loc[equity_df_combined != starting_balance].dropna()
     adaptive_sharpe = calculate_sharpe_ratio(equity_df_combined)
     max_drawdown_index = drawdown_df_combined.idxmax().strftime('%Y-%m-%d')
 
@@ -155,6 +158,7 @@ def log_adaptive_portfolio(results: List[Dict[str, Any]], n_divisions: int = 4,
     print(f"Final aggregated equity: ${round(equity_df_combined.iloc[-1])}")
     print(f"Return: {round(100 * (equity_df_combined.iloc[-1] - starting_balance) / starting_balance, 2)}%")
     print(f"Maximum aggregated drawdown: {round(drawdown_df_combined.max() * 100, 2)}% at date: {max_drawdown_index}")
+    print(f"Longest drawdown: {equity_curve['DrawdownDuration'].max().days} days")
     print(f"Adaptive Sharpe Ratio: {round(adaptive_sharpe, 2)}")
     plot_divided(equity_df_combined, n_divisions - 1)
 
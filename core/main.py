@@ -1,15 +1,44 @@
 from core.data_manipulator import load_symbols
+from core.checkpoint import Checkpoint, create_job_id
 from strategies.strategy_tester import run_master_backtest
+import argparse
+import json
 import random
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run a batch of backtests.")
+    parser.add_argument('--symbols', nargs='+', help="Symbols to backtest")
+    parser.add_argument('--index', help="Backtest every symbol of an index: SP, NQ, R2000 or futures")
+    parser.add_argument('--strategy', default='ROC_Mean_Reversion', help="Strategy used when strategies are not compared")
+    parser.add_argument('--workers', type=int, help="Number of worker processes, defaults to the number of CPUs")
+    parser.add_argument('--executor', choices=['process', 'thread', 'distributed'], help="Overrides the executor of the config, distributed hands jobs to workers started with python -m core.distributed")
+    parser.add_argument('--job-id', help="Checkpoint id of the run, derived from the symbols, strategy and config by default")
+    parser.add_argument('--resume', action='store_true', help="Continue the job from its checkpoint instead of starting over")
+
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+
     # SP for S&P500, NQ for Nasdaq, R2000 for Russell 2000
     # symbols = load_symbols('SP')
     symbols = ['SPY', 'QQQ']
     # symbols = ['TSLA', 'AAPL', 'MSFT', 'AMZN', 'GOOGL', 'META', 'NFLX', 'NVDA', 'AMD']
     # symbols = load_symbols('futures')
     # symbols = random.sample(symbols, min(len(symbols), 25))
-    strategy = 'ROC_Mean_Reversion'
-    
-    run_master_backtest(symbols, strategy)
+
+    if args.index is not None:
+        symbols = load_symbols(args.index)
+    elif args.symbols is not None:
+        symbols = args.symbols
+
+    with open('data/config.json', 'r') as file:
+        config = json.load(file)
+
+    job_id = args.job_id or create_job_id(symbols, args.strategy, config)
+    print(f"{'Resuming' if args.resume else 'Starting'} job {job_id}.")
+
+    with Checkpoint(job_id, args.resume) as checkpoint:
+        checkpoint.describe({'symbols': symbols, 'strategy': args.strategy, 'config': config})
+        run_master_backtest(symbols, args.strategy, executor=args.executor, workers=args.workers, checkpoint=checkpoint)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Tuple
+
+
+ANNUAL_TRADING_DAYS = 252
+RISK_FREE_RATE = 0.03
+METRICS = ['sharpe', 'sortino', 'cagr', 'volatility', 'max_drawdown', 'calmar']
+
+
+# Equity at the last bar of every calendar day, NaN where a curve has no value on that day,
+# which is what resample('D').last() gives before the empty days are dropped
+def daily_equity(index: pd.DatetimeIndex, equity: np.ndarray) -> np.ndarray:
+    days = index.to_numpy(dtype='datetime64[D]')
+    day_starts = np.r_[0, np.flatnonzero(days[1:] != days[:-1]) + 1]
+    day_ends = np.r_[day_starts[1:], len(days)] - 1
+    valid = ~np.isnan(equity)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(equity.shape[1]), -1), axis=1)[:, day_ends]
+    values = np.take_along_axis(equity, np.maximum(last_valid, 0), axis=1)
+
+    return np.where(last_valid >= day_starts, values, np.nan)
+
+# Daily returns between the days a curve has values on, the first of them is NaN like pct_change gives
+def daily_returns(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    valid = ~np.isnan(values)
+    previous = np.maximum.accumulate(np.where(valid, np.arange(values.shape[1]), -1), axis=1)
+    previous = np.c_[np.full(len(values), -1), previous[:, :-1]]
+    previous_values = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+    returns = np.where(valid & (previous >= 0), values / previous_values - 1, np.nan)
+
+    return returns, valid
+
+# Daily returns of equity curves on the union of their days, like pandas aligns the
+# resample('D').last().dropna().pct_change() of every curve. Also returns where curves have a value.
+def aligned_daily_returns(equity_curves: List[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    equity = pd.concat(equity_curves, axis=1, ignore_index=True, sort=True)
+    returns, valid = daily_returns(daily_equity(equity.index, equity.to_numpy(dtype=np.float64).T))
+    days = valid.any(axis=0)
+
+    return returns[:, days], valid[:, days]
+
+def geometric_means(returns: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    growth = np.where(valid, np.nan_to_num(returns) + 1, 1)
+    counts = valid.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = np.exp(np.log(np.where(growth > 0, growth, 1)).sum(axis=1) / np.where(counts > 0, counts, np.nan)) - 1
+
+    return np.where((growth <= 0).any(axis=1), 0, means)
+
+def max_drawdowns(equity: np.ndarray) -> np.ndarray:
+    peaks = np.fmax.accumulate(equity, axis=1)
+
+    with np.errstate(invalid='ignore'):
+        return np.nanmax(np.where(np.isnan(equity), 0, 1 - equity / peaks), axis=1, initial=0) * 100
+
+# Sharpe, volatility and CAGR follow utils.calculate_sharpe_ratio, Sortino and Calmar are measured the
+# way backtesting.py does it. Rows are equity curves aligned on index, NaN where a curve has no value.
+def calculate_metrics(index: pd.DatetimeIndex, equity: np.ndarray, risk_free_rate: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    equity = np.atleast_2d(np.asarray(equity, dtype=np.float64))
+    returns, valid = daily_returns(daily_equity(index, equity))
+    gmean_day_return = geometric_means(returns, valid)
+    cagr = ((1 + gmean_day_return) ** ANNUAL_TRADING_DAYS - 1) * 100
+
+    counts = (~np.isnan(returns)).sum(axis=1)
+    filled = np.nan_to_num(returns)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = filled.sum(axis=1) / counts
+        variance = (np.where(np.isnan(returns), 0, returns - mean[:, None]) ** 2).sum(axis=1) / (counts - 1)
+        variance = np.where(counts > 1, variance, np.nan)
+        volatility = np.sqrt((variance + (1 + gmean_day_return) ** 2) ** ANNUAL_TRADING_DAYS - (1 + gmean_day_return) ** (2 * ANNUAL_TRADING_DAYS)) * 100
+        sharpe = np.where(volatility == 0, -1, (cagr - risk_free_rate * 100) / volatility)
+        downside = np.sqrt((np.clip(filled, -np.inf, 0) ** 2).sum(axis=1) / counts) * np.sqrt(ANNUAL_TRADING_DAYS) * 100
+        max_drawdown = max_drawdowns(equity)
+
+        return {
+            'sharpe': sharpe,
+            'sortino': cagr / downside,
+            'cagr': cagr,
+            'volatility': volatility,
+            'max_drawdown': max_drawdown,
+            'calmar': cagr / max_drawdown
+        }
+
+# Metrics of every curve over each (start, end) window of bar positions, arrays are curves x windows
+def calculate_window_metrics(index: pd.DatetimeIndex, equity: np.ndarray, windows: List[Tuple[int, int]], risk_free_rate: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    window_metrics = [calculate_metrics(index[start:end], np.atleast_2d(equity)[:, start:end], risk_free_rate) for start, end in windows]
+    return {metric: np.stack([metrics[metric] for metrics in window_metrics], axis=1) for metric in METRICS}
@@ -0,0 +1,134 @@
+import sys
+import numpy as np
+import pandas as pd
+import core.price_store as pstore
+from typing import List, Dict, Optional, Callable, Tuple, Any
+
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class PricePanel:
+    def __init__(self, symbols: List[str], dates: np.ndarray, values: np.ndarray, valid: np.ndarray) -> None:
+        self.symbols = symbols
+        self.dates = dates
+        self.values = values
+        self.valid = valid
+        self.symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Dict[str, np.ndarray]]) -> 'PricePanel':
+        symbols = list(columns.keys())
+        dates = np.unique(np.concatenate([np.asarray(arrays['Date'], dtype='datetime64[ns]') for arrays in columns.values()]))
+        values = np.full((len(symbols), len(dates), len(FIELDS)), np.nan)
+        valid = np.zeros((len(symbols), len(dates)), dtype=bool)
+
+        for i, arrays in enumerate(columns.values()):
+            positions = np.searchsorted(dates, np.asarray(arrays['Date'], dtype='datetime64[ns]'))
+            valid[i, positions] = True
+
+            for j, field in enumerate(FIELDS):
+                values[i, positions, j] = arrays[field]
+
+        return cls(symbols, dates, values, valid)
+
+    @classmethod
+    def from_frames(cls, stock_data: Dict[str, Optional[pd.DataFrame]]) -> 'PricePanel':
+        return cls.from_columns({symbol: {column: df[column].to_numpy() for column in ['Date'] + FIELDS} for symbol, df in stock_data.items() if df is not None})
+
+    @classmethod
+    def from_store(cls, symbols: List[str], path: str = pstore.STORE_PATH) -> 'PricePanel':
+        manifest = pstore.load_manifest(path)
+        columns = {symbol: pstore.read_columns(symbol, manifest, ['Date'] + FIELDS, path) for symbol in symbols}
+
+        return cls.from_columns({symbol: arrays for symbol, arrays in columns.items() if arrays is not None})
+
+    def field(self, name: str) -> np.ndarray:
+        return self.values[:, :, FIELDS.index(name)]
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        i = self.symbol_index[symbol]
+        rows = self.valid[i]
+        df = pd.DataFrame(self.values[i, rows], columns=FIELDS)
+        df.insert(0, 'Date', self.dates[rows])
+
+        return df
+
+    def to_frames(self) -> Dict[str, pd.DataFrame]:
+        return {symbol: self.frame(symbol) for symbol in self.symbols}
+
+    def select(self, symbols: List[str]) -> 'PricePanel':
+        indices = [self.symbol_index[symbol] for symbol in symbols]
+
+        return PricePanel(list(symbols), self.dates, self.values[indices], self.valid[indices])
+
+    # Indicator of every symbol at once, NaN where a symbol has no bar
+    def indicator(self, name: str, **params: Any) -> np.ndarray:
+        compacted = {field: compact(self.field(field), self.valid)[0] for field in FIELDS}
+
+        return expand(PANEL_INDICATORS[name](compacted, **params), compact_order(self.valid), self.valid)
+
+# Indicators run on each symbol's own bars. Valid bars are packed to the left of every row so that
+# shifts and recursions never see the gaps, and the results are scattered back afterwards.
+def compact_order(valid: np.ndarray) -> np.ndarray:
+    return np.argsort(~valid, axis=1, kind='stable')
+
+def compact(values: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    order = compact_order(valid)
+    compacted = np.take_along_axis(values, order, axis=1)
+    compacted[~np.take_along_axis(valid, order, axis=1)] = np.nan
+
+    return compacted, order
+
+def expand(compacted: np.ndarray, order: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    values = np.empty(compacted.shape, dtype=compacted.dtype)
+    np.put_along_axis(values, order, compacted, axis=1)
+    values[~valid] = np.nan
+
+    return values
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    shifted = np.full(values.shape, np.nan)
+    shifted[:, periods:] = values[:, :values.shape[1] - periods]
+
+    return shifted
+
+# Same recursion as pandas' ewm(alpha=1 / length, min_periods=length).mean(), which pandas_ta uses,
+# so the values match a per-symbol computation exactly
+def rma(values: np.ndarray, length: int) -> np.ndarray:
+    decay = 1 - 1 / length
+    weighted = values[:, 0].copy()
+    old_weight = np.ones(len(values))
+    count = (~np.isnan(weighted)).astype(int)
+    result = np.full(values.shape, np.nan)
+    result[:, 0] = np.where(count >= length, weighted, np.nan)
+
+    for t in range(1, values.shape[1]):
+        current = values[:, t]
+        observed = ~np.isnan(current)
+        started = ~np.isnan(weighted)
+        count += observed
+        old_weight = np.where(started, old_weight * decay, old_weight)
+        updated = started & observed & (weighted != current)
+        weighted = np.where(updated, (old_weight * weighted + current) / (old_weight + 1), np.where(started, weighted, current))
+        old_weight = np.where(started & observed, old_weight + 1, old_weight)
+        result[:, t] = np.where(count >= length, weighted, np.nan)
+
+    return result
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    high_low = high - low
+    # pandas_ta nudges every range of a symbol that has a zero range anywhere
+    high_low = high_low + np.where(np.any(high_low == 0, axis=1, keepdims=True), sys.float_info.epsilon, 0)
+    previous_close = shift(close)
+    result = np.max(np.abs(np.stack([high_low, high - previous_close, previous_close - low])), axis=0)
+    result[:, 0] = np.nan
+
+    return result
+
+def atr(fields: Dict[str, np.ndarray], length: int = 14) -> np.ndarray:
+    return rma(true_range(fields['High'], fields['Low'], fields['Close']), length)
+
+PANEL_INDICATORS: Dict[str, Callable[..., np.ndarray]] = {
+    'atr': atr,
+}
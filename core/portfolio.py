@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import core.engine as engine
+from typing import Optional, Sequence
+
+
+CASH = 100000
+
+
+# Carries the last value of every curve over the bars it has no value on, bars before its first
+# value stay NaN
+def fill_gaps(equity: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(equity)
+    last_valid = np.maximum.accumulate(np.where(valid, np.arange(equity.shape[1]), -1), axis=1)
+    filled = np.take_along_axis(equity, np.maximum(last_valid, 0), axis=1)
+
+    return np.where(last_valid >= 0, filled, np.nan)
+
+# Growth of weighted curves over a block of bars relative to its first bar, curves that have not
+# started yet are held as cash until their first value
+def calculate_growth(block: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    started = ~np.isnan(block)
+    first_values = block[np.arange(len(block)), started.argmax(axis=1)]
+    relative = np.where(started, block, first_values[:, None]) / first_values[:, None]
+
+    return weights @ np.nan_to_num(relative, nan=1)
+
+# Equity of a portfolio that splits its capital between equity curves by weight, with the drawdown
+# from its running peak and how long each drawdown lasted. Curves are rows aligned on index, NaN
+# where a curve has no bar, and the capital without weight is held as cash. A weight schedule has
+# a row of weights per division, the portfolio is rebalanced to it on the bar before the division
+# starts. Curves are filled a block of rows at a time.
+def combine_equity(
+    index: pd.DatetimeIndex,
+    equity: np.ndarray,
+    weights: np.ndarray,
+    starts: Optional[Sequence[int]] = None,
+    cash: float = CASH,
+    block_size: int = 256
+) -> pd.DataFrame:
+    weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+    starts = [0] if starts is None else list(starts)
+    bounds = [(max(start - 1, 0), end) for start, end in zip(starts, starts[1:] + [len(index)])]
+    growths = [np.full(max(end - base, 0), 1 - division_weights.sum()) for division_weights, (base, end) in zip(weights, bounds)]
+
+    # Curves without weight in any division do not move the portfolio
+    held = np.flatnonzero(weights.any(axis=0))
+
+    for i in range(0, len(held), block_size):
+        rows = held[i:i + block_size]
+        filled = fill_gaps(np.asarray(equity[rows], dtype=np.float64))
+
+        for growth, division_weights, (base, end) in zip(growths, weights, bounds):
+            if end > base:
+                growth += calculate_growth(filled[:, base:end], division_weights[rows])
+
+    combined = np.full(len(index), float(cash))
+    value = cash
+
+    for growth, start, (base, end) in zip(growths, starts, bounds):
+        if end > start:
+            combined[start:end] = value * growth[start - base:]
+            value = value * growth[-1]
+
+    drawdown = 1 - combined / np.maximum.accumulate(combined)
+
+    return pd.DataFrame({'Equity': combined, 'DrawdownPct': drawdown, 'DrawdownDuration': engine.calculate_drawdown_duration(drawdown, index)}, index=index)
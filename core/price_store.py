@@ -0,0 +1,122 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Any
+
+
+STORE_PATH = 'data/store'
+COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def load_manifest(path: str = STORE_PATH) -> Dict[str, Any]:
+    manifest_path = os.path.join(path, 'manifest.json')
+
+    if not os.path.exists(manifest_path):
+        return {'symbols': {}}
+
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+def save_manifest(manifest: Dict[str, Any], path: str = STORE_PATH) -> None:
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, 'manifest.json')
+
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=4)
+
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+def symbol_dir(symbol: str, path: str = STORE_PATH) -> str:
+    return os.path.join(path, symbol.replace('/', '_'))
+
+def column_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    arrays = {}
+
+    for column in COLUMNS:
+        if column not in df.columns:
+            continue
+
+        if column == 'Date':
+            arrays[column] = np.ascontiguousarray(df[column].to_numpy(dtype='datetime64[ns]'))
+        else:
+            arrays[column] = np.ascontiguousarray(df[column].to_numpy())
+
+    return arrays
+
+def write_symbol(symbol: str, df: pd.DataFrame, manifest: Dict[str, Any], path: str = STORE_PATH) -> None:
+    directory = symbol_dir(symbol, path)
+    os.makedirs(directory, exist_ok=True)
+    arrays = column_arrays(df)
+
+    for column, values in arrays.items():
+        values.tofile(os.path.join(directory, f'{column}.bin'))
+
+    manifest['symbols'][symbol] = {
+        'rows': len(df),
+        'start': str(arrays['Date'][0].astype('datetime64[D]')) if len(df) else None,
+        'end': str(arrays['Date'][-1].astype('datetime64[D]')) if len(df) else None,
+        'columns': {column: values.dtype.str for column, values in arrays.items()}
+    }
+
+def read_columns(symbol: str, manifest: Dict[str, Any], columns: Optional[List[str]] = None, path: str = STORE_PATH) -> Optional[Dict[str, np.ndarray]]:
+    info = manifest['symbols'].get(symbol)
+
+    if info is None:
+        return None
+
+    directory = symbol_dir(symbol, path)
+    columns = columns or list(info['columns'].keys())
+    arrays = {}
+
+    for column in columns:
+        dtype = np.dtype(info['columns'][column])
+
+        if info['rows'] == 0:
+            arrays[column] = np.empty(0, dtype=dtype)
+        else:
+            arrays[column] = np.memmap(os.path.join(directory, f'{column}.bin'), dtype=dtype, mode='r', shape=(info['rows'],))
+
+    return arrays
+
+def read_symbol(symbol: str, manifest: Dict[str, Any], columns: Optional[List[str]] = None, path: str = STORE_PATH) -> Optional[pd.DataFrame]:
+    arrays = read_columns(symbol, manifest, columns, path)
+
+    if arrays is None:
+        return None
+
+    return pd.DataFrame({column: np.asarray(values) for column, values in arrays.items()})
+
+def read_symbols(symbols: List[str], columns: Optional[List[str]] = None, path: str = STORE_PATH) -> Dict[str, Optional[pd.DataFrame]]:
+    manifest = load_manifest(path)
+
+    return {symbol: read_symbol(symbol, manifest, columns, path) for symbol in symbols}
+
+def write_symbols(stock_data: Dict[str, Optional[pd.DataFrame]], path: str = STORE_PATH) -> None:
+    manifest = load_manifest(path)
+
+    for symbol, df in stock_data.items():
+        if df is not None:
+            write_symbol(symbol, df, manifest, path)
+
+    save_manifest(manifest, path)
+
+def append_symbol(symbol: str, df: pd.DataFrame, manifest: Dict[str, Any], keep_rows: Optional[int] = None, path: str = STORE_PATH) -> None:
+    info = manifest['symbols'][symbol]
+    directory = symbol_dir(symbol, path)
+    arrays = column_arrays(df)
+    keep_rows = info['rows'] if keep_rows is None else keep_rows
+
+    for column, dtype in info['columns'].items():
+        column_path = os.path.join(directory, f'{column}.bin')
+        values = arrays[column].astype(np.dtype(dtype))
+
+        with open(column_path, 'r+b') as file:
+            file.truncate(keep_rows * values.itemsize)
+            file.seek(0, os.SEEK_END)
+            values.tofile(file)
+
+    info['rows'] = keep_rows + len(df)
+
+    if len(df):
+        info['end'] = str(arrays['Date'][-1].astype('datetime64[D]'))
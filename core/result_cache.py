@@ -0,0 +1,101 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import backtesting
+import pandas as pd
+import core.data_manipulator as dm
+import core.engine as engine
+import core.indicators as indicators
+import core.results as rs
+import strategies.strats as strats
+import strategies.strategy_tester as st
+import strategies.registry as registry
+from typing import Dict, Any, Optional
+
+
+CACHE_PATH = 'data/results'
+MISSING = object()
+
+code_hashes: Dict[str, str] = {}
+
+
+def data_hash(df: pd.DataFrame) -> str:
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes()).hexdigest()
+
+def strategy_code_hash(strategy: str) -> str:
+    if strategy in code_hashes:
+        return code_hashes[strategy]
+
+    spec = registry.get_strategy(strategy)
+    sources = [inspect.getsource(function) for function in [dm.create_signals, dm.add_columns, st.run_backtest, st.gather_backtest_result]]
+    sources.append(inspect.getsource(engine))
+    # Signals are built from the shared indicator kernels and results come from the installed backtesting.py
+    sources += [inspect.getsource(indicators), backtesting.__version__]
+    # Results are stored as pickles of CompactResult, so a change to how they pickle invalidates them
+    sources.append(inspect.getsource(rs.CompactResult))
+
+    if spec.signal_function is not None:
+        sources.append(inspect.getsource(inspect.unwrap(spec.signal_function)))
+
+    if spec.strategy_class is not None:
+        sources += [inspect.getsource(cls) for cls in spec.strategy_class.__mro__ if cls.__module__ == strats.__name__]
+
+    code_hashes[strategy] = hashlib.sha1(''.join(sources).encode()).hexdigest()
+
+    return code_hashes[strategy]
+
+def cell_key(
+    symbol: str,
+    strategy: str,
+    bars_hash: str,
+    params: Optional[Dict[str, Any]] = None,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
+) -> str:
+    params = registry.get_strategy(strategy).params if params is None else params
+    cell = [symbol, strategy, params, backtest_engine, strategy_code_hash(strategy), bars_hash]
+
+    # Pruned runs depend on the abort criteria, so they are part of the key when set
+    if criteria is not None:
+        cell.append(vars(criteria))
+
+    key = json.dumps(cell, sort_keys=True, default=str)
+
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def cell_path(key: str, path: str = CACHE_PATH) -> str:
+    return os.path.join(path, key[:2], f'{key}.pkl')
+
+def load_cell(key: str, path: str = CACHE_PATH) -> Any:
+    file_path = cell_path(key, path)
+
+    if not os.path.exists(file_path):
+        return MISSING
+
+    try:
+        with open(file_path, 'rb') as file:
+            result = pickle.load(file)
+
+        if isinstance(result, rs.CompactResult):
+            rs.load_calendar(result.calendar, os.path.join(path, 'calendars'))
+
+        return result
+
+    except Exception as e:
+        print(f"Error loading cached result {key}: {e}")
+        return MISSING
+
+def save_cell(key: str, result: Optional[Dict[str, Any]], path: str = CACHE_PATH) -> None:
+    file_path = cell_path(key, path)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Cached results only carry the id of their calendar, its dates are stored once for all of them
+    if isinstance(result, rs.CompactResult):
+        rs.save_calendar(result.calendar, os.path.join(path, 'calendars'))
+
+    with open(file_path + '.tmp', 'wb') as file:
+        pickle.dump(result, file)
+
+    os.replace(file_path + '.tmp', file_path)
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import core.engine as engine
+from typing import List, Dict, Optional, Any, Tuple, Set
+
+
+# Calendars are the date arrays results are aligned to. Every process registers the dates of the
+# market data it works on, so a result in memory only carries a calendar id and an offset into it.
+calendars: Dict[str, np.ndarray] = {}
+# Calendars made up for dates none of the registered ones hold. Other processes cannot know them,
+# so results on them are pickled with their own dates.
+local_calendars: Set[str] = set()
+
+
+def calendar_id(dates: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(dates).view(np.int64).tobytes()).hexdigest()[:16]
+
+def register_calendar(dates: np.ndarray) -> str:
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    key = calendar_id(dates)
+
+    # Dates can be a view of shared memory that is released after the run, so calendars keep a copy
+    if key not in calendars:
+        calendars[key] = dates.copy()
+
+    return key
+
+def set_calendars(shared_calendars: Dict[str, np.ndarray]) -> None:
+    calendars.update(shared_calendars)
+
+def calendar_from_frames(stock_frames: Dict[str, Optional[pd.DataFrame]]) -> np.ndarray:
+    return np.unique(np.concatenate([np.asarray(df['Date'], dtype='datetime64[ns]') for df in stock_frames.values() if df is not None]))
+
+def locate_dates(dates: np.ndarray) -> Tuple[str, int, Optional[np.ndarray]]:
+    for key in reversed(list(calendars.keys())):
+        calendar = calendars[key]
+        positions = np.searchsorted(calendar, dates)
+
+        if len(calendar) == 0 or positions.max(initial=0) >= len(calendar) or not np.array_equal(calendar[positions], dates):
+            continue
+
+        if len(positions) == 0 or positions[-1] - positions[0] + 1 == len(positions):
+            return key, int(positions[0]) if len(positions) else 0, None
+
+        return key, 0, positions.astype(np.int32)
+
+    key = register_calendar(dates)
+    local_calendars.add(key)
+
+    return key, 0, None
+
+# Calendars are saved once next to the stored results that use them, by id
+def save_calendar(key: str, path: str) -> None:
+    file_path = os.path.join(path, f'{key}.npy')
+
+    if os.path.exists(file_path):
+        return
+
+    os.makedirs(path, exist_ok=True)
+
+    with open(file_path + '.tmp', 'wb') as file:
+        np.save(file, calendars[key].view(np.int64))
+
+    os.replace(file_path + '.tmp', file_path)
+
+def load_calendar(key: str, path: str) -> None:
+    file_path = os.path.join(path, f'{key}.npy')
+
+    if key not in calendars and os.path.exists(file_path):
+        calendars[key] = np.load(file_path).view('datetime64[ns]')
+
+class CompactResult(dict):
+    def __init__(self, fields: Dict[str, Any], equity: np.ndarray, calendar: str, offset: int = 0, positions: Optional[np.ndarray] = None) -> None:
+        super().__init__(fields)
+        self.equity = np.asarray(equity, dtype=np.float32)
+        self.calendar = calendar
+        self.offset = offset
+        self.positions = positions
+
+    @classmethod
+    def from_equity_curve(cls, fields: Dict[str, Any], equity_curve: pd.DataFrame) -> 'CompactResult':
+        calendar, offset, positions = locate_dates(equity_curve.index.to_numpy(dtype='datetime64[ns]'))
+        return cls(fields, equity_curve['Equity'].to_numpy(), calendar, offset, positions)
+
+    def dates(self) -> np.ndarray:
+        calendar = calendars.get(self.calendar)
+
+        if calendar is None:
+            raise KeyError(f"Calendar {self.calendar} is not registered in this process")
+
+        if self.positions is not None:
+            return calendar[self.positions]
+
+        return calendar[self.offset:self.offset + len(self.equity)]
+
+    # The equity curve frame is rebuilt on every access instead of being kept alongside the result
+    def build_equity_curve(self) -> pd.DataFrame:
+        index = pd.DatetimeIndex(self.dates(), name='Date')
+        equity = self.equity.astype(np.float64)
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+
+        return pd.DataFrame({'Equity': equity, 'DrawdownPct': drawdown, 'DrawdownDuration': engine.calculate_drawdown_duration(drawdown, index)}, index=index)
+
+    def __missing__(self, key: str) -> Any:
+        if key == 'equity_curve':
+            return self.build_equity_curve()
+
+        raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key == 'equity_curve' or super().__contains__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def copy(self) -> 'CompactResult':
+        return CompactResult(dict(self), self.equity, self.calendar, self.offset, self.positions)
+
+    # Pickles go to other processes, the result cache and checkpoints. They only carry the calendar id,
+    # its dates are registered in pool workers and stored once next to cached and checkpointed results.
+    def __reduce__(self) -> Tuple[Any, ...]:
+        dates = self.dates() if self.calendar in local_calendars else None
+        return (restore_result, (dict(self), self.equity, self.calendar, self.offset, self.positions, dates))
+
+def restore_result(fields: Dict[str, Any], equity: np.ndarray, calendar: str, offset: int, positions: Optional[np.ndarray], dates: Optional[np.ndarray] = None) -> CompactResult:
+    # Calendar ids are content hashes, so a registered id still has the same dates
+    if dates is not None and calendar not in calendars:
+        calendar, offset, positions = locate_dates(np.asarray(dates, dtype='datetime64[ns]'))
+
+    return CompactResult(fields, equity, calendar, offset, positions)
+
+# Results indexed by (symbol, strategy) with their equity and drawdown aligned on the union of their
+# dates. Compact results on one calendar are laid out on it directly, other dates are located by search.
+class ResultSet:
+    def __init__(self, results: List[Dict[str, Any]]) -> None:
+        self.results = list(results)
+        self.index = {(result['symbol'], result['strategy']): row for row, result in enumerate(self.results)}
+        keys = {result.calendar if isinstance(result, CompactResult) else None for result in self.results}
+        self.calendar = next(iter(keys)) if len(keys) == 1 and None not in keys else None
+
+        if self.calendar is not None:
+            self.dates = calendars[self.calendar]
+        else:
+            dates = [calendars[key] for key in keys if key is not None]
+            dates += [result_dates(result) for result in self.results if not isinstance(result, CompactResult)]
+            self.dates = np.unique(np.concatenate(dates)) if dates else np.array([], dtype='datetime64[ns]')
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self.index
+
+    def __getitem__(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        return self.results[self.index[key]]
+
+    # Positions in dates of the bars of a row
+    def columns(self, row: int) -> np.ndarray:
+        result = self.results[row]
+
+        if self.calendar is None:
+            return np.searchsorted(self.dates, result_dates(result))
+
+        if result.positions is not None:
+            return result.positions
+
+        return np.arange(result.offset, result.offset + len(result.equity))
+
+    def values(self, row: int) -> np.ndarray:
+        result = self.results[row]
+        return result.equity if isinstance(result, CompactResult) else result['equity_curve']['Equity'].to_numpy()
+
+    # Equity of the rows over bars start to end of each of them, on the dates any of those bars falls
+    # on or on the given dates, with NaN where a row has no bar
+    def layout(self, rows: List[int], start: int = 0, end: Optional[int] = None, present: Optional[np.ndarray] = None) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        columns = [self.columns(row)[start:end] for row in rows]
+
+        if present is None:
+            present = np.zeros(len(self.dates), dtype=bool)
+
+            for row_columns in columns:
+                present[row_columns] = True
+
+        positions = np.cumsum(present) - 1
+        compact = all(isinstance(self.results[row], CompactResult) for row in rows)
+        equity = np.full((len(rows), np.count_nonzero(present)), np.nan, dtype=np.float32 if compact else np.float64)
+
+        for i, (row, row_columns) in enumerate(zip(rows, columns)):
+            kept = present[row_columns]
+            equity[i, positions[row_columns[kept]]] = self.values(row)[start:end][kept]
+
+        return pd.DatetimeIndex(self.dates[present], name='Date'), equity
+
+def result_dates(result: Dict[str, Any]) -> np.ndarray:
+    return result.dates() if isinstance(result, CompactResult) else np.asarray(result['equity_curve'].index, dtype='datetime64[ns]')
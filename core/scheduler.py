@@ -0,0 +1,129 @@
+import queue
+import time
+import core.engine as engine
+import strategies.registry as registry
+from collections import deque
+from multiprocessing.pool import Pool
+from typing import List, Dict, Optional, Callable, Any, Iterator, Tuple
+
+
+# Relative cost of a bar for each exit rule, trailing stops and tp/sl exits keep more state per bar
+EXIT_RULE_COSTS: Dict[str, float] = {
+    'hold': 1.0,
+    'green_day': 1.5,
+    'red_day': 1.5,
+    'tpsl': 2.0,
+    'trailing': 3.0,
+}
+
+
+def estimate_cost(bars: int, strategy: Optional[str] = None) -> float:
+    spec = registry.get_registry().get(strategy) if strategy is not None else None
+    exit_rule = engine.declared_exit_rule(spec.strategy_class) if spec is not None and spec.strategy_class is not None else None
+
+    return max(1, bars) * EXIT_RULE_COSTS.get(exit_rule, 1.0)
+
+def run_chunk(function: Callable[..., Any], chunk: List[Tuple[Any, ...]]) -> Tuple[List[Any], float]:
+    start_time = time.time()
+    results = [function(*args) for args in chunk]
+
+    return results, time.time() - start_time
+
+class TaskScheduler:
+    def __init__(
+        self,
+        pool: Pool,
+        workers: int,
+        max_in_flight: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancel_event: Optional[Any] = None
+    ) -> None:
+        self.pool = pool
+        self.workers = max(1, workers)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.progress = progress
+        self.cancel_event = cancel_event
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    # Guided chunking: the most expensive tasks go first and every chunk takes a share of the cost
+    # that is still left, so chunks start large and shrink towards the end of the run
+    def create_chunks(self, costs: List[float]) -> List[List[int]]:
+        order = sorted(range(len(costs)), key=lambda i: costs[i], reverse=True)
+        remaining = sum(costs)
+        chunks = []
+        chunk = []
+        chunk_cost = 0.0
+
+        for i in order:
+            chunk.append(i)
+            chunk_cost += costs[i]
+
+            if chunk_cost >= remaining / (4 * self.workers):
+                chunks.append(chunk)
+                remaining -= chunk_cost
+                chunk = []
+                chunk_cost = 0.0
+
+        if chunk:
+            chunks.append(chunk)
+
+        return chunks
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    # Yields (task index, result) pairs as chunks finish. At most max_in_flight chunks are queued in
+    # the pool at a time, so memory stays bounded however many tasks there are.
+    def run(self, function: Callable[..., Any], tasks: List[Tuple[Any, ...]], costs: Optional[List[float]] = None) -> Iterator[Tuple[int, Any]]:
+        costs = costs if costs is not None else [1.0] * len(tasks)
+        pending = deque(self.create_chunks(costs))
+        finished: queue.Queue = queue.Queue()
+        in_flight = 0
+        completed = 0
+
+        if self.progress is not None:
+            self.progress(completed, len(tasks))
+
+        while pending or in_flight:
+            if self.is_cancelled() and pending:
+                print(f"Backtests cancelled, skipping {sum(len(chunk) for chunk in pending)} remaining tasks.")
+                self.cancelled = True
+                pending.clear()
+
+            while pending and in_flight < self.max_in_flight:
+                chunk = pending.popleft()
+                self.pool.apply_async(
+                    run_chunk,
+                    (function, [tasks[i] for i in chunk]),
+                    callback=lambda result, chunk=chunk: finished.put((chunk, result, None)),
+                    error_callback=lambda error, chunk=chunk: finished.put((chunk, None, error))
+                )
+                in_flight += 1
+
+            if in_flight == 0:
+                break
+
+            chunk, result, error = finished.get()
+            in_flight -= 1
+
+            if error is not None:
+                raise error
+
+            results, elapsed = result
+            self.elapsed += elapsed
+            completed += len(chunk)
+
+            for i, task_result in zip(chunk, results):
+                yield i, task_result
+
+            if self.progress is not None:
+                self.progress(completed, len(tasks))
+
+    def map(self, function: Callable[..., Any], tasks: List[Tuple[Any, ...]], costs: Optional[List[float]] = None) -> List[Any]:
+        results = [None] * len(tasks)
+
+        for i, result in self.run(function, tasks, costs):
+            results[i] = result
+
+        return results
@@ -0,0 +1,224 @@
+import json
+import numpy as np
+import pandas as pd
+import core.indicators as indicators
+from multiprocessing import shared_memory
+from core.panel import PricePanel, FIELDS
+from core.results import CompactResult, ResultSet, register_calendar
+from typing import List, Dict, Optional, Any, Tuple
+
+
+attached_memory: Dict[str, shared_memory.SharedMemory] = {}
+attached_stock_data: Dict[str, 'SharedStockData'] = {}
+# Indicators every strategy asks for, computed on the whole panel at once and handed to the indicator cache
+PRIMED_INDICATORS: Dict[str, Dict[str, Any]] = {'atr': {'length': 14}}
+
+
+def attach_memory(name: str) -> shared_memory.SharedMemory:
+    if name not in attached_memory:
+        attached_memory[name] = shared_memory.SharedMemory(name=name)
+
+    return attached_memory[name]
+
+class SharedArray:
+    def __init__(self, name: str, shape: Tuple[int, ...], dtype: str, memory: Optional[shared_memory.SharedMemory] = None) -> None:
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.memory = memory or attach_memory(name)
+        self.array = np.ndarray(self.shape, dtype=np.dtype(dtype), buffer=self.memory.buf)
+
+    @classmethod
+    def empty(cls, shape: Tuple[int, ...], dtype: Any) -> 'SharedArray':
+        dtype = np.dtype(dtype)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+
+        return cls(memory.name, shape, dtype.str, memory)
+
+    @classmethod
+    def create(cls, array: np.ndarray) -> 'SharedArray':
+        shared = cls.empty(array.shape, array.dtype)
+        shared.array[...] = array
+        shared.array.flags.writeable = False
+
+        return shared
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state['name'], state['shape'], state['dtype'])
+        self.array.flags.writeable = False
+
+    def close(self) -> None:
+        self.array = None
+        attached_memory.pop(self.name, None)
+
+        try:
+            self.memory.close()
+
+        except BufferError:
+            print(f"Shared array {self.name} is still referenced and will be closed on exit.")
+
+    def unlink(self) -> None:
+        self.memory.unlink()
+
+# Read-only market data published once by the parent process. Pickling a handle only sends the name
+# of its metadata block, so pool tasks stay a few bytes in size and workers attach a single time.
+class SharedStockData:
+    def __init__(self, stock_data: Optional[Dict[str, pd.DataFrame]] = None, panel: Optional[PricePanel] = None) -> None:
+        panel = panel or PricePanel.from_frames(stock_data)
+        self.symbols = list(panel.symbols)
+        self.arrays = {
+            'values': SharedArray.create(np.ascontiguousarray(panel.values)),
+            'valid': SharedArray.create(np.ascontiguousarray(panel.valid)),
+            'dates': SharedArray.create(np.ascontiguousarray(panel.dates.astype('datetime64[ns]').view(np.int64))),
+            **{name: SharedArray.create(np.ascontiguousarray(panel.indicator(name, **params))) for name, params in PRIMED_INDICATORS.items()}
+        }
+        metadata = json.dumps({'symbols': self.symbols, 'arrays': {key: array.__getstate__() for key, array in self.arrays.items()}}).encode()
+        self.metadata = shared_memory.SharedMemory(create=True, size=len(metadata))
+        self.metadata.buf[:len(metadata)] = metadata
+        self.metadata_size = len(metadata)
+        self.set_views()
+        attached_stock_data[self.metadata.name] = self
+
+    def set_views(self) -> None:
+        self.values = self.arrays['values'].array
+        self.valid = self.arrays['valid'].array
+        self.dates = self.arrays['dates'].array.view('datetime64[ns]')
+        self.indicators = {name: self.arrays[name].array for name in PRIMED_INDICATORS}
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        register_calendar(self.dates)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'metadata': self.metadata.name, 'metadata_size': self.metadata_size}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        attached = attached_stock_data.get(state['metadata'])
+
+        if attached is None:
+            self.metadata = attach_memory(state['metadata'])
+            self.metadata_size = state['metadata_size']
+            metadata = json.loads(bytes(self.metadata.buf[:self.metadata_size]).decode())
+            self.symbols = metadata['symbols']
+            self.arrays = {key: SharedArray(**array) for key, array in metadata['arrays'].items()}
+            self.set_views()
+            attached_stock_data[state['metadata']] = self
+        else:
+            self.__dict__.update(attached.__dict__)
+
+    def __enter__(self) -> 'SharedStockData':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
+
+    def __getitem__(self, symbol: str) -> Optional[pd.DataFrame]:
+        i = self.symbol_index.get(symbol)
+
+        if i is None:
+            return None
+
+        rows = np.flatnonzero(self.valid[i])
+
+        if len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            rows = slice(rows[0], rows[-1] + 1)
+
+        df = pd.DataFrame(self.values[i, rows], columns=FIELDS)
+        df.insert(0, 'Date', self.dates[rows])
+
+        for name, params in PRIMED_INDICATORS.items():
+            indicators.prime(df, symbol, name, pd.Series(np.array(self.indicators[name][i, rows]), index=df.index), **params)
+
+        return df
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbol_index
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def keys(self) -> List[str]:
+        return list(self.symbols)
+
+    def release(self) -> None:
+        self.values = self.valid = self.dates = self.indicators = None
+        attached_stock_data.pop(self.metadata.name, None)
+
+        for array in self.arrays.values():
+            array.close()
+            array.unlink()
+
+        self.metadata.close()
+        self.metadata.unlink()
+
+# Equity curves of many results laid out on the union of their dates, NaN where a result has no bar,
+# along with the columns every result spans in each division of its own bars. Division tasks get a
+# handle to the shared matrix instead of a pickled copy of every equity curve.
+class SharedEquityCurves:
+    def __init__(self, results: List[Dict[str, Any]], n_divisions: int) -> None:
+        self.fields = [(result['symbol'], result['strategy']) for result in results]
+        compact = all(isinstance(result, CompactResult) for result in results)
+        result_set = ResultSet(results)
+        spans = [columns[[0, -1]] for columns in map(result_set.columns, range(len(results))) if len(columns)]
+        first = min((span[0] for span in spans), default=0)
+        last = max((span[1] + 1 for span in spans), default=0)
+        equity = SharedArray.empty((len(results), last - first), np.float32 if compact else np.float64)
+        bounds = np.zeros((n_divisions, len(results), 2), dtype=np.int64)
+        equity.array[...] = np.nan
+
+        for row in range(len(results)):
+            columns = result_set.columns(row)
+            equity.array[row, columns - first] = result_set.values(row)
+            length = len(columns) // n_divisions
+
+            if length:
+                divisions = np.arange(n_divisions) * length
+                bounds[:, row, 0] = columns[divisions] - first
+                bounds[:, row, 1] = columns[divisions + length - 1] + 1 - first
+
+        equity.array.flags.writeable = False
+        self.arrays = {
+            'equity': equity,
+            'dates': SharedArray.create(np.ascontiguousarray(result_set.dates[first:last]).view(np.int64)),
+            'bounds': SharedArray.create(bounds)
+        }
+        self.set_views()
+
+    def set_views(self) -> None:
+        self.equity = self.arrays['equity'].array
+        self.dates = self.arrays['dates'].array.view('datetime64[ns]')
+        self.bounds = self.arrays['bounds'].array
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'fields': self.fields, 'arrays': self.arrays}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.set_views()
+
+    def __enter__(self) -> 'SharedEquityCurves':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.release()
+
+    # Dates and equity of division i over the columns its results span, NaN outside of each result's division
+    def division(self, i: int) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+        bounds = self.bounds[i]
+        spanned = bounds[bounds[:, 1] > bounds[:, 0]]
+        first, last = (spanned[:, 0].min(), spanned[:, 1].max()) if len(spanned) else (0, 0)
+        columns = np.arange(first, last)
+        in_division = (columns >= bounds[:, :1]) & (columns < bounds[:, 1:])
+
+        equity = np.full(in_division.shape, np.nan)
+        np.copyto(equity, self.equity[:, first:last], where=in_division)
+
+        return pd.DatetimeIndex(self.dates[first:last]), equity
+
+    def release(self) -> None:
+        self.equity = self.dates = self.bounds = None
+
+        for array in self.arrays.values():
+            array.close()
+            array.unlink()
@@ -0,0 +1,191 @@
+import itertools
+import json
+import numpy as np
+import pandas as pd
+import core.data_manipulator as dm
+import core.engine as engine
+import core.indicators as indicators
+import strategies.registry as registry
+import strategies.strategy_tester as st
+from multiprocessing import cpu_count
+from typing import List, Dict, Optional, Any, Tuple
+
+
+ENGINE_PARAMS = ['tp_coef', 'sl_coef', 'atr_coef']
+METRICS = ['sharpe', 'return', 'max_drawdown', '# trades', 'pruned']
+
+
+def grid_samples(space: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    names = list(space.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+# Random and Latin hypercube samples draw from (low, high) bounds, integer bounds give integer values
+def scale_samples(space: Dict[str, Tuple[float, float]], unit: np.ndarray) -> List[Dict[str, Any]]:
+    samples = [{} for _ in range(len(unit))]
+
+    for j, (name, (low, high)) in enumerate(space.items()):
+        if isinstance(low, int) and isinstance(high, int):
+            values = np.clip(np.floor(low + unit[:, j] * (high - low + 1)), low, high).astype(int)
+        else:
+            values = low + unit[:, j] * (high - low)
+
+        for sample, value in zip(samples, values.tolist()):
+            sample[name] = value
+
+    return samples
+
+def random_samples(space: Dict[str, Tuple[float, float]], samples: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    return scale_samples(space, rng.random((samples, len(space))))
+
+def latin_hypercube_samples(space: Dict[str, Tuple[float, float]], samples: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    strata = np.argsort(rng.random((samples, len(space))), axis=0)
+
+    return scale_samples(space, (strata + rng.random((samples, len(space)))) / samples)
+
+def create_samples(space: Dict[str, Any], method: str = 'grid', samples: int = 100, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    if method == 'grid':
+        return grid_samples(space)
+    elif method == 'random':
+        return random_samples(space, samples, seed)
+    elif method == 'lhs':
+        return latin_hypercube_samples(space, samples, seed)
+
+    raise ValueError(f"Unknown sampling method: {method}")
+
+def split_params(strategy: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    signal_names = registry.get_strategy(strategy).params
+    signal_params = {}
+    engine_params = {}
+
+    for name, value in params.items():
+        if name in signal_names:
+            signal_params[name] = value
+        elif name in ENGINE_PARAMS:
+            engine_params[name] = value
+        else:
+            raise ValueError(f"Unknown parameter {name} for strategy {strategy}")
+
+    return signal_params, engine_params
+
+def signal_key(strategy: str, params: Dict[str, Any]) -> str:
+    return json.dumps(split_params(strategy, params)[0], sort_keys=True)
+
+# Parameter sets that share signal parameters reuse one signal frame, and the indicators behind
+# different signal parameters come from the worker's indicator cache.
+def sweep_symbol(
+    stock_data: Dict[str, pd.DataFrame],
+    symbol: str,
+    strategy: str,
+    parameter_sets: List[Tuple[int, Dict[str, Any]]],
+    size: float = 0.2,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> List[Tuple[Any, ...]]:
+    df = stock_data[symbol]
+
+    if df is None:
+        return []
+
+    strategy_class = registry.get_strategy(strategy).strategy_class
+    groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    rows = []
+
+    for i, params in parameter_sets:
+        groups.setdefault(signal_key(strategy, params), []).append((i, split_params(strategy, params)[1]))
+
+    for key, members in groups.items():
+        signals = dm.create_signals(df.copy(), strategy, symbol, json.loads(key))
+        close = signals['Close'].to_numpy(dtype=np.float64)
+
+        for i, engine_params in members:
+            try:
+                trades, open_trade = engine.simulate_trades(signals, strategy_class, size, params=engine_params, criteria=criteria)
+
+            except engine.BacktestPruned:
+                rows.append((strategy, i, symbol, np.nan, np.nan, np.nan, 0, True))
+                continue
+
+            equity = engine.calculate_equity(close, trades, open_trade)
+            performance = engine.calculate_performance(signals.index, equity)
+            rows.append((strategy, i, symbol, performance['Sharpe Ratio'], performance['Return [%]'], performance['Max. Drawdown [%]'], len(trades), False))
+
+    return rows
+
+def create_tasks(
+    stock_data: Any,
+    symbols: List[str],
+    samples: Dict[str, List[Dict[str, Any]]],
+    chunks: int,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> List[Tuple[Any, ...]]:
+    tasks = []
+
+    for strategy, parameter_sets in samples.items():
+        ordered = sorted(enumerate(parameter_sets), key=lambda sample: signal_key(strategy, sample[1]))
+        chunk_size = max(1, -(-len(ordered) // chunks))
+
+        for symbol in symbols:
+            for start in range(0, len(ordered), chunk_size):
+                tasks.append((stock_data, symbol, strategy, ordered[start:start + chunk_size], 0.2, criteria))
+
+    return tasks
+
+def build_table(samples: Dict[str, List[Dict[str, Any]]], rows: List[Tuple[Any, ...]]) -> pd.DataFrame:
+    table = pd.DataFrame(rows, columns=['strategy', 'sample', 'symbol'] + METRICS)
+    params = pd.DataFrame([samples[strategy][i] for strategy, i in zip(table['strategy'], table['sample'])], index=table.index)
+    table = pd.concat([table[['strategy', 'sample', 'symbol']], params, table[METRICS]], axis=1)
+
+    return table.astype({
+        'strategy': 'category',
+        'sample': 'int32',
+        'symbol': 'category',
+        'sharpe': 'float32',
+        'return': 'float32',
+        'max_drawdown': 'float32',
+        '# trades': 'int32',
+        'pruned': 'bool'
+    })
+
+def run_sweep(
+    symbols: List[str],
+    spaces: Dict[str, Dict[str, Any]],
+    method: str = 'grid',
+    samples: int = 100,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    executor: str = 'process',
+    criteria: Optional[engine.AbortCriteria] = None
+) -> pd.DataFrame:
+    strategy_samples = {strategy: create_samples(space, method, samples, seed) for strategy, space in spaces.items()}
+
+    for strategy, parameter_sets in strategy_samples.items():
+        # Sweeps only run on the vectorized engine
+        if engine.declared_exit_rule(registry.get_strategy(strategy).strategy_class) is None:
+            raise ValueError(f"Strategy {strategy} does not declare an exit rule the vectorized engine implements")
+
+        for params in parameter_sets:
+            split_params(strategy, params)
+
+    panel = dm.fetch_panel_or_load_cached(symbols)
+    stock_frames = panel.to_frames()
+    symbols = list(panel.symbols)
+    workers = workers or cpu_count()
+    # Split every symbol's parameter sets so that a small universe still keeps all workers busy
+    chunks = max(1, -(-4 * workers // max(1, len(symbols))))
+    counters = indicators.create_counters()
+
+    print(f"Sweeping {sum(len(parameter_sets) for parameter_sets in strategy_samples.values())} parameter sets across {len(symbols)} symbols.")
+
+    with st.create_stock_data(panel, stock_frames, executor) as stock_data:
+        tasks = create_tasks(stock_data, symbols, strategy_samples, chunks, criteria)
+
+        with st.create_pool(executor, max(1, min(workers, len(tasks))), counters, stock_data) as pool:
+            rows = list(itertools.chain.from_iterable(pool.starmap(sweep_symbol, tasks)))
+
+    indicators.print_stats(counters)
+
+    if criteria is not None:
+        print(f"Pruned {sum(row[-1] for row in rows)} of {len(rows)} parameter sets early.")
+
+    return build_table(strategy_samples, rows)
@@ -0,0 +1,124 @@
+import math
+import numpy as np
+import pandas as pd
+import core.data_manipulator as dm
+import core.engine as engine
+import strategies.strategy_tester as st
+from typing import List, Dict, Optional, Any, Tuple
+
+
+ETA = 3
+MIN_BARS = 126
+WARMUP_BARS = 250
+SIZE = 0.2
+
+
+# Window lengths of the rounds, every round is eta times longer and the last one covers all bars
+# with at most eta candidates left
+def create_rounds(candidates: int, bars: int, eta: int = ETA) -> List[int]:
+    rounds = max(0, math.ceil(math.log(candidates, eta)) - 1) if candidates > 1 else 0
+    return [max(min(MIN_BARS, bars), bars // eta ** (rounds - i)) for i in range(rounds + 1)]
+
+# Windows end on the last bar, signals are created over extra bars before the window so that its
+# indicators are warmed up the same way they are for a backtest over all bars.
+def evaluate_window(df: pd.DataFrame, symbol: str, strategy: str, window: int, backtest_engine: str, criteria: Optional[engine.AbortCriteria] = None) -> Tuple[float, Optional[Dict[str, Any]]]:
+    # create_signals drops the first tenth of the bars it is given on top of the indicator warm-up
+    warmup = WARMUP_BARS + window // 9
+    signals = dm.create_signals((df.iloc[-(window + warmup):] if window + warmup < len(df) else df).copy(), strategy, symbol).iloc[-window:]
+
+    result = st.gather_backtest_result(signals, symbol, strategy, SIZE, False, backtest_engine, criteria) if len(signals) > 1 else None
+
+    # Pruned candidates score like ones without trades
+    if result is None or 'Pruned' in result:
+        return -1, None
+
+    return result['Sharpe Ratio'], result
+
+# Trade counts grow with the window, so shorter rounds ask for their share of the minimum
+def scale_criteria(criteria: Optional[engine.AbortCriteria], share: float) -> Optional[engine.AbortCriteria]:
+    if criteria is None or criteria.min_trades is None or share >= 1:
+        return criteria
+
+    return engine.AbortCriteria(criteria.max_drawdown, int(criteria.min_trades * share), criteria.min_sharpe, criteria.checkpoint)
+
+# Successive halving: every candidate is backtested on a short recent window, the best 1 / eta of
+# them move on to a window eta times longer, and the last round backtests the finalists on all bars.
+def run_tournament(
+    df: pd.DataFrame,
+    symbol: str,
+    strategies: List[str],
+    backtest_engine: str = 'backtesting',
+    eta: int = ETA,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> Tuple[Optional[str], Optional[Dict[str, Any]], float]:
+    candidates = list(strategies)
+    bars = int(0.9 * len(df))
+    rounds = create_rounds(len(candidates), bars, eta)
+    evaluated_bars = 0
+
+    for i, window in enumerate(rounds):
+        # The last round runs on all bars, so its results are the ones an exhaustive search would get
+        window = window if i < len(rounds) - 1 else len(df)
+        round_criteria = scale_criteria(criteria, window / len(df))
+        scores = {strategy: evaluate_window(df, symbol, strategy, window, backtest_engine, round_criteria) for strategy in candidates}
+        evaluated_bars += len(candidates) * min(window, bars)
+        candidates = sorted(candidates, key=lambda strategy: scores[strategy][0], reverse=True)[:max(1, math.ceil(len(candidates) / eta))]
+
+    best_sharpe, best_result = scores[candidates[0]]
+
+    # Share of the bars an exhaustive search would backtest
+    cost = evaluated_bars / (bars * len(strategies))
+
+    if best_result is None or best_sharpe <= 0:
+        return None, None, cost
+
+    return candidates[0], best_result, cost
+
+def run_tournament_backtest(
+    stock_data: Dict[str, pd.DataFrame],
+    symbol: str,
+    strategies: Dict[str, int],
+    plot: bool = False,
+    start_percent: float = 0,
+    end_percent: float = 1,
+    backtest_engine: str = 'backtesting',
+    eta: int = ETA,
+    audit: bool = False,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> Optional[Dict[str, Any]]:
+    df = stock_data[symbol]
+
+    if df is None:
+        return None
+
+    df = df.iloc[int(start_percent * len(df)):int(end_percent * len(df))]
+    strategy, result, cost = run_tournament(df, symbol, list(strategies.keys()), backtest_engine, eta, criteria)
+    exhaustive_result = st.find_best_backtest(stock_data, symbol, strategies, plot, start_percent, end_percent, backtest_engine, criteria) if audit else None
+
+    # Audited symbols the tournament found no strategy for are kept as misses, so the audit counts them
+    if strategy is None and not audit:
+        return None
+
+    simplified_result = {'symbol': symbol, 'strategy': None, 'sharpe': 0} if strategy is None else dm.generate_simple_result(symbol, strategy, result)
+    simplified_result['tournament_cost'] = cost
+
+    if audit:
+        simplified_result['exhaustive_strategy'] = None if exhaustive_result is None else exhaustive_result['strategy']
+        simplified_result['exhaustive_sharpe'] = 0 if exhaustive_result is None else exhaustive_result['sharpe']
+
+    return simplified_result
+
+def log_tournament(results: List[Dict[str, Any]]) -> None:
+    costs = [result['tournament_cost'] for result in results if 'tournament_cost' in result]
+
+    if costs:
+        print(f"Tournament backtested {np.mean(costs) * 100:.1f}% of the bars of an exhaustive search.")
+
+    audited = [result for result in results if 'exhaustive_strategy' in result]
+
+    if not audited:
+        return
+
+    agreed = sum(result['strategy'] == result['exhaustive_strategy'] for result in audited)
+    shortfall = np.mean([result['exhaustive_sharpe'] - result['sharpe'] for result in audited])
+    print(f"Tournament picked the exhaustive search's strategy for {agreed}/{len(audited)} symbols, with an average Sharpe shortfall of {shortfall:.3f}.")
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+
+UNIVERSE_PATH = 'data/universes'
+UNIVERSES = ['SP', 'NQ', 'R2000', 'futures']
+
+loaded_universes: Dict[str, List[str]] = {}
+
+
+def scrape_universe(name: str) -> Optional[List[str]]:
+    if name == 'SP':
+        return pd.read_html('https://en.wikipedia.org/wiki/List_of_S%26P_500_companies')[0]['Symbol'].tolist() + ['SPY']
+    elif name == 'NQ':
+        return pd.read_html('https://en.wikipedia.org/wiki/Nasdaq-100')[4]['Ticker'].tolist()
+    elif name == 'R2000':
+        return pd.read_csv('data/R2000.csv').iloc[:, 0].tolist()
+    elif name == 'futures':
+        return ['ES=F', 'YM=F', 'NQ=F', 'RTY=F', 'CL=F', 'GC=F', 'SI=F', 'HG=F', 'PL=F', 'PA=F', 'NG=F', 'ZB=F', 'ZT=F', 'ZN=F', 'ZS=F', 'ZW=F', 'ZC=F', 'ZL=F', 'ZM=F']
+    else:
+        return None
+
+def universe_hash(symbols: List[str]) -> str:
+    return hashlib.sha1('\n'.join(symbols).encode()).hexdigest()
+
+def load_registry(path: str = UNIVERSE_PATH) -> Dict[str, Any]:
+    registry_path = os.path.join(path, 'registry.json')
+
+    if not os.path.exists(registry_path):
+        return {}
+
+    with open(registry_path, 'r') as file:
+        return json.load(file)
+
+def save_registry(registry: Dict[str, Any], path: str = UNIVERSE_PATH) -> None:
+    os.makedirs(path, exist_ok=True)
+    registry_path = os.path.join(path, 'registry.json')
+
+    with open(registry_path + '.tmp', 'w') as file:
+        json.dump(registry, file, indent=4)
+
+    os.replace(registry_path + '.tmp', registry_path)
+
+def snapshot_path(name: str, date: str, path: str = UNIVERSE_PATH) -> str:
+    return os.path.join(path, name, f'{date}.json')
+
+def refresh_universe(name: str, path: str = UNIVERSE_PATH) -> Optional[List[str]]:
+    symbols = scrape_universe(name)
+
+    if symbols is None:
+        return None
+
+    registry = load_registry(path)
+    entry = registry.setdefault(name, {'latest': None, 'hash': None, 'snapshots': {}})
+    symbols_hash = universe_hash(symbols)
+
+    if entry['hash'] == symbols_hash:
+        print(f"Constituents of {name} are unchanged since {entry['latest']}.")
+        return symbols
+
+    date = datetime.now().strftime('%Y-%m-%d')
+    os.makedirs(os.path.join(path, name), exist_ok=True)
+
+    with open(snapshot_path(name, date, path), 'w') as file:
+        json.dump(symbols, file, indent=4)
+
+    entry['latest'] = date
+    entry['hash'] = symbols_hash
+    entry['snapshots'][date] = symbols_hash
+    save_registry(registry, path)
+    print(f"Saved a new snapshot of {name} with {len(symbols)} constituents.")
+
+    return symbols
+
+def load_universe(name: str, date: Optional[str] = None, path: str = UNIVERSE_PATH) -> Optional[List[str]]:
+    if name not in UNIVERSES:
+        return None
+
+    registry = load_registry(path)
+
+    if name not in registry:
+        print(f"No snapshot of {name} found. Fetching constituents.")
+        return refresh_universe(name, path)
+
+    date = date or registry[name]['latest']
+    key = f'{name}@{date}'
+
+    if key not in loaded_universes:
+        with open(snapshot_path(name, date, path), 'r') as file:
+            loaded_universes[key] = json.load(file)
+
+    return list(loaded_universes[key])
+
+def identify_universe(symbols: List[str], path: str = UNIVERSE_PATH) -> Optional[str]:
+    symbols_hash = universe_hash(symbols)
+
+    for name, entry in load_registry(path).items():
+        if entry['hash'] == symbols_hash:
+            return name
+
+    return None
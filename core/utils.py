@@ -2,6 +2,8 @@ import time
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
+import core.metrics as metrics
+from core.shared_data import SharedEquityCurves
 from multiprocessing import Pool
 from typing import Callable, List, Dict, Tuple, Any
 
@@ -40,56 +42,58 @@ def calculate_sharpe_ratio(equity_df: pd.DataFrame, risk_free_rate: float = 0.03
 
     return sharpe_ratio
 
-def calculate_weighted_sharpe_ratio_negative(weights: np.ndarray, equity_dfs_pct_change: List[pd.Series], risk_free_rate: float = 0.03) -> float:
-    gmean_day_return = 0.0
-    day_returns = equity_dfs_pct_change[0] * weights[0]
-    annual_trading_days = np.nan
+# Negative Sharpe ratio of the weighted portfolio and its gradient. day_returns holds the returns of
+# the candidates on the days the portfolio is invested, the rest of the n_days count as flat.
+def calculate_weighted_sharpe_ratio_negative(weights: np.ndarray, day_returns: np.ndarray, n_days: int, risk_free_rate: float = 0.03) -> Tuple[float, np.ndarray]:
+    annual_trading_days = 252
+    portfolio_returns = weights @ day_returns
+    growth = 1 + portfolio_returns
 
-    for i in range(1, len(equity_dfs_pct_change)):
-        if equity_dfs_pct_change[i].empty:
-            continue
-        
-        day_returns += equity_dfs_pct_change[i] * weights[i]
+    if np.any(growth <= 0):
+        gmean_growth, gmean_gradient = 1.0, np.zeros_like(weights)
+    else:
+        gmean_growth = np.exp(np.log(growth).sum() / n_days)
+        gmean_gradient = gmean_growth * (day_returns @ (1 / growth)) / n_days
 
-    gmean_day_return = geometric_mean(day_returns)
-    annual_trading_days = 252
-    annualized_return = (1 + gmean_day_return)**annual_trading_days - 1
-    annualized_return = annualized_return * 100
-    annualized_volatility = np.sqrt((day_returns.var(ddof=int(bool(day_returns.shape))) + (1 + gmean_day_return)**2)**annual_trading_days - (1 + gmean_day_return)**(2*annual_trading_days)) * 100  # noqa: E501
-    
-    if annualized_volatility == 0:
-        return 1
-    
-    sharpe_ratio = (annualized_return - risk_free_rate * 100) / annualized_volatility
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centered = portfolio_returns - portfolio_returns.mean()
+        variance = centered @ centered / (len(centered) - 1)
+        variance_gradient = 2 * (day_returns @ centered) / (len(centered) - 1)
 
-    return -sharpe_ratio
+    annualized_return = (gmean_growth**annual_trading_days - 1) * 100
+    compounded = (variance + gmean_growth**2)**annual_trading_days - gmean_growth**(2*annual_trading_days)
+    annualized_volatility = np.sqrt(compounded) * 100
 
-def calculate_optimal_portfolio(results: List[Dict[str, Any]], strategy_limit: int) -> Tuple[Dict[str, List[Dict[str, Any]]], float]:
-    symbols = set()
-    strategies = set()
-    sharpe_threshold = -1.0
-    count = sum(result['sharpe'] >= sharpe_threshold for result in results)
+    if annualized_volatility == 0:
+        return 1, np.zeros_like(weights)
 
-    while count > strategy_limit:
-        sharpe_threshold += 0.025
-        count = sum(result['sharpe'] >= sharpe_threshold for result in results)
+    sharpe_ratio = (annualized_return - risk_free_rate * 100) / annualized_volatility
 
-    results = [result for result in results if result['sharpe'] >= sharpe_threshold]
-    equity_dfs_pct_change = [result['equity_curve']['Equity'].resample('D').last().dropna().pct_change() for result in results]
-    
-    for result in results:
-        symbols.add(result['symbol'])
-        strategies.add(result['strategy'])
+    return_gradient = 100 * annual_trading_days * gmean_growth**(annual_trading_days - 1) * gmean_gradient
+    compounded_gradient = (
+        annual_trading_days * (variance + gmean_growth**2)**(annual_trading_days - 1) * (variance_gradient + 2 * gmean_growth * gmean_gradient)
+        - 2 * annual_trading_days * gmean_growth**(2*annual_trading_days - 1) * gmean_gradient
+    )
+    volatility_gradient = 50 * compounded_gradient / np.sqrt(compounded)
+    sharpe_gradient = (return_gradient * annualized_volatility - (annualized_return - risk_free_rate * 100) * volatility_gradient) / annualized_volatility**2
 
-    symbols = list(symbols)
-    strategies = list(strategies)
-    n_assets = len(equity_dfs_pct_change)
+    return -sharpe_ratio, -sharpe_gradient
 
-    if n_assets == 0:
-        return {}, 0
+# Indices of the strategy_limit candidates with the highest Sharpe ratios above -1, in their original order
+def select_candidates(sharpe_ratios: np.ndarray, strategy_limit: int) -> np.ndarray:
+    candidates = np.flatnonzero(sharpe_ratios >= -1)
+    return np.sort(candidates[np.argsort(-sharpe_ratios[candidates], kind='stable')[:strategy_limit]])
+
+# Weights with the highest Sharpe ratio for candidates with daily returns aligned on the same days.
+# The portfolio is measured on the days of the first candidate, on which it is only invested when
+# every candidate with any data has a return.
+def optimize_weights(returns: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, float]:
+    n_assets = len(returns)
+    invested_days = ~np.isnan(returns[valid.any(axis=1)]).any(axis=0)
+    day_returns = np.nan_to_num(returns[:, invested_days])
 
     constraints = (
-        {"type": "eq", "fun": lambda w: np.sum(w) - 1},
+        {"type": "eq", "fun": lambda w: np.sum(w) - 1, "jac": lambda w: np.ones_like(w)},
         # {"type": "ineq", "fun": lambda w: w - 1 / (n_assets * 2)},
     )
     bounds = [(0, 1) for _ in range(n_assets)]
@@ -98,46 +102,60 @@ def calculate_optimal_portfolio(results: List[Dict[str, Any]], strategy_limit: i
     optimization_result = minimize(
         calculate_weighted_sharpe_ratio_negative,
         initial_weights,
-        args=(equity_dfs_pct_change,),
+        args=(day_returns, valid[0].sum()),
         method="SLSQP",
+        jac=True,
         bounds=bounds,
         constraints=constraints,
     )
 
-    optimal_weights = optimization_result.x
-    optimal_portfolio = {symbol : [] for symbol in symbols}
+    return optimization_result.x, -optimization_result.fun
+
+def build_portfolio(candidates: List[Dict[str, Any]], weights: np.ndarray) -> Dict[str, List[Dict[str, Any]]]:
+    optimal_portfolio = {}
+
+    for candidate, weight in zip(candidates, weights):
+        if weight > 0.01:
+            optimal_portfolio.setdefault(candidate["symbol"], []).append({"strategy": candidate["strategy"], "weight": round(weight, 4), "sharpe": candidate["sharpe"]})
+
+    return optimal_portfolio
 
-    for i in range(n_assets):
-        if optimal_weights[i] > 0.01:
-            results[i]["weight"] = round(optimal_weights[i], 4)
-            optimal_portfolio[results[i]["symbol"]].append({"strategy": results[i]["strategy"], "weight": results[i]["weight"], "sharpe": results[i]["sharpe"]})
+def calculate_optimal_portfolio(results: List[Dict[str, Any]], strategy_limit: int) -> Tuple[Dict[str, List[Dict[str, Any]]], float]:
+    results = [results[i] for i in select_candidates(np.array([result['sharpe'] for result in results], dtype=float), strategy_limit)]
+
+    if not results:
+        return {}, 0
+
+    returns, valid = metrics.aligned_daily_returns([result['equity_curve']['Equity'] for result in results])
+    optimal_weights, optimized_sharpe = optimize_weights(returns, valid)
 
-    for symbol in symbols:
-        if not optimal_portfolio[symbol]:
-            optimal_portfolio.pop(symbol)
-            
-    return optimal_portfolio, -optimization_result.fun
+    for result, weight in zip(results, optimal_weights):
+        if weight > 0.01:
+            result["weight"] = round(weight, 4)
 
-def calculate_for_division(i: int, results: List[Dict[str, Any]], strategy_limit: int, n_divisions: int) -> Tuple[Dict[str, List[Dict[str, Any]]], float]:
-    divided_results = []
+    return build_portfolio(results, optimal_weights), optimized_sharpe
+
+# Divisions are cut from the shared equity matrix, each result is divided by its own length
+def calculate_for_division(i: int, curves: SharedEquityCurves, strategy_limit: int) -> Tuple[Dict[str, List[Dict[str, Any]]], float]:
+    index, equity = curves.division(i)
+    sharpe_ratios = np.array([round(float(sharpe_ratio), 4) for sharpe_ratio in metrics.calculate_metrics(index, equity)['sharpe']])
+    selected = select_candidates(sharpe_ratios, strategy_limit)
+
+    if len(selected) == 0:
+        return {}, 0
 
-    for result in results:
-        start_index = i * (len(result['equity_curve']) // n_divisions)
-        end_index = (i + 1) * (len(result['equity_curve']) // n_divisions)
-        divided_equity_curve = result['equity_curve'][start_index:end_index]
-        divided_result = result.copy()
-        divided_result['equity_curve'] = divided_equity_curve
-        divided_result['sharpe'] = round(calculate_sharpe_ratio(divided_result['equity_curve']['Equity']), 4)
-        divided_results.append(divided_result)
+    returns, valid = metrics.daily_returns(metrics.daily_equity(index, equity[selected]))
+    optimal_weights, optimized_sharpe = optimize_weights(returns, valid)
+    candidates = [{"symbol": curves.fields[j][0], "strategy": curves.fields[j][1], "sharpe": sharpe_ratios[j]} for j in selected]
 
-    return calculate_optimal_portfolio(divided_results, strategy_limit)
+    return build_portfolio(candidates, optimal_weights), optimized_sharpe
 
 def calculate_adaptive_portfolio(results: List[Dict[str, Any]], n_divisions: int, strategy_limit: int = 25) -> Tuple[List[Dict[str, List[Dict[str, Any]]]], List[float]]:
     optimal_portfolios = []
     sharpe_ratios = []
 
-    with Pool() as pool:
-        results = pool.starmap(calculate_for_division, [(i, results, strategy_limit, n_divisions) for i in range(n_divisions)])
+    with SharedEquityCurves(results, n_divisions) as curves, Pool() as pool:
+        results = pool.starmap(calculate_for_division, [(i, curves, strategy_limit) for i in range(n_divisions)])
         for optimal_portfolio, sharpe_ratio in results:
             optimal_portfolios.append(optimal_portfolio)
             sharpe_ratios.append(sharpe_ratio)
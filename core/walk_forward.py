@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import core.data_manipulator as dm
+import core.engine as engine
+import strategies.strategy_tester as st
+from core.results import CompactResult
+from typing import List, Dict, Optional, Any, Tuple
+
+
+TRAIN_BARS = 756
+TEST_BARS = 63
+STEP_BARS = 63
+CASH = 100000
+SIZE = 0.2
+
+
+def create_windows(length: int, train: int, test: int, step: int, anchored: bool = False) -> List[Tuple[int, int, int]]:
+    windows = []
+    train_end = train
+
+    # A test window needs at least two bars for the backtest to trade on
+    while train_end + 1 < length:
+        windows.append((0 if anchored else train_end - train, train_end, min(train_end + test, length)))
+        train_end += step
+
+    return windows
+
+# Signals and indicators are computed once over the full history, so every window slices bars
+# that are already warmed up instead of dropping a warm-up period of its own.
+def create_strategy_signals(df: pd.DataFrame, symbol: str, strategies: List[str]) -> Dict[str, pd.DataFrame]:
+    return {strategy: dm.create_signals(df.copy(), strategy, symbol) for strategy in strategies}
+
+def slice_signals(df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> Optional[pd.DataFrame]:
+    df = df.loc[start:end]
+    return df if len(df) > 1 else None
+
+def select_strategy(
+    signals: Dict[str, pd.DataFrame],
+    symbol: str,
+    start: pd.Timestamp,
+    end: pd.Timestamp,
+    backtest_engine: str = 'vectorized'
+) -> Optional[str]:
+    best_strategy = None
+    best_sharpe = 0
+
+    for strategy, df in signals.items():
+        df = slice_signals(df, start, end)
+
+        if df is None:
+            continue
+
+        result = st.gather_backtest_result(df, symbol, strategy, SIZE, False, backtest_engine)
+
+        if result is not None and result['Sharpe Ratio'] > best_sharpe:
+            best_strategy = strategy
+            best_sharpe = result['Sharpe Ratio']
+
+    return best_strategy
+
+def run_walk_forward_backtest(
+    stock_data: Dict[str, pd.DataFrame],
+    symbol: str,
+    strategies: Dict[str, int],
+    train: int = TRAIN_BARS,
+    test: int = TEST_BARS,
+    step: int = STEP_BARS,
+    anchored: bool = False,
+    backtest_engine: str = 'vectorized'
+) -> Optional[Dict[str, Any]]:
+    df = stock_data[symbol]
+
+    if df is None:
+        return None
+
+    signals = create_strategy_signals(df, symbol, list(strategies.keys()))
+    dates = pd.DatetimeIndex(sorted(set().union(*(frame.index for frame in signals.values()))))
+    windows = create_windows(len(dates), train, test, step, anchored)
+
+    if len(windows) == 0:
+        print(f"Not enough data for a walk forward backtest of {symbol}.")
+        return None
+
+    returns = pd.Series(0.0, index=dates[windows[0][1]:])
+    window_results = []
+    trade_count = 0
+    total_duration = pd.Timedelta(0)
+
+    for i, (train_start, train_end, test_end) in enumerate(windows):
+        # Overlapping test windows are cut where the next window takes over
+        test_end = min(test_end, windows[i + 1][1]) if i + 1 < len(windows) else test_end
+        strategy = select_strategy(signals, symbol, dates[train_start], dates[train_end - 1], backtest_engine)
+        window = {'train_start': dates[train_start], 'test_start': dates[train_end], 'test_end': dates[test_end - 1], 'strategy': strategy, 'sharpe': np.nan}
+        window_results.append(window)
+
+        if strategy is None:
+            continue
+
+        test_df = slice_signals(signals[strategy], dates[train_end], dates[test_end - 1])
+        result = None if test_df is None else st.gather_backtest_result(test_df, symbol, strategy, SIZE, False, backtest_engine)
+
+        if result is None:
+            continue
+
+        equity = result['_equity_curve']['Equity']
+        returns.loc[equity.index] = (equity / equity.shift(1, fill_value=CASH) - 1).to_numpy()
+        window['sharpe'] = result['Sharpe Ratio']
+        trade_count += result['# Trades']
+        total_duration += result['Avg. Trade Duration'] * result['# Trades']
+
+    if trade_count == 0:
+        print(f"Walk forward backtest for {symbol} made no trades.")
+        return None
+
+    equity = CASH * (1 + returns).cumprod().to_numpy()
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    performance = engine.calculate_performance(returns.index, equity, drawdown)
+
+    walk_forward_result = {
+        'symbol': symbol,
+        'max_drawdown': performance['Max. Drawdown [%]'],
+        'return': performance['Return [%]'],
+        'sharpe': performance['Sharpe Ratio'],
+        '# trades': trade_count,
+        'avg_trade_duration': total_duration / trade_count,
+        'strategy': next(window['strategy'] for window in reversed(window_results) if window['strategy'] is not None),
+        'windows': window_results
+    }
+
+    return CompactResult.from_equity_curve(walk_forward_result, pd.DataFrame({'Equity': equity}, index=returns.index))
@@ -0,0 +1,77 @@
+import importlib
+import inspect
+import json
+import os
+import threading
+from typing import List, Dict, Optional, Callable, Any, Tuple
+
+
+STRATEGY_FILES = ['strategies/strategies.json', 'strategies/community_strategies.json']
+
+
+class StrategySpec:
+    def __init__(self, name: str, signal_function: Optional[Callable[..., None]], strategy_class: Optional[type], params: Dict[str, Any]) -> None:
+        self.name = name
+        self.signal_function = signal_function
+        self.strategy_class = strategy_class
+        self.params = params
+
+    def __repr__(self) -> str:
+        return f"StrategySpec({self.name}, params={self.params})"
+
+registry: Dict[str, StrategySpec] = {}
+registry_mtimes: Optional[Tuple[int, ...]] = None
+registry_lock = threading.Lock()
+
+
+def file_mtimes() -> Tuple[int, ...]:
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else -1 for path in STRATEGY_FILES)
+
+def signal_params(signal_function: Optional[Callable[..., None]]) -> Dict[str, Any]:
+    if signal_function is None:
+        return {}
+
+    return {name: parameter.default for name, parameter in inspect.signature(signal_function).parameters.items() if parameter.default is not inspect.Parameter.empty}
+
+def build_registry() -> Dict[str, StrategySpec]:
+    dm = importlib.import_module('core.data_manipulator')
+    strats = importlib.import_module('strategies.strats')
+    names: Dict[str, Any] = {}
+
+    for path in STRATEGY_FILES:
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                names.update(json.load(file))
+
+    specs = {}
+
+    for name in names:
+        signal_function = getattr(dm, f"create_{name.lower()}_signals", None)
+        # Classes appended by the strategy creator are written with a lower case name
+        strategy_class = getattr(strats, name, None) or getattr(strats, name.lower(), None)
+        specs[name] = StrategySpec(name, signal_function, strategy_class, signal_params(signal_function))
+
+    return specs
+
+def get_registry() -> Dict[str, StrategySpec]:
+    global registry, registry_mtimes
+    mtimes = file_mtimes()
+
+    if mtimes != registry_mtimes:
+        with registry_lock:
+            if mtimes != registry_mtimes:
+                registry = build_registry()
+                registry_mtimes = mtimes
+
+    return registry
+
+def get_strategy(name: str) -> StrategySpec:
+    spec = get_registry().get(name)
+
+    if spec is None:
+        raise ValueError(f"Unknown strategy: {name}")
+
+    return spec
+
+def strategy_names() -> List[str]:
+    return list(get_registry().keys())
@@ -1,11 +1,27 @@
 import core.data_manipulator as dm
 import json
+import core.result_cache as rc
+import core.engine as engine
+import core.walk_forward as wf
+import core.tournament as tn
+import core.distributed as dd
+import core.results as rs
+import core.indicators as indicators
+import core.fingerprint as fp
 import strategies.strats as strats
+import strategies.registry as registry
 import pandas as pd
 from backtesting import Backtest
-from multiprocessing import Pool, Manager, cpu_count
-from core.logger import log_all_results
-from typing import List, Dict, Any, Optional
+from multiprocessing import Pool, cpu_count
+from collections import Counter
+from multiprocessing.pool import ThreadPool
+from contextlib import nullcontext
+from core.checkpoint import Checkpoint
+from core.logger import log_all_results, log_simple
+from core.scheduler import TaskScheduler, estimate_cost
+from core.panel import PricePanel
+from core.shared_data import SharedStockData
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
 
 def load_strategies_from_json(file_path: str) -> Dict[str, Any]:
@@ -20,59 +36,221 @@ def run_master_backtest(
     adaptive_strategy: bool = False, 
     optimize_portfolio: bool = False, 
     adaptive_portfolio: bool = False, 
-    plot_results: bool = False
+    plot_results: bool = False,
+    walk_forward: bool = False,
+    backtest_engine: Optional[str] = None,
+    executor: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel_event: Optional[Any] = None,
+    workers: Optional[int] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    tournament: bool = False
 ) -> List[Optional[Dict[str, Any]]]:
     with open('data\config.json', 'r') as file:
         config = json.load(file)
 
-    multiple_strategies = config['compare_strategies'] or config['optimize_portfolio'] or config['adaptive_portfolio'] or config['find_best'] or config['adaptive_strategy']
-    new_results = False
-    unclean_symbols = symbols
-    
+    backtest_engine = backtest_engine or config.get('engine', 'backtesting')
+    executor = executor or config.get('executor', 'process')
+    tournament = tournament or config.get('tournament', False)
+    eta = config.get('tournament_eta', tn.ETA)
+
     if (config['plot_results'] and len(symbols) > 10) or not plot_results:
         config['plot_results'] = False
         
-    with Manager() as manager:
-        strategies = manager.dict(load_strategies_from_json('strategies\strategies.json'))
-        community_strategies = manager.dict(load_strategies_from_json('strategies\community_strategies.json'))
-        strategies.update(community_strategies)
-        # strategies = manager.dict({'ROC_Trend_Following_Bull': 0})
-        # strategies = manager.dict({'MACD_Stoch_RSI': 0})
-        stock_data = manager.dict(dm.fetch_data_or_load_cached(symbols))
-
-        if multiple_strategies:
-            results = dm.load_cached_results(symbols, strategies.keys())
-            new_results = results is None
+    strategies = dict.fromkeys(registry.strategy_names(), 0)
+    # strategies = {'ROC_Trend_Following_Bull': 0}
+    # strategies = {'MACD_Stoch_RSI': 0}
+    panel = dm.fetch_panel_or_load_cached(symbols)
+    stock_frames = panel.to_frames()
+    symbols = list(panel.symbols)
+
+    indicator_counters = indicators.create_counters()
+    criteria = engine.AbortCriteria.from_config(config.get('abort_criteria'))
+    workers = min(len(symbols), workers or cpu_count())
+    # Every result is printed as it arrives, except in the modes that only log a selection of them
+    streamed = not (config['find_best'] or find_best or config.get('walk_forward', False) or walk_forward or config['adaptive_strategy'] or adaptive_strategy)
+    on_result = log_simple if streamed else None
+
+    with create_stock_data(panel, stock_frames, executor) as stock_data, create_pool(executor, workers, indicator_counters, stock_data) as pool:
+        scheduler = TaskScheduler(pool, workers, progress=progress, cancel_event=cancel_event)
+        symbol_costs = [estimate_cost(len(stock_frames[symbol])) for symbol in symbols]
+
+        if config['compare_strategies'] or compare_strategies or config['optimize_portfolio'] or optimize_portfolio or config['adaptive_portfolio'] or adaptive_portfolio:
+            results = run_cached_backtests(scheduler, stock_data, stock_frames, [(symbol, strategy) for symbol in symbols for strategy in strategies.keys()], config['plot_results'], backtest_engine, on_result, checkpoint)
+        elif (config['find_best'] or find_best) and tournament:
+            results = run_checkpointed_backtests(scheduler, tn.run_tournament_backtest, [(stock_data, symbol, strategies, False, 0, 1, backtest_engine, eta, config.get('tournament_audit', False), criteria) for symbol in symbols], [(symbol, 'tournament') for symbol in symbols], symbol_costs, checkpoint, stock_frames)
+        elif config['find_best'] or find_best:
+            results = run_cached_backtests(scheduler, stock_data, stock_frames, [(symbol, strategy) for symbol in symbols for strategy in strategies.keys()], config['plot_results'], backtest_engine, None, checkpoint, criteria)
+            results = select_best_results(results)
+        elif config.get('walk_forward', False) or walk_forward:
+            results = run_checkpointed_backtests(scheduler, wf.run_walk_forward_backtest, [(
+                stock_data, 
+                symbol, 
+                strategies, 
+                config.get('walk_forward_train', wf.TRAIN_BARS), 
+                config.get('walk_forward_test', wf.TEST_BARS), 
+                config.get('walk_forward_step', wf.STEP_BARS), 
+                config.get('walk_forward_anchored', False), 
+                backtest_engine
+            ) for symbol in symbols], [(symbol, 'walk_forward') for symbol in symbols], symbol_costs, checkpoint, stock_frames)
+        elif config['adaptive_strategy'] or adaptive_strategy:
+            results = run_checkpointed_backtests(scheduler, run_adaptive_backtest, [(stock_data, symbol, strategies, config['plot_results'], 0, 0.5, backtest_engine, criteria, eta if tournament else None) for symbol in symbols], [(symbol, 'adaptive_strategy') for symbol in symbols], symbol_costs, checkpoint, stock_frames)
         else:
-            results = None
+            results = run_cached_backtests(scheduler, stock_data, stock_frames, [(symbol, strategy) for symbol in symbols], config['plot_results'], backtest_engine, on_result, checkpoint)
+
+    indicators.print_stats(indicator_counters)
+    fp.print_stats(indicator_counters)
 
-        symbols = list(stock_data.keys())
+    results = [result for result in results if result is not None]
 
-        if results is None:
-            with Pool(min(len(symbols), cpu_count())) as pool:
-                if config['compare_strategies'] or compare_strategies or config['optimize_portfolio'] or optimize_portfolio or config['adaptive_portfolio'] or adaptive_portfolio:
-                    results = pool.starmap(run_backtest_process, [(stock_data, symbol, strategy, config['plot_results']) for symbol in symbols for strategy in strategies.keys()])
-                elif config['find_best'] or find_best:
-                    results = pool.starmap(find_best_backtest, [(stock_data, symbol, strategies, config['plot_results']) for symbol in symbols])
-                elif config['adaptive_strategy'] or adaptive_strategy:
-                    results = pool.starmap(run_adaptive_backtest, [(stock_data, symbol, strategies, config['plot_results']) for symbol in symbols])
-                else:
-                    results = pool.starmap(run_backtest_process, [(stock_data, symbol, strategy, config['plot_results']) for symbol in symbols])
+    if tournament:
+        tn.log_tournament(results)
+        # Misses of the tournament are only kept for its audit
+        results = [result for result in results if result['strategy'] is not None]
 
-        strategies = dict(strategies)
+    strategies = count_selections(results, strategies)
 
-    results = [result for result in results if result is not None]
+    if scheduler.cancelled and len(results) == 0:
+        print("No backtests finished before the run was cancelled.")
+        return results
 
     if config['sort_results']:
         results = sorted(results, key=lambda x: x[config['sorting_criteria']])
     
-    log_all_results(results, strategies, find_best, optimize_portfolio, adaptive_portfolio)
+    log_all_results(results, strategies, find_best, optimize_portfolio, adaptive_portfolio, log_results=not streamed)
+
+    return results
+
+# Threads share the frames and the indicator cache of this process, processes read the frames from shared memory
+def create_stock_data(panel: PricePanel, stock_frames: Dict[str, pd.DataFrame], executor: str = 'process') -> Any:
+    if executor == 'thread':
+        rs.register_calendar(panel.dates)
+        return nullcontext(stock_frames)
+    elif executor == 'distributed':
+        return dd.RemoteStockData(stock_frames)
+
+    return SharedStockData(panel=panel)
+
+# Process workers get the calendars of this process, so the results they send back only carry calendar ids
+def init_worker(indicator_counters: Any, calendars: Dict[str, Any]) -> None:
+    indicators.set_shared_counters(indicator_counters)
+    rs.set_calendars(calendars)
+
+def create_pool(executor: str, workers: int, indicator_counters: Any, stock_data: Optional[Any] = None) -> Pool:
+    if executor == 'thread':
+        return ThreadPool(workers, initializer=indicators.set_shared_counters, initargs=(indicator_counters,))
+    elif executor == 'process':
+        return Pool(workers, initializer=init_worker, initargs=(indicator_counters, dict(rs.calendars)))
+    elif executor == 'distributed':
+        return dd.start_coordinator(stock_data)
+
+    raise ValueError(f"Unknown executor: {executor}")
+
+def run_cached_backtests(
+    scheduler: TaskScheduler, 
+    stock_data: Dict[str, pd.DataFrame], 
+    stock_frames: Dict[str, pd.DataFrame], 
+    cells: List[Tuple[str, str]], 
+    plot: bool = False,
+    backtest_engine: str = 'backtesting',
+    on_result: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    criteria: Optional[engine.AbortCriteria] = None
+) -> List[Optional[Dict[str, Any]]]:
+    if plot:
+        return scheduler.pool.starmap(run_backtest_process, [(stock_data, symbol, strategy, plot, backtest_engine, criteria) for symbol, strategy in cells])
+
+    bars_hashes = {symbol: rc.data_hash(stock_frames[symbol]) for symbol in set(symbol for symbol, _ in cells)}
+    keys = [rc.cell_key(symbol, strategy, bars_hashes[symbol], backtest_engine=backtest_engine, criteria=criteria) for symbol, strategy in cells]
+    completed = checkpoint.load(bars_hashes) if checkpoint is not None else {}
+    results = [completed.get(cell, rc.MISSING) for cell in cells]
+
+    if completed:
+        print(f"Resuming job {checkpoint.job_id} with {sum(result is not rc.MISSING for result in results)} completed backtests.")
+
+    results = [rc.load_cell(key) if result is rc.MISSING else result for key, result in zip(keys, results)]
+    missing = [i for i, result in enumerate(results) if result is rc.MISSING]
+    print(f"Found {len(cells) - len(missing)} cached backtest results. Running {len(missing)} backtests.")
+
+    if on_result is not None:
+        for result in results:
+            if result is not rc.MISSING:
+                on_result(result)
+
+    tasks = [(stock_data, *cells[i], plot, backtest_engine, criteria) for i in missing]
+    costs = [estimate_cost(len(stock_frames[cells[i][0]]), cells[i][1]) for i in missing]
+
+    # Results are cached and passed on as soon as their chunk finishes
+    for task_index, result in scheduler.run(run_backtest_process, tasks, costs):
+        i = missing[task_index]
+        rc.save_cell(keys[i], result)
+        results[i] = result
+
+        if checkpoint is not None:
+            checkpoint.save(*cells[i], result, bars_hashes[cells[i][0]])
+
+        if on_result is not None:
+            on_result(result)
+
+    return [None if result is rc.MISSING else result for result in results]
+
+def run_checkpointed_backtests(
+    scheduler: TaskScheduler,
+    function: Callable[..., Optional[Dict[str, Any]]],
+    tasks: List[Tuple[Any, ...]],
+    cells: List[Tuple[str, str]],
+    costs: List[float],
+    checkpoint: Optional[Checkpoint] = None,
+    stock_frames: Optional[Dict[str, pd.DataFrame]] = None
+) -> List[Optional[Dict[str, Any]]]:
+    if checkpoint is None:
+        return scheduler.map(function, tasks, costs)
+
+    bars_hashes = {symbol: rc.data_hash(stock_frames[symbol]) for symbol in set(symbol for symbol, _ in cells)}
+    completed = checkpoint.load(bars_hashes)
+    missing = [i for i, cell in enumerate(cells) if cell not in completed]
+    results = [completed.get(cell) for cell in cells]
+
+    if len(missing) < len(cells):
+        print(f"Resuming job {checkpoint.job_id} with {len(cells) - len(missing)} completed backtests.")
 
-    if multiple_strategies and new_results:
-        dm.save_results(results, list(strategies.keys()), unclean_symbols)
+    for task_index, result in scheduler.run(function, [tasks[i] for i in missing], [costs[i] for i in missing]):
+        i = missing[task_index]
+        checkpoint.save(*cells[i], result, bars_hashes[cells[i][0]])
+        results[i] = result
 
     return results
 
+def select_best_results(results: List[Optional[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+    best_results = {}
+    pruned = sum(result is not None and 'pruned' in result for result in results)
+
+    if pruned > 0:
+        print(f"Pruned {pruned} of {len(results)} backtests early.")
+
+    for result in results:
+        if result is None or 'pruned' in result:
+            continue
+
+        best_result = best_results.get(result['symbol'])
+
+        if result['sharpe'] > (0 if best_result is None else best_result['sharpe']):
+            best_results[result['symbol']] = result
+
+    return list(best_results.values())
+
+# Workers return the strategy they selected with their result, so the selections are counted here once
+def count_selections(results: List[Dict[str, Any]], strategies: Dict[str, int]) -> Dict[str, int]:
+    counts = Counter(dict.fromkeys(strategies, 0))
+
+    for result in results:
+        # Walk forward results select a strategy per window
+        for selection in result['windows'] if 'windows' in result else [result]:
+            if selection.get('strategy') in counts:
+                counts[selection['strategy']] += 1
+
+    return dict(counts)
+
 def run_backtest(
     stock_data: Dict[str, pd.DataFrame], 
     symbol: str, 
@@ -81,23 +259,26 @@ def run_backtest(
     start_date: Optional[str] = None, 
     end_date: Optional[str] = None, 
     start_percent: float = 0, 
-    end_percent: float = 1
+    end_percent: float = 1,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
 ) -> Optional[Dict[str, Any]]:
-    if stock_data[symbol] is None:
-        return None
-    
     if start_date is not None and end_date is not None:
         df = dm.fetch_data(symbol, start_date, end_date)
     else:
-        df = stock_data[symbol].copy()
+        df = stock_data[symbol]
 
+    if df is None:
+        return None
+    
+    df = df.copy()
     start_index = int(start_percent * len(df))
     end_index = int(end_percent * len(df))
     df = df.iloc[start_index:end_index]
     size = 0.2
 
-    df = dm.create_signals(df, strategy)
-    result = gather_backtest_result(df, symbol, strategy, size, plot)
+    df = dm.create_signals(df, strategy, symbol)
+    result = gather_backtest_result(df, symbol, strategy, size, plot, backtest_engine, criteria)
 
     if result is None:
         print(f"Backtest for {symbol} with strategy -{strategy}- failed or no trades were made.")
@@ -109,12 +290,17 @@ def run_backtest_process(
     stock_data: Dict[str, pd.DataFrame], 
     symbol: str, 
     strategy: str, 
-    plot: bool = False
+    plot: bool = False,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
 ) -> Optional[Dict[str, Any]]:
-    result = run_backtest(stock_data, symbol, strategy, plot)
+    result = run_backtest(stock_data, symbol, strategy, plot, backtest_engine=backtest_engine, criteria=criteria)
     
     if result is None:
         return None
+
+    if 'Pruned' in result:
+        return {'symbol': symbol, 'strategy': strategy, 'pruned': result['Pruned']}
     
     simplified_result = dm.generate_simple_result(symbol, strategy, result)
 
@@ -126,16 +312,18 @@ def find_best_backtest(
     strategies: Dict[str, int], 
     plot: bool = False, 
     start_percent: float = 0, 
-    end_percent: float = 1
+    end_percent: float = 1,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
 ) -> Optional[Dict[str, Any]]:
     best_strategy = None
     best_result = None
     best_sharpe = 0
 
     for strategy in strategies.keys():
-        result = run_backtest(stock_data, symbol, strategy, plot, start_percent=start_percent, end_percent=end_percent)
+        result = run_backtest(stock_data, symbol, strategy, plot, start_percent=start_percent, end_percent=end_percent, backtest_engine=backtest_engine, criteria=criteria)
 
-        if result is None:
+        if result is None or 'Pruned' in result:
             continue
         
         if result['Sharpe Ratio'] > best_sharpe:
@@ -143,10 +331,7 @@ def find_best_backtest(
             best_sharpe = result['Sharpe Ratio']
             best_strategy = strategy
     
-    if best_strategy is not None:
-        strategies[best_strategy] += 1
-
-    else:
+    if best_strategy is None:
         return None
 
     simplified_result = dm.generate_simple_result(symbol, best_strategy, best_result)
@@ -159,16 +344,26 @@ def run_adaptive_backtest(
     strategies: Dict[str, int], 
     plot: bool = False, 
     start_percent: float = 0, 
-    end_percent: float = 0.5
+    end_percent: float = 0.5,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None,
+    tournament_eta: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
-    results = find_best_backtest(stock_data, symbol, strategies, plot, start_percent=start_percent, end_percent=end_percent)
+    if tournament_eta is not None:
+        results = tn.run_tournament_backtest(stock_data, symbol, strategies, plot, start_percent, end_percent, backtest_engine, tournament_eta, criteria=criteria)
+    else:
+        results = find_best_backtest(stock_data, symbol, strategies, plot, start_percent=start_percent, end_percent=end_percent, backtest_engine=backtest_engine, criteria=criteria)
 
     if results is None:
         return None
     
     strategy = results['strategy']
     
-    result = run_backtest(stock_data, symbol, strategy, plot, start_percent=end_percent, end_percent=1)
+    result = run_backtest(stock_data, symbol, strategy, plot, start_percent=end_percent, end_percent=1, backtest_engine=backtest_engine)
+
+    if result is None:
+        return None
+
     simplified_result = dm.generate_simple_result(symbol, strategy, result)
 
     return simplified_result
@@ -178,16 +373,43 @@ def gather_backtest_result(
     symbol: str, 
     strategy: str, 
     size: float, 
-    plot: bool = False
+    plot: bool = False,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
 ) -> Optional[Dict[str, Any]]:
     try:
-        bt = Backtest(df, strats.load_strategy(strategy, df, size), cash=100000, margin=1/1, commission=0.00025)
+        strategy_class = strats.load_strategy(strategy, df, size, criteria)
+        bt = Backtest(df, strategy_class, cash=100000, margin=1/1, commission=0.00025)
 
     except Exception as e:
         print(f"Error running backtest for {symbol}: {e}")
         return None
-        
-    result = bt.run()
+
+    if plot:
+        return run_engine(df, bt, strategy_class, size, plot, backtest_engine, criteria)
+
+    # Strategies with the same signals and exit rule on the same bars share one backtest
+    return fp.run_once(df, strategy_class, size, backtest_engine, criteria, lambda: run_engine(df, bt, strategy_class, size, plot, backtest_engine, criteria))
+
+def run_engine(
+    df: pd.DataFrame,
+    bt: Backtest,
+    strategy_class: type,
+    size: float,
+    plot: bool = False,
+    backtest_engine: str = 'backtesting',
+    criteria: Optional[engine.AbortCriteria] = None
+) -> Optional[Dict[str, Any]]:
+    # Plots are drawn by backtesting.py, so plotted runs always go through it, as do strategies that
+    # do not declare an exit rule the vectorized engine implements
+    try:
+        if backtest_engine == 'vectorized' and not plot and engine.declared_exit_rule(strategy_class) is not None:
+            result = engine.run_vectorized_backtest(df, strategy_class, size, cash=100000, commission=0.00025, criteria=criteria)
+        else:
+            result = bt.run()
+
+    except engine.BacktestPruned as e:
+        return {'Pruned': e.reason, 'Pruned At': df.index[e.bar]}
 
     if plot:
         bt.plot(resample=False)
@@ -1,33 +1,34 @@
-from typing import Type
+from typing import Type, Optional
 from pandas import DataFrame
 from backtesting import Strategy
-import strategies.strategy_tester as st
-import strategies.strats as strats
+import numpy as np
+import core.engine as engine
+import strategies.registry as registry
 
 
-dataframe: DataFrame = None
-trade_size: float = 0
+# Strategy loader function, every backtest gets its own subclass carrying its data and trade size
+# so that backtests can run concurrently in one process
+def load_strategy(strategy: str, df: DataFrame, size: float, criteria: Optional[engine.AbortCriteria] = None) -> Type[Strategy]:
+    strategy_class = registry.get_strategy(strategy).strategy_class
 
-# Strategy loader function
-def load_strategy(strategy: str, df: DataFrame, size: float) -> Type[Strategy]:
-    strategies = st.load_strategies_from_json('strategies\strategies.json')
-    community_strategies = st.load_strategies_from_json('strategies\community_strategies.json')
-    strategies.update(community_strategies)
-    keys = strategies.keys()
-    strategies = {key: getattr(strats, key) for key in keys}
-
-    if strategy not in strategies:
+    if strategy_class is None:
         raise ValueError(f"Unknown strategy: {strategy}")
-    
-    global dataframe
-    global trade_size
-    dataframe = df
-    trade_size = size
 
-    return strategies[strategy]
+    return type(strategy_class.__name__, (strategy_class,), {'dataframe': df, 'trade_size': size, 'abort_criteria': criteria})
 
 # Base class for strategies that use ATR and BUYSignal
 class Base_Strategy(Strategy):
+    # Set on the subclass load_strategy creates for each backtest
+    dataframe: DataFrame = None
+    trade_size: float = 0
+    abort_criteria: Optional[engine.AbortCriteria] = None
+    # Entry and exit rules the vectorized engine implements for this class, strategies without
+    # an exit rule of their own are run bar by bar through backtesting.py
+    entry_rule = 'signal'
+    exit_rule: Optional[str] = None
+    tp_coef = 2
+    sl_coef = 2
+
     def init(self) -> None:
         super().init()
 
@@ -37,14 +38,22 @@ class Base_Strategy(Strategy):
         def ATR() -> float:
             return self.df.atr
 
-        global dataframe
-        global trade_size
-        self.df = dataframe
-        self.size = trade_size
+        self.df = self.dataframe
+        self.size = self.trade_size
         self.BUYSignal = self.I(SIGNALBUY)
         self.atr = self.I(ATR)
-        self.tp_coef = 2
-        self.sl_coef = 2
+
+        if self.abort_criteria is not None:
+            strategy_next = self.next
+
+            def next() -> None:
+                self.check_abort_criteria()
+                strategy_next()
+
+            self.next = next
+            self.equity_history = []
+            self.peak_equity = 0
+            self.progress_checked = False
 
     def next(self) -> None:
         if len(self.trades) == 0 and self.BUYSignal > 0:
@@ -82,14 +91,34 @@ class Base_Strategy(Strategy):
     def calculate_trade_size(self) -> float:
         trade_size = self.size * (self.data.Close[-1] / (self.atr[-1] ** 2))
         return max(0.01, min(trade_size, 0.99))
+
+    # Raises BacktestPruned to stop the run, the last bar is left out as its equity changes when the backtest closes out
+    def check_abort_criteria(self) -> None:
+        bar = len(self.data) - 1
+
+        if bar == len(self.df) - 1:
+            return
+
+        equity = self.equity
+        self.equity_history.append(equity)
+        self.peak_equity = max(self.peak_equity, equity)
+        self.abort_criteria.check_drawdown(1 - equity / self.peak_equity, bar)
+
+        if not self.progress_checked and bar >= self.abort_criteria.checkpoint_bar(len(self.df)):
+            self.progress_checked = True
+            # Bars before the first call to next are filled with the first equity like the final equity curve is
+            equity_curve = np.r_[np.full(bar + 1 - len(self.equity_history), self.equity_history[0]), self.equity_history]
+            self.abort_criteria.check_progress(self.data.index, equity_curve, len(self.closed_trades) + len(self.trades), bar)
     
 class Trailing_Stop_Loss_Strategy(Base_Strategy):
+    exit_rule = 'trailing'
+    atr_coef = 6  # Can be customized in child classes
+
     def init(self) -> None:
         super().init()
         self.stop_loss = -1
         self.max_price = -1
         self.min_price = float('inf')
-        self.atr_coef = 6  # Can be customized in child classes
 
     def update_trailing_stop(self) -> None:
         if len(self.trades) > 0:
@@ -120,46 +149,50 @@ class Trailing_Stop_Loss_Strategy(Base_Strategy):
 
 # Buy and Hold strategy
 class Buy_And_Hold(Base_Strategy):
+    entry_rule = 'always'
+    exit_rule = 'hold'
+
     def next(self) -> None:
         if len(self.trades) == 0:
             self.buy(size=self.size)
 
 # Daily Range strategy
 class Daily_Range(Base_Strategy):
+    exit_rule = 'green_day'
+
     def next(self) -> None:
         super().close_next_green_day()
         super().next()
 
 # Solo RSI strategy
 class Solo_RSI(Base_Strategy):
+    exit_rule = 'green_day'
+
     def next(self) -> None:
         super().close_next_green_day()
         super().next()
 
 # ROC Trend Following Bull strategy
 class ROC_Trend_Following_Bull(Trailing_Stop_Loss_Strategy):
-    def init(self) -> None:
-        super().init()
-        self.atr_coef = 6
+    exit_rule = 'trailing'
+    atr_coef = 6
 
     def next(self) -> None:
         super().next()
 
 # ROC Trend Following Bear strategy
 class ROC_Trend_Following_Bear(Trailing_Stop_Loss_Strategy):
-    def init(self) -> None:
-        super().init()
-        self.atr_coef = 6
+    exit_rule = 'trailing'
+    atr_coef = 6
 
     def next(self) -> None:
         super().next()
 
 # ROC Mean Reversion strategy
 class ROC_Mean_Reversion(Base_Strategy):
-    def init(self) -> None:
-        super().init()
-        self.tp_coef = 2.5
-        self.sl_coef = 5
+    exit_rule = 'tpsl'
+    tp_coef = 2.5
+    sl_coef = 5
 
     def next(self) -> None:
         # super().close_next_green_day()
@@ -168,37 +201,41 @@ class ROC_Mean_Reversion(Base_Strategy):
 
 # Buy And Holder strategy
 class Buy_And_Holder(Base_Strategy):
-    def init(self) -> None:
-        super().init()
-        self.atr_coef = 6
+    exit_rule = 'hold'
+    atr_coef = 6
 
     def next(self) -> None:
         super().next()
 
 # Buy After Red Day strategy
 class Buy_After_Red_Day(Base_Strategy):
+    exit_rule = 'green_day'
+
     def next(self) -> None:
         super().close_next_green_day()
         super().next()
 
 # Buy After Green Day strategy
 class Buy_After_Green_Day(Base_Strategy):
+    exit_rule = 'green_day'
+
     def next(self) -> None:
         super().close_next_green_day()
         super().next()
 
 # Shorting RSI strategy
 class Shorting_RSI(Base_Strategy):
+    exit_rule = 'red_day'
+
     def next(self) -> None:
         super().close_next_red_day()
         super().next()
 
 # MACD Stoch RSI strategy
 class MACD_Stoch_RSI(Base_Strategy):
-    def init(self) -> None:
-        super().init()
-        self.tp_coef = 6
-        self.sl_coef = 6
+    exit_rule = 'tpsl'
+    tp_coef = 6
+    sl_coef = 6
 
     def next(self) -> None:
         # super().close_next_green_day()
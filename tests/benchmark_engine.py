@@ -0,0 +1,54 @@
+import sys
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import core.data_manipulator as dm
+import core.engine as engine
+import strategies.registry as registry
+import strategies.strats as strats
+from backtesting import Backtest
+from typing import List, Dict, Tuple
+from tests.test_engine import create_frame, CASH, COMMISSION, SIZE
+
+
+# Times bt.run() against the vectorized engine for every registered strategy on each symbol. Signals are
+# created before the clock starts since both engines share them. Runs on synthetic bars, or on stored
+# symbols when they are given: python -m tests.benchmark_engine SPY QQQ
+def time_engines(df: pd.DataFrame, strategy: str) -> Tuple[float, float]:
+    signals = dm.create_signals(df.copy(), strategy)
+    strategy_class = strats.load_strategy(strategy, signals, SIZE)
+
+    start = time.perf_counter()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        Backtest(signals, strategy_class, cash=CASH, margin=1, commission=COMMISSION).run()
+
+    backtesting_time = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.run_vectorized_backtest(signals, strategy_class, SIZE, CASH, COMMISSION)
+
+    return backtesting_time, time.perf_counter() - start
+
+def run_benchmark(stock_data: Dict[str, pd.DataFrame]) -> None:
+    strategies = registry.strategy_names()
+    totals = np.zeros(2)
+
+    print(f"{'Symbol':<8}{'Bars':>7}{'backtesting.py':>16}{'vectorized':>12}{'Speedup':>9}")
+
+    for symbol, df in stock_data.items():
+        times = np.sum([time_engines(df, strategy) for strategy in strategies], axis=0)
+        totals += times
+        print(f"{symbol:<8}{len(df):>7}{times[0]:>15.2f}s{times[1]:>11.3f}s{times[0] / times[1]:>8.1f}x")
+
+    print(f"{'Total':<15}{totals[0]:>15.2f}s{totals[1]:>11.3f}s{totals[0] / totals[1]:>8.1f}x")
+
+def load_stock_data(symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    if symbols:
+        return dm.fetch_data_or_load_cached(symbols)
+
+    return {f'SYN{seed}': create_frame(seed, bars) for seed, bars in enumerate([1000, 2500, 5000])}
+
+if __name__ == "__main__":
+    run_benchmark(load_stock_data(sys.argv[1:]))
@@ -0,0 +1,29 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import core.metrics as metrics
+import core.utils as utils
+from tests.test_metrics import create_curves
+
+
+# Times the Sharpe ratio of many equity curves with one utils.calculate_sharpe_ratio call per curve
+# against the batched kernel: python -m tests.benchmark_metrics 5000 1500
+def run_benchmark(curves: int, bars: int) -> None:
+    index = pd.bdate_range('2015-01-01', periods=bars)
+    equity = create_curves(curves, bars, index)
+
+    start = time.perf_counter()
+    expected = np.array([utils.calculate_sharpe_ratio(pd.Series(curve, index=index)) for curve in equity])
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sharpe = metrics.calculate_metrics(index, equity)['sharpe']
+    batched_time = time.perf_counter() - start
+
+    print(f"{curves} curves x {bars} bars: {loop_time:.2f}s per curve, {batched_time:.2f}s batched ({loop_time / batched_time:.1f}x).")
+    print(f"Largest Sharpe difference: {np.nanmax(np.abs(sharpe - expected)):.2e}")
+
+if __name__ == "__main__":
+    curves, bars = (int(arg) for arg in sys.argv[1:3]) if len(sys.argv) > 2 else (5000, 1500)
+    run_benchmark(curves, bars)
@@ -0,0 +1,37 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import core.portfolio as portfolio
+from tests.test_portfolio import create_curves
+
+
+# Times the combined equity of an equal-weight portfolio of many curves, as a sum of pandas Series
+# and with combine_equity, and compares its drawdown with the weighted sum of the curves' drawdowns
+# the logs used to report: python -m tests.benchmark_portfolio 10000 2500
+def run_benchmark(curves: int, bars: int) -> None:
+    index = pd.bdate_range('2010-01-01', periods=bars)
+    equity = create_curves(curves, bars)
+    weights = np.full(curves, 1 / curves)
+
+    start = time.perf_counter()
+    summed = sum(pd.Series(curve / curve[0] * weight, index=index) for curve, weight in zip(equity, weights)) * portfolio.CASH
+    summed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = portfolio.combine_equity(index, equity, weights)
+    combined_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    portfolio.combine_equity(index, equity, np.tile(weights, (4, 1)), [i * bars // 4 for i in range(4)])
+    schedule_time = time.perf_counter() - start
+
+    drawdowns = weights @ (1 - equity / np.maximum.accumulate(equity, axis=1))
+
+    print(f"{curves} curves x {bars} bars: {summed_time:.2f}s summing Series, {combined_time:.2f}s combine_equity, {schedule_time:.2f}s with 4 divisions.")
+    print(f"Largest equity difference: {np.abs(combined['Equity'].to_numpy() / summed.to_numpy() - 1).max():.2e}")
+    print(f"Max drawdown {combined['DrawdownPct'].max() * 100:.2f}%, summed curve drawdowns {drawdowns.max() * 100:.2f}%.")
+
+if __name__ == "__main__":
+    curves, bars = (int(arg) for arg in sys.argv[1:3]) if len(sys.argv) > 2 else (10000, 2500)
+    run_benchmark(curves, bars)
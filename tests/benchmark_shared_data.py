@@ -0,0 +1,40 @@
+import pickle
+import sys
+import time
+from multiprocessing import Pool, cpu_count
+from core.scheduler import TaskScheduler
+from core.shared_data import SharedStockData
+from tests.test_engine import create_frame
+from typing import List, Dict, Any, Tuple
+
+
+def read_close(stock_data: Any, symbol: str) -> float:
+    return float(stock_data[symbol]['Close'].iloc[-1])
+
+# Runs the tasks in chunks like the backtests are, returns the time and the bytes of market data sent
+def time_tasks(stock_data: Any, symbols: List[str], tasks_per_symbol: int, workers: int) -> Tuple[float, int]:
+    tasks = [(stock_data, symbol) for symbol in symbols for _ in range(tasks_per_symbol)]
+    start = time.perf_counter()
+
+    with Pool(workers) as pool:
+        scheduler = TaskScheduler(pool, workers)
+        scheduler.map(read_close, tasks)
+
+    return time.perf_counter() - start, len(scheduler.create_chunks([1.0] * len(tasks))) * len(pickle.dumps(stock_data))
+
+# Times pool tasks that read one symbol's bars when every chunk of tasks pickles the frames against
+# tasks that get a handle to them in shared memory: python -m tests.benchmark_shared_data 100 2500 10 4
+def run_benchmark(symbols: int, bars: int, tasks_per_symbol: int, workers: int) -> None:
+    stock_frames: Dict[str, Any] = {f'SYN{seed}': create_frame(seed, bars) for seed in range(symbols)}
+    pickled_time, pickled_size = time_tasks(stock_frames, list(stock_frames), tasks_per_symbol, workers)
+
+    with SharedStockData(stock_frames) as stock_data:
+        shared_time, shared_size = time_tasks(stock_data, list(stock_frames), tasks_per_symbol, workers)
+
+    print(f"{symbols} symbols x {bars} bars, {symbols * tasks_per_symbol} tasks on {workers} workers.")
+    print(f"Pickled frames: {pickled_size / 1e6:.1f} MB sent, {pickled_time:.2f}s.")
+    print(f"Shared memory: {shared_size / 1e3:.1f} KB sent, {shared_time:.2f}s ({pickled_time / shared_time:.1f}x).")
+
+if __name__ == "__main__":
+    symbols, bars, tasks_per_symbol = (int(arg) for arg in sys.argv[1:4]) if len(sys.argv) > 3 else (100, 2500, 10)
+    run_benchmark(symbols, bars, tasks_per_symbol, int(sys.argv[4]) if len(sys.argv) > 4 else cpu_count())
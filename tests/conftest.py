@@ -0,0 +1,9 @@
+import os
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Strategies and config are read with paths relative to the repository root
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+import core.data_manipulator as dm
+import core.price_store as pstore
+from tests.test_engine import create_frame
+from typing import Dict, Any
+
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    return create_frame(5, 1100)
+
+def refresh(stock_data: Dict[str, pd.DataFrame], path: str, **kwargs: Any) -> Dict[str, str]:
+    return dm.refresh_stock_data(list(stock_data), dm.LocalProvider(stock_data), path=path, **kwargs)
+
+def assert_stored(symbol: str, expected: pd.DataFrame, path: str) -> None:
+    stored = pstore.read_symbol(symbol, pstore.load_manifest(path), path=path)
+    pd.testing.assert_frame_equal(stored, expected.reset_index(drop=True), check_dtype=False)
+
+def test_new_symbols_are_stored(tmp_path, history: pd.DataFrame) -> None:
+    assert refresh({'AAA': history, 'BBB': None}, str(tmp_path)) == {'AAA': 'new', 'BBB': 'failed'}
+    assert_stored('AAA', history, str(tmp_path))
+
+def test_new_bars_are_appended(tmp_path, history: pd.DataFrame) -> None:
+    # The last bar of the first download was taken intraday and is replaced by the final one
+    intraday = history.iloc[:1000].copy()
+    intraday.iloc[-1, intraday.columns.get_loc('Close')] *= 1.01
+    refresh({'AAA': intraday}, str(tmp_path))
+
+    assert refresh({'AAA': history}, str(tmp_path)) == {'AAA': 'appended'}
+    assert_stored('AAA', history, str(tmp_path))
+    assert refresh({'AAA': history}, str(tmp_path)) == {'AAA': 'current'}
+    assert_stored('AAA', history, str(tmp_path))
+
+def test_adjusted_history_is_reloaded(tmp_path, history: pd.DataFrame) -> None:
+    refresh({'AAA': history.iloc[:1000]}, str(tmp_path))
+    # A 2:1 split adjusts every earlier price
+    adjusted = history.copy()
+    adjusted[['Open', 'High', 'Low', 'Close']] /= 2
+
+    assert refresh({'AAA': adjusted}, str(tmp_path)) == {'AAA': 'reloaded'}
+    assert_stored('AAA', adjusted, str(tmp_path))
+
+def test_full_refresh_rewrites_history(tmp_path, history: pd.DataFrame) -> None:
+    refresh({'AAA': history}, str(tmp_path))
+
+    assert refresh({'AAA': history.iloc[200:]}, str(tmp_path), full_refresh=True) == {'AAA': 'new'}
+    assert_stored('AAA', history.iloc[200:], str(tmp_path))
+
+def test_check_overlap(history: pd.DataFrame) -> None:
+    stored = pstore.column_arrays(history.iloc[:1000])
+    tail = history.iloc[990:]
+
+    assert dm.check_overlap(stored, tail) == 990
+
+    changed = tail.copy()
+    changed.iloc[3, changed.columns.get_loc('Low')] *= 0.99
+    assert dm.check_overlap(stored, changed) is None
+
+    assert dm.check_overlap(stored, tail.drop(tail.index[4])) is None
+    # Only the last stored bar overlaps and it is never compared
+    assert dm.check_overlap(stored, history.iloc[999:]) is None
+
+def test_symbols_refreshed_today_are_not_refreshed_again(tmp_path, history: pd.DataFrame, capsys: pytest.CaptureFixture) -> None:
+    provider = dm.LocalProvider({'AAA': history, 'BBB': history})
+    dm.refresh_if_needed(['AAA', 'BBB'], provider, path=str(tmp_path))
+    assert 'Refreshing stock data of 2 symbols' in capsys.readouterr().out
+
+    dm.refresh_if_needed(['AAA', 'BBB'], provider, path=str(tmp_path))
+    assert 'Loading cached stock data.' in capsys.readouterr().out
+
+    dm.refresh_if_needed(['AAA', 'BBB', 'CCC'], provider, path=str(tmp_path))
+    assert 'Refreshing stock data of 1 symbols' in capsys.readouterr().out
+
+    dm.refresh_if_needed(['AAA', 'BBB'], provider, full_refresh=True, path=str(tmp_path))
+    assert 'Refreshing stock data of 2 symbols' in capsys.readouterr().out
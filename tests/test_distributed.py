@@ -0,0 +1,54 @@
+import socket
+import numpy as np
+import pandas as pd
+import pytest
+import core.distributed as dd
+import strategies.registry as registry
+import strategies.strategy_tester as st
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from tests.test_engine import create_frame
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.mark.parametrize('backtest_engine', ['backtesting', 'vectorized'])
+def test_workers_match_local_run(tmp_path, monkeypatch, backtest_engine: str) -> None:
+    monkeypatch.delenv('ALGOTRADING_AUTHKEY', raising=False)
+    # Workers cache the market data they are sent under the test's own directory
+    monkeypatch.setattr(dd.load_data, '__defaults__', (str(tmp_path),))
+    stock_frames = {f'SYN{seed}': create_frame(seed, 800 + 200 * seed) for seed in range(4)}
+    tasks = [(symbol, strategy, False, backtest_engine) for symbol in stock_frames for strategy in registry.strategy_names()]
+    local = [st.run_backtest_process(stock_frames, *task) for task in tasks]
+
+    with dd.RemoteStockData(stock_frames) as stock_data, dd.Coordinator(stock_data.data, '127.0.0.1', free_port()) as coordinator:
+        workers = dd.launch_local_workers(2, '127.0.0.1', coordinator.listener.address[1], coordinator.authkey)
+        remote = coordinator.starmap(st.run_backtest_process, [(stock_data, *task) for task in tasks])
+
+    # Workers are told to stop once the coordinator closes
+    for worker in workers:
+        worker.join(timeout=10)
+
+    assert len(coordinator.authkey) == 32
+    assert all(worker.exitcode == 0 for worker in workers)
+    assert len(list(tmp_path.iterdir())) > 0
+
+    for local_result, remote_result in zip(local, remote):
+        assert (local_result is None) == (remote_result is None)
+
+        if local_result is not None:
+            pd.testing.assert_series_equal(pd.Series(dict(remote_result)), pd.Series(dict(local_result)))
+            np.testing.assert_array_equal(remote_result['equity_curve'].index, local_result['equity_curve'].index)
+            np.testing.assert_array_equal(remote_result['equity_curve']['Equity'], local_result['equity_curve']['Equity'])
+
+def test_workers_need_the_run_key(monkeypatch) -> None:
+    monkeypatch.delenv('ALGOTRADING_AUTHKEY', raising=False)
+
+    with dd.Coordinator({}, '127.0.0.1', free_port()) as coordinator, dd.Coordinator({}, '127.0.0.1', free_port()) as other:
+        assert coordinator.authkey != other.authkey
+
+        with pytest.raises(AuthenticationError):
+            Client(coordinator.listener.address, authkey=other.authkey)
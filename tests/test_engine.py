@@ -0,0 +1,251 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+import core.data_manipulator as dm
+import core.engine as engine
+import strategies.registry as registry
+import strategies.strats as strats
+import strategies.strategy_tester as st
+from backtesting import Backtest
+from typing import Dict, Optional, Any, Tuple
+
+
+CASH = 100000
+COMMISSION = 0.00025
+SIZE = 0.2
+SEEDS = [0, 1, 2]
+# Strategies the exit rules are tested with, on random long and short signals
+RULE_STRATEGIES = {
+    'hold': 'Buy_And_Holder',
+    'green_day': 'Daily_Range',
+    'red_day': 'Shorting_RSI',
+    'tpsl': 'ROC_Mean_Reversion',
+    'trailing': 'ROC_Trend_Following_Bull'
+}
+CRITERIA = [
+    {'max_drawdown': 10},
+    {'min_trades': 15},
+    {'min_sharpe': 0.5},
+    {'max_drawdown': 25, 'min_trades': 5, 'min_sharpe': 0, 'checkpoint': 0.3}
+]
+
+
+def create_frame(seed: int, bars: int = 1500, drift: float = 0.0004) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(drift, 0.02, bars)))
+    open = close * np.exp(rng.normal(0, 0.01, bars))
+    high = np.maximum(open, close) * np.exp(np.abs(rng.normal(0, 0.01, bars)))
+    low = np.minimum(open, close) * np.exp(-np.abs(rng.normal(0, 0.01, bars)))
+
+    return pd.DataFrame({
+        'Date': pd.bdate_range('2015-01-01', periods=bars),
+        'Open': open,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': rng.integers(100000, 1000000, bars)
+    })
+
+def create_random_signals(seed: int, rate: float = 0.03) -> pd.DataFrame:
+    df = dm.create_signals(create_frame(seed), 'Buy_And_Holder')
+    rng = np.random.default_rng(seed)
+    df['BUYSignal'] = np.where(rng.random(len(df)) < rate, rng.choice([1, 2], len(df)), 0)
+
+    return df
+
+def run_backtest(df: pd.DataFrame, strategy: str, backtest_engine: str, criteria: Optional[Dict[str, Any]] = None) -> Any:
+    abort_criteria = engine.AbortCriteria.from_config(criteria)
+    strategy_class = strats.load_strategy(strategy, df, SIZE, abort_criteria)
+
+    try:
+        if backtest_engine == 'vectorized':
+            return engine.run_vectorized_backtest(df, strategy_class, SIZE, CASH, COMMISSION, criteria=abort_criteria)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return Backtest(df, strategy_class, cash=CASH, margin=1, commission=COMMISSION).run()
+
+    except engine.BacktestPruned as e:
+        return e
+
+def assert_same_result(vectorized: Any, backtesting: Any) -> None:
+    assert vectorized['# Trades'] == backtesting['# Trades']
+
+    for column in ['Size', 'EntryBar', 'ExitBar']:
+        np.testing.assert_array_equal(vectorized['_trades'][column].to_numpy(), backtesting['_trades'][column].to_numpy())
+
+    for column in ['EntryPrice', 'ExitPrice']:
+        np.testing.assert_allclose(vectorized['_trades'][column].to_numpy(), backtesting['_trades'][column].to_numpy(), rtol=1e-9)
+
+    np.testing.assert_allclose(vectorized['_equity_curve']['Equity'].to_numpy(), backtesting['_equity_curve']['Equity'].to_numpy(), rtol=1e-9)
+
+    for metric in ['Sharpe Ratio', 'Return [%]', 'Max. Drawdown [%]']:
+        np.testing.assert_allclose(vectorized[metric], backtesting[metric], rtol=1e-6, equal_nan=True)
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('strategy', registry.strategy_names())
+def test_registered_strategy_matches_backtesting(strategy: str, seed: int) -> None:
+    df = dm.create_signals(create_frame(seed), strategy)
+    assert_same_result(run_backtest(df, strategy, 'vectorized'), run_backtest(df, strategy, 'backtesting'))
+
+@pytest.mark.parametrize('rate', [0.03, 0.3])
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('exit_rule', engine.EXIT_RULES)
+def test_exit_rule_matches_backtesting(exit_rule: str, seed: int, rate: float) -> None:
+    strategy = RULE_STRATEGIES[exit_rule]
+    assert registry.get_strategy(strategy).strategy_class.exit_rule == exit_rule
+
+    df = create_random_signals(seed, rate)
+    assert_same_result(run_backtest(df, strategy, 'vectorized'), run_backtest(df, strategy, 'backtesting'))
+
+# A short held while the price more than doubles runs the account out of money
+@pytest.mark.parametrize('criteria', [None] + CRITERIA)
+@pytest.mark.parametrize('seed', SEEDS)
+def test_out_of_money_matches_backtesting(seed: int, criteria: Optional[Dict[str, Any]]) -> None:
+    df = dm.create_signals(create_frame(seed, drift=0.005), 'Buy_And_Holder')
+    df['BUYSignal'] = 0
+    df.iloc[5, df.columns.get_loc('BUYSignal')] = 2
+    backtesting = run_backtest(df, 'Buy_And_Holder', 'backtesting', criteria)
+    vectorized = run_backtest(df, 'Buy_And_Holder', 'vectorized', criteria)
+
+    assert isinstance(vectorized, engine.BacktestPruned) == isinstance(backtesting, engine.BacktestPruned)
+
+    if criteria is None:
+        assert backtesting['Equity Final [$]'] == 0
+
+    if not isinstance(vectorized, engine.BacktestPruned):
+        assert_same_result(vectorized, backtesting)
+
+@pytest.mark.parametrize('criteria', CRITERIA)
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('exit_rule', engine.EXIT_RULES)
+def test_abort_criteria_match_backtesting(exit_rule: str, seed: int, criteria: Dict[str, Any]) -> None:
+    df = create_random_signals(seed)
+    vectorized = run_backtest(df, RULE_STRATEGIES[exit_rule], 'vectorized', criteria)
+    backtesting = run_backtest(df, RULE_STRATEGIES[exit_rule], 'backtesting', criteria)
+
+    # The vectorized engine sees a drawdown once the trade it happens in is over, so only the outcome is compared
+    assert isinstance(vectorized, engine.BacktestPruned) == isinstance(backtesting, engine.BacktestPruned)
+
+    if not isinstance(vectorized, engine.BacktestPruned):
+        assert_same_result(vectorized, backtesting)
+
+# Closes every trade after three bars, which none of the exit rules describe
+class Three_Bar_Exit(strats.Daily_Range):
+    def next(self) -> None:
+        for trade in self.trades:
+            if len(self.data) - trade.entry_bar >= 3:
+                trade.close()
+
+        strats.Base_Strategy.next(self)
+
+@pytest.mark.parametrize('strategy', registry.strategy_names())
+def test_registered_strategy_declares_exit_rule(strategy: str) -> None:
+    assert engine.declared_exit_rule(registry.get_strategy(strategy).strategy_class) in engine.EXIT_RULES
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_undeclared_exit_rule_runs_through_backtesting(seed: int) -> None:
+    df = create_random_signals(seed, 0.3)
+    strategy_class = type('Three_Bar_Exit', (Three_Bar_Exit,), {'dataframe': df, 'trade_size': SIZE})
+    bt = Backtest(df, strategy_class, cash=CASH, margin=1, commission=COMMISSION)
+
+    assert engine.declared_exit_rule(strategy_class) is None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        vectorized = st.run_engine(df, bt, strategy_class, SIZE, backtest_engine='vectorized')
+        backtesting = bt.run()
+
+    assert (vectorized['_trades']['ExitBar'] - vectorized['_trades']['EntryBar']).max() <= 3
+    assert_same_result(vectorized, backtesting)
+
+# Bar by bar versions of the searches the vectorized engine skips flat bars with
+def scan_tpsl_exit(open: np.ndarray, high: np.ndarray, low: np.ndarray, entry_bar: int, is_long: bool, tp: float, sl: float) -> Tuple[int, Optional[float]]:
+    for bar in range(entry_bar, len(open)):
+        if (low[bar] < sl) if is_long else (high[bar] > sl):
+            return bar, min(open[bar], sl) if is_long else max(open[bar], sl)
+
+        if (high[bar] > tp) if is_long else (low[bar] < tp):
+            return bar, max(open[bar], tp) if is_long else min(open[bar], tp)
+
+    return -1, None
+
+def scan_trailing_exit(close: np.ndarray, atr: np.ndarray, last: int, entry_bar: int, is_long: bool, atr_coef: float, state: engine.TrailingState) -> Tuple[int, bool]:
+    for bar in range(entry_bar, last + 1):
+        if is_long and close[bar] > state.max_price:
+            state.max_price = close[bar]
+            state.stop_loss = close[bar] - atr[bar] * atr_coef
+        elif not is_long and close[bar] < state.min_price:
+            state.min_price = close[bar]
+            state.stop_loss = close[bar] + atr[bar] * atr_coef
+
+        if (close[bar] < state.stop_loss) if is_long else (close[bar] > state.stop_loss):
+            return (last, False) if bar >= last else (bar + 1, True)
+
+    return last, False
+
+@pytest.fixture
+def prices() -> Dict[str, np.ndarray]:
+    df = create_frame(7, 5000)
+    arrays = {column.lower(): df[column].to_numpy() for column in ['Open', 'High', 'Low', 'Close']}
+    arrays['atr'] = pd.Series(arrays['high'] - arrays['low']).rolling(14, min_periods=1).mean().to_numpy()
+
+    return arrays
+
+@pytest.mark.parametrize('rate', [0.0005, 0.01, 0.5])
+def test_next_event_finds_the_first_event(rate: float) -> None:
+    flags = np.random.default_rng(3).random(3000) < rate
+    events = np.flatnonzero(flags)
+
+    for bar in range(len(flags)):
+        expected = bar + int(np.argmax(flags[bar:])) if flags[bar:].any() else -1
+        assert engine.next_event(events, bar) == expected
+
+@pytest.mark.parametrize('exit_rule', ['hold', 'green_day', 'red_day'])
+def test_close_exit_matches_scan(prices: Dict[str, np.ndarray], exit_rule: str) -> None:
+    closes = prices['close'] > prices['open'] if exit_rule == 'green_day' else prices['close'] < prices['open']
+    close_bars = np.flatnonzero(closes)
+    last = len(closes) - 1
+
+    for entry_bar in range(0, len(closes), 7):
+        for is_long in [True, False]:
+            exit_bar, exited = engine.find_close_exit(close_bars, last, entry_bar, is_long, exit_rule)
+
+            if (exit_rule == 'green_day' and not is_long) or (exit_rule == 'red_day' and is_long) or exit_rule == 'hold' or not closes[entry_bar:last].any():
+                assert (exit_bar, exited) == (last, False)
+            else:
+                assert (exit_bar, exited) == (entry_bar + int(np.argmax(closes[entry_bar:last])) + 1, True)
+
+# Wide stops keep trades open for hundreds of bars, past several of the windows the searches double
+@pytest.mark.parametrize('width', [0.5, 3, 20, 200])
+def test_tpsl_exit_matches_scan(prices: Dict[str, np.ndarray], width: float) -> None:
+    open, high, low, close, atr = (prices[column] for column in ['open', 'high', 'low', 'close', 'atr'])
+
+    for entry_bar in range(1, len(open), 97):
+        for is_long in [True, False]:
+            offset = width * atr[entry_bar - 1]
+            tp = close[entry_bar - 1] + offset if is_long else close[entry_bar - 1] - offset
+            sl = max(0.01, close[entry_bar - 1] - offset if is_long else close[entry_bar - 1] + offset)
+
+            assert engine.find_tpsl_exit(open, high, low, entry_bar, is_long, tp, sl) == scan_tpsl_exit(open, high, low, entry_bar, is_long, tp, sl)
+
+@pytest.mark.parametrize('atr_coef', [1, 6, 30])
+def test_trailing_exit_matches_scan(prices: Dict[str, np.ndarray], atr_coef: float) -> None:
+    close, atr = prices['close'], prices['atr']
+    last = len(close) - 1
+
+    for is_long in [True, False]:
+        state, expected_state = engine.TrailingState(), engine.TrailingState()
+        entry_bar = 1
+
+        # The stop and extreme price carry over from one trade to the next like they do in the strategy
+        while entry_bar <= last:
+            exit_bar, exited = engine.find_trailing_exit(close, atr, last, entry_bar, is_long, atr_coef, state)
+            assert (exit_bar, exited) == scan_trailing_exit(close, atr, last, entry_bar, is_long, atr_coef, expected_state)
+
+            if not exited:
+                break
+
+            assert vars(state) == vars(expected_state)
+            entry_bar = exit_bar + 11
@@ -0,0 +1,60 @@
+import warnings
+import numpy as np
+import pytest
+import core.engine as engine
+import core.fingerprint as fp
+import strategies.strats as strats
+import strategies.strategy_tester as st
+from backtesting import Backtest
+from tests.test_engine import create_random_signals, assert_same_result, CASH, COMMISSION, SIZE, SEEDS
+
+
+# Overrides next without declaring an exit rule, so it has to run its own logic
+class Early_Exit(strats.Daily_Range):
+    def next(self) -> None:
+        for trade in self.trades:
+            if len(self.data) - trade.entry_bar >= 2:
+                trade.close()
+
+        strats.Base_Strategy.next(self)
+
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    fp.backtest_cache.clear()
+
+def test_undeclared_exit_rule_is_not_fingerprinted() -> None:
+    df = create_random_signals(0)
+
+    assert fp.fingerprint(df, strats.Daily_Range, SIZE, 'backtesting') is not None
+    assert fp.fingerprint(df, Early_Exit, SIZE, 'backtesting') is None
+
+# Daily_Range and Buy_After_Red_Day both exit on the next green day, so on the same signals the second is a hit
+@pytest.mark.parametrize('backtest_engine', ['backtesting', 'vectorized'])
+@pytest.mark.parametrize('seed', SEEDS)
+def test_duplicate_backtest_matches_uncached_result(seed: int, backtest_engine: str) -> None:
+    df = create_random_signals(seed)
+    st.gather_backtest_result(df, 'SYM', 'Daily_Range', SIZE, backtest_engine=backtest_engine)
+    hits = fp.backtest_cache.hits
+    duplicate = st.gather_backtest_result(df, 'SYM', 'Buy_After_Red_Day', SIZE, backtest_engine=backtest_engine)
+
+    assert fp.backtest_cache.hits == hits + 1
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        uncached = Backtest(df, strats.load_strategy('Buy_After_Red_Day', df, SIZE), cash=CASH, margin=1, commission=COMMISSION).run()
+
+    assert_same_result(duplicate, uncached)
+
+def test_custom_next_does_not_share_a_backtest() -> None:
+    df = create_random_signals(1, 0.3)
+    run = lambda strategy_class: fp.run_once(df, strategy_class, SIZE, 'backtesting', None, lambda: st.run_engine(df, Backtest(df, strategy_class, cash=CASH, margin=1, commission=COMMISSION), strategy_class, SIZE))
+    hits = fp.backtest_cache.hits
+    declared = run(type('Daily_Range', (strats.Daily_Range,), {'dataframe': df, 'trade_size': SIZE}))
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        custom = run(type('Early_Exit', (Early_Exit,), {'dataframe': df, 'trade_size': SIZE}))
+
+    assert fp.backtest_cache.hits == hits
+    assert (custom['_trades']['ExitBar'] - custom['_trades']['EntryBar']).max() <= 2
+    assert not np.array_equal(custom['_trades']['ExitBar'].to_numpy(), declared['_trades']['ExitBar'].to_numpy())
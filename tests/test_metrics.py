@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+import core.engine as engine
+import core.metrics as metrics
+import core.utils as utils
+
+
+def create_curves(curves: int, bars: int, index: pd.DatetimeIndex, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    equity = 100000 * np.cumprod(1 + rng.normal(0.0004, 0.01, (curves, bars)), axis=1)
+    # A flat curve, one that starts late and one with a gap
+    equity[1] = 100000
+    equity[2, :bars // 5] = np.nan
+    equity[3, 100:110] = np.nan
+
+    return equity
+
+@pytest.mark.parametrize('index', [pd.bdate_range('2015-01-01', periods=1500), pd.date_range('2024-01-01', periods=1500, freq='h')])
+def test_sharpe_matches_per_curve_formula(index: pd.DatetimeIndex) -> None:
+    equity = create_curves(40, len(index), index)
+    expected = [utils.calculate_sharpe_ratio(pd.Series(curve, index=index)) for curve in equity]
+
+    np.testing.assert_allclose(metrics.calculate_metrics(index, equity)['sharpe'], expected, rtol=1e-9)
+
+def test_metrics_match_backtesting_formulas() -> None:
+    index = pd.bdate_range('2015-01-01', periods=1500)
+    equity = create_curves(40, len(index), index)[4:]
+    batched = metrics.calculate_metrics(index, equity)
+
+    for i, curve in enumerate(equity):
+        performance = engine.calculate_performance(index, curve)
+        assert batched['cagr'][i] == pytest.approx(performance['Return (Ann.) [%]'], rel=1e-9)
+        assert batched['volatility'][i] == pytest.approx(performance['Volatility (Ann.) [%]'], rel=1e-9)
+        assert batched['max_drawdown'][i] == pytest.approx(-performance['Max. Drawdown [%]'], rel=1e-9)
+        # backtesting.py clips negative ratios to zero
+        assert max(0, batched['sortino'][i]) == pytest.approx(performance['Sortino Ratio'], rel=1e-9)
+        assert max(0, batched['calmar'][i]) == pytest.approx(performance['Calmar Ratio'], rel=1e-9)
+
+def test_window_metrics_match_sliced_curves() -> None:
+    index = pd.bdate_range('2015-01-01', periods=1500)
+    equity = create_curves(10, len(index), index)
+    windows = [(0, 500), (500, 1000), (1000, 1500)]
+    sharpe = metrics.calculate_window_metrics(index, equity, windows)['sharpe']
+
+    for j, (start, end) in enumerate(windows):
+        expected = [utils.calculate_sharpe_ratio(pd.Series(curve[start:end], index=index[start:end])) for curve in equity]
+        np.testing.assert_allclose(sharpe[:, j], expected, rtol=1e-9)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+import core.data_manipulator as dm
+import core.indicators as indicators
+from core.panel import PricePanel
+from core.shared_data import SharedStockData
+from tests.test_engine import create_frame
+from typing import Dict
+
+
+# A symbol with the full history, one listed 300 bars later and one with bars missing in the middle
+@pytest.fixture
+def stock_data() -> Dict[str, pd.DataFrame]:
+    return {
+        'AAA': create_frame(0, 1200),
+        'LATE': create_frame(1, 1200).iloc[300:].reset_index(drop=True),
+        'GAPS': create_frame(2, 1200).drop(range(500, 520)).reset_index(drop=True)
+    }
+
+def test_panel_atr_matches_per_symbol(stock_data: Dict[str, pd.DataFrame]) -> None:
+    panel = PricePanel.from_frames(stock_data)
+    atr = panel.indicator('atr', length=14)
+
+    for i, (symbol, df) in enumerate(stock_data.items()):
+        np.testing.assert_array_equal(atr[i, panel.valid[i]], ta.atr(df['High'], df['Low'], df['Close'], length=14).to_numpy())
+        assert np.isnan(atr[i, ~panel.valid[i]]).all()
+
+def test_late_listings_are_kept(tmp_path, stock_data: Dict[str, pd.DataFrame]) -> None:
+    panel = dm.fetch_panel_or_load_cached(list(stock_data) + ['NONE'], dm.LocalProvider(stock_data), path=str(tmp_path))
+
+    assert panel.symbols == ['AAA', 'LATE', 'GAPS']
+    assert len(panel.dates) == 1200
+    assert not panel.valid[1, :300].any() and np.isnan(panel.field('Close')[1, :300]).all()
+
+    for symbol, df in panel.to_frames().items():
+        pd.testing.assert_frame_equal(df, stock_data[symbol], check_dtype=False)
+
+    frames = dm.fetch_data_or_load_cached(list(stock_data), dm.LocalProvider(stock_data), path=str(tmp_path))
+    assert {symbol: len(df) for symbol, df in frames.items()} == {'AAA': 1200, 'LATE': 900, 'GAPS': 1180}
+
+def test_shared_stock_data_primes_panel_atr(stock_data: Dict[str, pd.DataFrame]) -> None:
+    panel = PricePanel.from_frames(stock_data)
+
+    with SharedStockData(panel=panel) as shared:
+        for symbol in stock_data:
+            indicators.indicator_cache.clear()
+            expected = dm.create_signals(panel.frame(symbol), 'Buy_And_Hold', symbol)
+            indicators.indicator_cache.clear()
+            hits = indicators.indicator_cache.hits
+            signals = dm.create_signals(shared[symbol].copy(), 'Buy_And_Hold', symbol)
+
+            assert indicators.indicator_cache.hits == hits + 1
+            pd.testing.assert_frame_equal(signals, expected)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import core.portfolio as portfolio
+from typing import List
+
+
+def create_curves(curves: int, bars: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 100000 * np.cumprod(1 + rng.normal(0.0003, 0.015, (curves, bars)), axis=1)
+
+def summed_equity(equity: np.ndarray, weights: np.ndarray, cash: float) -> np.ndarray:
+    # Curves are held as cash until their first value and keep their last value over gaps
+    filled = pd.DataFrame(equity.T).ffill()
+    relative = (filled / filled.bfill().iloc[0]).fillna(1).to_numpy()
+
+    return cash * (1 - weights.sum() + relative @ weights)
+
+def test_drawdown_matches_summed_equity() -> None:
+    index = pd.bdate_range('2015-01-01', periods=1000)
+    equity = create_curves(30, len(index))
+    weights = np.random.default_rng(1).dirichlet(np.ones(30)) * 0.9
+    combined = portfolio.combine_equity(index, equity, weights, block_size=8)
+    expected = summed_equity(equity, weights, portfolio.CASH)
+
+    np.testing.assert_allclose(combined['Equity'].to_numpy(), expected, rtol=1e-12)
+    np.testing.assert_allclose(combined['DrawdownPct'].to_numpy(), 1 - expected / np.maximum.accumulate(expected), atol=1e-12)
+
+    # The weighted sum of the curves' own drawdowns overstates it
+    drawdowns = 1 - equity / np.maximum.accumulate(equity, axis=1)
+    assert combined['DrawdownPct'].max() < (weights @ drawdowns).max()
+
+def test_late_starts_and_gaps_match_summed_equity() -> None:
+    index = pd.bdate_range('2015-01-01', periods=600)
+    equity = create_curves(6, len(index), 2)
+    equity[1, :200] = np.nan
+    equity[2, 300:350] = np.nan
+    equity[3, :50] = np.nan
+    equity[3, 500:] = np.nan
+    weights = np.full(6, 1 / 6)
+    combined = portfolio.combine_equity(index, equity, weights, cash=50000)
+
+    np.testing.assert_allclose(combined['Equity'].to_numpy(), summed_equity(equity, weights, 50000), rtol=1e-12)
+
+# Holds units of every curve bought at the bar before each division and sells them on the next rebalance
+def simulate_holdings(equity: np.ndarray, schedule: np.ndarray, starts: List[int], cash: float) -> np.ndarray:
+    combined = np.full(equity.shape[1], float(cash))
+    value = cash
+
+    for weights, start, end in zip(schedule, starts, starts[1:] + [equity.shape[1]]):
+        base = max(start - 1, 0)
+        units = value * weights / equity[:, base]
+        idle = value * (1 - weights.sum())
+
+        for bar in range(start, end):
+            combined[bar] = idle + units @ equity[:, bar]
+
+        value = combined[end - 1]
+
+    return combined
+
+def test_schedule_matches_holdings_simulation() -> None:
+    index = pd.bdate_range('2015-01-01', periods=900)
+    equity = create_curves(12, len(index), 3)
+    schedule = np.random.default_rng(4).dirichlet(np.ones(12), 3) * np.array([[1], [0.5], [0.8]])
+    starts = [0, 300, 600]
+    combined = portfolio.combine_equity(index, equity, schedule, starts, block_size=5)
+    expected = simulate_holdings(equity, schedule, starts, portfolio.CASH)
+
+    np.testing.assert_allclose(combined['Equity'].to_numpy(), expected, rtol=1e-12)
+    np.testing.assert_allclose(combined['DrawdownPct'].to_numpy(), 1 - expected / np.maximum.accumulate(expected), atol=1e-12)
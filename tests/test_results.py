@@ -0,0 +1,52 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+import core.result_cache as rc
+import core.results as rs
+from core.checkpoint import Checkpoint
+
+
+@pytest.fixture
+def result() -> rs.CompactResult:
+    dates = pd.bdate_range('2012-01-02', periods=2000, name='Date')
+    rs.register_calendar(dates.to_numpy(dtype='datetime64[ns]'))
+    equity = 100000 * np.cumprod(1 + np.random.default_rng(0).normal(0, 0.01, 1500))
+
+    return rs.CompactResult.from_equity_curve({'symbol': 'SYM', 'strategy': 'Daily_Range', 'sharpe': 1.0}, pd.DataFrame({'Equity': equity}, index=dates[300:1800]))
+
+# Drops the calendar like a process that never registered it
+def forget_calendar(calendar: str) -> np.ndarray:
+    return rs.calendars.pop(calendar)
+
+def test_pickle_only_carries_calendar_id(result: rs.CompactResult) -> None:
+    assert result.calendar not in rs.local_calendars
+    assert len(pickle.dumps(result)) < result.equity.nbytes + 1000
+
+def test_result_cache_restores_calendar(tmp_path, result: rs.CompactResult) -> None:
+    rc.save_cell('abc', result, str(tmp_path))
+    dates = forget_calendar(result.calendar)
+    loaded = rc.load_cell('abc', str(tmp_path))
+
+    np.testing.assert_array_equal(loaded.dates(), dates[300:1800])
+    np.testing.assert_array_equal(loaded['equity_curve']['Equity'], result['equity_curve']['Equity'])
+
+def test_checkpoint_restores_calendar(tmp_path, result: rs.CompactResult) -> None:
+    with Checkpoint('job', path=str(tmp_path / 'checkpoints.db')) as checkpoint:
+        checkpoint.save('SYM', 'Daily_Range', result, 'hash')
+
+    dates = forget_calendar(result.calendar)
+
+    with Checkpoint('job', resume=True, path=str(tmp_path / 'checkpoints.db')) as checkpoint:
+        loaded = checkpoint.load({'SYM': 'hash'})[('SYM', 'Daily_Range')]
+
+    np.testing.assert_array_equal(loaded.dates(), dates[300:1800])
+
+def test_result_on_unknown_dates_carries_them() -> None:
+    dates = pd.date_range('1990-01-01', periods=50, freq='h', name='Date')
+    result = rs.CompactResult.from_equity_curve({'symbol': 'SYM'}, pd.DataFrame({'Equity': np.arange(50.0) + 1}, index=dates))
+    payload = pickle.dumps(result)
+    forget_calendar(result.calendar)
+    rs.local_calendars.discard(result.calendar)
+
+    np.testing.assert_array_equal(pickle.loads(payload).dates(), dates.to_numpy())
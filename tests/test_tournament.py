@@ -0,0 +1,50 @@
+import warnings
+import pandas as pd
+import pytest
+import core.engine as engine
+import core.tournament as tn
+import strategies.registry as registry
+import strategies.strategy_tester as st
+from tests.test_engine import create_frame
+from typing import List, Dict, Optional, Any
+
+
+@pytest.fixture
+def stock_data() -> Dict[str, pd.DataFrame]:
+    return {f'SYN{seed}': create_frame(seed) for seed in range(3)}
+
+def run_audit(stock_data: Dict[str, pd.DataFrame], **kwargs: Any) -> List[Optional[Dict[str, Any]]]:
+    strategies = dict.fromkeys(registry.strategy_names(), 0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return [tn.run_tournament_backtest(stock_data, symbol, strategies, backtest_engine='vectorized', audit=True, **kwargs) for symbol in stock_data]
+
+# The tournament finds no strategy for SYN0 where the exhaustive search does
+def test_audit_counts_symbols_without_a_winner(stock_data: Dict[str, pd.DataFrame], capsys: pytest.CaptureFixture) -> None:
+    results = run_audit(stock_data)
+
+    assert results[0]['strategy'] is None and results[0]['exhaustive_strategy'] is not None
+    assert all(result is not None and 'exhaustive_strategy' in result for result in results)
+
+    capsys.readouterr()
+    tn.log_tournament(results)
+    agreed = sum(result['strategy'] == result['exhaustive_strategy'] for result in results)
+
+    assert f"strategy for {agreed}/3 symbols" in capsys.readouterr().out
+
+@pytest.mark.parametrize('criteria', [{'max_drawdown': 8}, {'min_trades': 40}, {'min_sharpe': 0.3, 'checkpoint': 0.3}])
+def test_winners_pass_the_abort_criteria(stock_data: Dict[str, pd.DataFrame], criteria: Dict[str, Any]) -> None:
+    abort_criteria = engine.AbortCriteria.from_config(criteria)
+    results = run_audit(stock_data, criteria=abort_criteria)
+
+    for symbol, result in zip(stock_data, results):
+        if result['strategy'] is not None:
+            assert 'Pruned' not in st.run_backtest(stock_data, symbol, result['strategy'], backtest_engine='vectorized', criteria=abort_criteria)
+
+        if result['exhaustive_strategy'] is None:
+            assert result['strategy'] is None
+
+def test_criteria_no_strategy_passes_leave_no_winner(stock_data: Dict[str, pd.DataFrame]) -> None:
+    results = run_audit(stock_data, criteria=engine.AbortCriteria(max_drawdown=0.001))
+    assert all(result['strategy'] is None and result['exhaustive_strategy'] is None for result in results)
@@ -3,6 +3,7 @@ from dash import dash_table
 from strategies.strategy_tester import run_master_backtest, load_strategies_from_json
 from core.data_manipulator import load_symbols, snake_case_to_name
 import pandas as pd
+import threading
 from dash import Dash
 from typing import List, Dict, Any, Optional, Union
 
@@ -11,6 +12,12 @@ symbols = load_symbols('SP')
 symbols.insert(0, "ALL")
 strategies_dict = load_strategies_from_json('strategies\strategies.json')
 community_strategies_dict = load_strategies_from_json('strategies\community_strategies.json')
+backtest_progress = {'completed': 0, 'total': 0}
+cancel_event = threading.Event()
+
+def update_progress(completed: int, total: int) -> None:
+    backtest_progress['completed'] = completed
+    backtest_progress['total'] = total
 
 def create_backtesting_tab_layout() -> html.Div:
     return html.Div([
@@ -53,6 +60,11 @@ def create_backtesting_tab_layout() -> html.Div:
         ], style={"marginBottom": "20px"}),
 
         html.Button("Run Backtests", id="run-backtest-button", style={"backgroundColor": "#1E90FF", "color": "#FFFFFF", "marginTop": "10px", "fontSize": "16px", "padding": "10px 20px"}),
+        html.Button("Cancel", id="cancel-backtest-button", style={"backgroundColor": "#B22222", "color": "#FFFFFF", "marginTop": "10px", "marginLeft": "10px", "fontSize": "16px", "padding": "10px 20px"}),
+
+        html.Div(id="backtest-cancel-status", style={"marginTop": "10px", "color": "#FFFFFF"}),
+        html.Div(id="backtest-progress", style={"marginTop": "10px", "color": "#FFFFFF"}),
+        dcc.Interval(id="backtest-progress-interval", interval=1000),
 
         html.Div(id="backtest-results", style={"marginTop": "20px", "color": "#FFFFFF"}),
         dcc.Loading(
@@ -66,6 +78,27 @@ def create_backtesting_tab_layout() -> html.Div:
     ], style={"backgroundColor": "#121212", "padding": "20px"})
 
 def register_callbacks(app: Dash) -> None:
+    @app.callback(
+        Output("backtest-progress", "children"),
+        Input("backtest-progress-interval", "n_intervals")
+    )
+    def update_progress_callback(n_intervals: Optional[int]) -> Optional[str]:
+        if backtest_progress['total'] == 0:
+            return None
+
+        return f"Completed {backtest_progress['completed']}/{backtest_progress['total']} backtests."
+
+    @app.callback(
+        Output("backtest-cancel-status", "children"),
+        Input("cancel-backtest-button", "n_clicks")
+    )
+    def cancel_backtest_callback(n_clicks: Optional[int]) -> Optional[str]:
+        if not n_clicks:
+            return None
+
+        cancel_event.set()
+        return "Cancelling the remaining backtests..."
+
     @app.callback(
         Output("backtest-results", "children"),
         Input("run-backtest-button", "n_clicks"),
@@ -86,15 +119,18 @@ def register_callbacks(app: Dash) -> None:
         if backtest_type == "single_strategy" and not selected_strategy:
             return "Please select a strategy for this backtesting type."
 
+        cancel_event.clear()
+        update_progress(0, 0)
+
         # Run the appropriate backtest based on the selected type
         if backtest_type == "compare_strategies":
-            results = run_master_backtest(instruments, selected_strategy, compare_strategies=True, plot_results=False)
+            results = run_master_backtest(instruments, selected_strategy, compare_strategies=True, plot_results=False, progress=update_progress, cancel_event=cancel_event)
         elif backtest_type == "find_best":
-            results = run_master_backtest(instruments, selected_strategy, find_best=True, plot_results=False)
+            results = run_master_backtest(instruments, selected_strategy, find_best=True, plot_results=False, progress=update_progress, cancel_event=cancel_event)
         elif backtest_type == "adaptive_strategy":
-            results = run_master_backtest(instruments, selected_strategy, adaptive_strategy=True, plot_results=False)
+            results = run_master_backtest(instruments, selected_strategy, adaptive_strategy=True, plot_results=False, progress=update_progress, cancel_event=cancel_event)
         elif backtest_type == "single_strategy":
-            results = run_master_backtest(instruments, selected_strategy, plot_results=False)
+            results = run_master_backtest(instruments, selected_strategy, plot_results=False, progress=update_progress, cancel_event=cancel_event)
 
         if not results:
             return "No results generated. Please check your selections."
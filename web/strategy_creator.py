@@ -184,6 +184,8 @@ def remove_{strategy_name.lower()}_columns(df):"""
 def generate_class_code(strategy_name: str) -> str:
     code = f"""
 class {strategy_name.lower()}(Base_Strategy):
+    exit_rule = 'hold'
+
     def init(self):
         super().init()
         self.atrCoef = 6